@@ -0,0 +1,78 @@
+"""Admin endpoints for runtime diagnostics"""
+import asyncio
+import hmac
+import ipaddress
+import threading
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.loop_monitor import SamplingProfiler, loop_monitor
+from app.core.overload import overload
+from app.core.resilience import breakers_snapshot
+
+logger = get_logger(__name__)
+
+MAX_PROFILE_SECONDS = 60
+
+# Only one profiling run at a time
+_profile_lock = asyncio.Lock()
+
+
+def _is_local(request: Request) -> bool:
+    """Direct connection from this machine (not forwarded by a proxy)"""
+    if request.headers.get("x-forwarded-for") or request.headers.get("forwarded"):
+        return False
+    host = request.client.host if request.client else ""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Allow requests carrying ADMIN_TOKEN; without one configured, only local clients"""
+    if settings.admin_token:
+        if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+    elif not _is_local(request):
+        raise HTTPException(status_code=403, detail="Admin endpoints require ADMIN_TOKEN")
+
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/loop")
+async def loop_status():
+    """Event loop lag and the stacks of recent slow callbacks"""
+    return loop_monitor.snapshot()
+
+
+@router.get("/overload")
+async def overload_status():
+    """Current load shedding level and the signals behind it"""
+    return overload.snapshot()
+
+
+@router.get("/breakers")
+async def breaker_status():
+    """Circuit breaker state per upstream and the shared retry budget"""
+    return breakers_snapshot()
+
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+                  hz: int = Query(100, ge=1, le=1000),
+                  all_threads: bool = Query(False, description="Sample every thread, not just the event loop")):
+    """Sample stacks for N seconds and return them in folded (flamegraph) format"""
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    async with _profile_lock:
+        # This handler runs on the loop thread; the sampler runs off it
+        profiler = SamplingProfiler(None if all_threads else threading.get_ident())
+        logger.info("Profiling %s for %ss at %sHz", "all threads" if all_threads else "event loop", seconds, hz)
+        folded = await asyncio.to_thread(profiler.run, seconds, hz)
+    return PlainTextResponse(folded, headers={"X-Profile-Samples": str(profiler.samples)})
@@ -0,0 +1,50 @@
+"""Static assets and pages served from memory (app/core/assets.py)"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
+
+from app.core.assets import Asset, IMMUTABLE, REVALIDATE, asset_store
+
+router = APIRouter(tags=["static"])
+
+
+def _not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: W/"x" matches "x" for GET revalidation
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def asset_response(asset: Asset, request: Request, cache_control: str) -> Response:
+    """Pick the encoding, then answer 304 or the precompressed body"""
+    encoding = asset.negotiate(request.headers.get("accept-encoding"))
+    etag = asset.etag(encoding)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if len(asset.variants) > 1:
+        headers["Vary"] = "Accept-Encoding"
+    if _not_modified(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    body = asset.variants[encoding]
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        return Response(headers=headers, media_type=asset.media_type)
+    return Response(body, headers=headers, media_type=asset.media_type)
+
+
+def page_response(name: str, request: Request) -> Response:
+    """A pre-rendered template"""
+    return asset_response(asset_store.pages[name], request, REVALIDATE)
+
+
+@router.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(path: str, request: Request):
+    """Static file by source name (revalidated) or content-hashed name (immutable)"""
+    entry = asset_store.files.get(path)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    asset, immutable = entry
+    return asset_response(asset, request, IMMUTABLE if immutable else REVALIDATE)
@@ -1,15 +1,13 @@
 from fastapi import APIRouter, Query, HTTPException, Request
 from typing import List, Dict
-import httpx
-from bs4 import BeautifulSoup
-from app.services.llm_service import LLMService
-from app.services.tts_service import TTSService
+from app.services.providers import create_llm, create_tts
 from app.core.config import get_api_keys_from_request
+from app.core.speech_text import to_speech
 import urllib.parse
 import asyncio
-# from app.core.logging import get_logger
+from app.core.logging import get_logger
 
-# logger = get_logger(__name__)
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
@@ -25,6 +23,10 @@ async def duckduckgo_search(q: str = Query(..., min_length=1)) -> List[Dict[str,
     search_url = "https://html.duckduckgo.com/html/"
     params = {"q": q}
 
+    # Imported here so the app starts without loading them
+    import httpx
+    from bs4 import BeautifulSoup
+
     try:
         async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
             resp = await client.get(search_url, params=params, headers={"User-Agent": "CalmGuide/1.0"})
@@ -98,14 +100,17 @@ async def duckduckgo_summary(request: Request, q: str = Query(..., min_length=1)
     api_keys = get_api_keys_from_request(request=request)
     
     # Create service instances with user API keys
-    llm = LLMService(api_key=api_keys.get('google_api_key'))
-    tts = TTSService(api_key=api_keys.get('murf_api_key'))
+    llm = create_llm(api_keys.get('google_api_key'))
+    tts = create_tts(api_keys.get('murf_api_key'))
     
     # Fetch raw results
     # Use DuckDuckGo's html host which avoids an initial redirect
     search_url = "https://html.duckduckgo.com/html/"
     params = {"q": q}
 
+    import httpx
+    from bs4 import BeautifulSoup
+
     try:
         async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
             resp = await client.get(search_url, params=params, headers={"User-Agent": "CalmGuide/1.0"})
@@ -160,25 +165,16 @@ async def duckduckgo_summary(request: Request, q: str = Query(..., min_length=1)
     try:
         summary = await llm.generate_response(prompt, session_id="search_summary")
 
-        # For TTS, replace URLs with 'link to domain', but keep real URLs in summary for frontend
-        import re
-        def url_replacer(match):
-            url = match.group(0)
-            url_clean = url.strip('`').strip()
-            domain = re.sub(r'^https?://', '', url_clean).split('/')[0]
-            if domain:
-                return f'link to {domain}'
-            return 'link'
-
-        url_pattern = r'`?(https?://[^\s`]+)`?'
-        tts_text = re.sub(url_pattern, url_replacer, summary)
+        # For TTS, strip the markdown and say 'link to domain' for URLs, but keep
+        # the real URLs in the summary for the frontend
+        tts_text = to_speech(summary)
 
         # Generate TTS audio synchronously and include it in the response
         try:
-            audio_b64 = await tts.generate_speech(tts_text)
-            # logger.info(f"TTS generated audio for search summary (length={len(audio_b64) if audio_b64 else 0})")
+            audio_b64 = await tts.generate_speech(tts_text, normalized=True)
+            logger.info("TTS generated audio for search summary (length=%s)", len(audio_b64) if audio_b64 else 0)
         except Exception as exc:
-            # logger.error(f"TTS error: {exc}")
+            logger.error("TTS error: %s", exc)
             audio_b64 = ""
 
         return {"summary": summary, "audio": audio_b64}
@@ -0,0 +1,254 @@
+"""Precompressed, content-hashed static assets and pre-rendered pages
+
+``python -m app.core.assets`` (also run at startup when the build is missing
+or stale) writes every file of ``static/`` to ``static/dist/`` under a
+content-hashed name (``script.3f2a9c1d7e4b.js``) next to ``.gz`` and, when
+the optional ``brotli`` package is installed, ``.br`` variants, plus a
+``manifest.json`` mapping source names to hashed ones.
+
+At startup the build and the rendered templates (they have no per-request
+data) are loaded into memory. Responses are then picked by Accept-Encoding,
+carry an ETag (the content hash) so revalidations get a 304, and are cached
+for a year with ``immutable`` when requested by their hashed name. Pages and
+unhashed asset names are revalidated on every use (``no-cache``), so a
+deploy is picked up at once.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from app.core.logging import get_logger
+
+try:
+    import brotli
+    _BROTLI_AVAILABLE = True
+except ImportError:
+    # Optional: without it only gzip variants are built
+    brotli = None  # type: ignore
+    _BROTLI_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+STATIC_DIR = "static"
+TEMPLATES_DIR = "templates"
+DIST_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+
+COMPRESSIBLE = {".js", ".css", ".html", ".svg", ".json", ".txt", ".map"}
+# Smaller bodies gain nothing from compression once headers are counted
+MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred order when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip")
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """``js/app.js`` -> ``js/app.<digest>.js``"""
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def compress(data: bytes, ext: str) -> Dict[str, bytes]:
+    """Compressed variants worth serving for a file of type ``ext``"""
+    if ext not in COMPRESSIBLE or len(data) < MIN_COMPRESS_BYTES:
+        return {}
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if _BROTLI_AVAILABLE:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def _write_atomic(path: str, data: bytes):
+    """Replace ``path`` in one step (several workers may build at once)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _source_files(static_dir: str) -> List[str]:
+    """Paths of the source assets, relative to ``static_dir``"""
+    files = []
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    for root, dirs, names in os.walk(static_dir):
+        # The build output is not a source
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist_dir and not d.startswith(".")]
+        for name in names:
+            if not name.startswith("."):
+                files.append(os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/"))
+    return sorted(files)
+
+
+def build_assets(static_dir: str = STATIC_DIR) -> Dict[str, str]:
+    """Write hashed copies and compressed variants to ``static/dist``; return the manifest"""
+    dist_dir = os.path.join(static_dir, DIST_NAME)
+    manifest: Dict[str, str] = {}
+    for path in _source_files(static_dir):
+        with open(os.path.join(static_dir, path), "rb") as f:
+            data = f.read()
+        target = hashed_name(path, content_hash(data))
+        manifest[path] = target
+        target_path = os.path.join(dist_dir, target)
+        if os.path.exists(target_path):
+            continue  # Content-addressed: already built
+        for encoding, body in compress(data, os.path.splitext(path)[1]).items():
+            _write_atomic(target_path + SUFFIXES[encoding], body)
+        _write_atomic(target_path, data)
+    _write_atomic(os.path.join(dist_dir, MANIFEST_NAME),
+                  json.dumps({"brotli": _BROTLI_AVAILABLE, "files": manifest}, indent=2).encode())
+    logger.info("Built %s static assets into %s", len(manifest), dist_dir)
+    return manifest
+
+
+def _load_manifest(static_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(static_dir, DIST_NAME, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_stale(static_dir: str, manifest: Optional[dict]) -> bool:
+    """Missing, built without brotli now available, or out of date with the sources"""
+    if not manifest or manifest.get("brotli") != _BROTLI_AVAILABLE:
+        return True
+    files = manifest.get("files", {})
+    if sorted(files) != _source_files(static_dir):
+        return True
+    for path, target in files.items():
+        with open(os.path.join(static_dir, path), "rb") as f:
+            if hashed_name(path, content_hash(f.read())) != target:
+                return True
+    return False
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """``"gzip, br;q=0.8"`` -> {"gzip": 1.0, "br": 0.8}"""
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    return accepted
+
+
+class Asset:
+    """One servable body with its precompressed variants"""
+
+    __slots__ = ("variants", "digest", "media_type")
+
+    def __init__(self, data: bytes, media_type: str, variants: Dict[str, bytes],
+                 digest: Optional[str] = None):
+        self.variants = {"identity": data, **variants}
+        self.digest = digest or content_hash(data)
+        self.media_type = media_type
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """Best encoding of this asset the client accepts"""
+        if len(self.variants) == 1:
+            return "identity"
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = "identity", 0.0
+        for encoding in ENCODINGS:
+            q = accepted.get(encoding, wildcard)
+            if encoding in self.variants and q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def etag(self, encoding: str) -> str:
+        # Each representation gets its own strong validator
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+
+class AssetStore:
+    """In-memory static assets (by source and hashed name) and rendered pages"""
+
+    def __init__(self, static_dir: str = STATIC_DIR, templates_dir: str = TEMPLATES_DIR):
+        self.static_dir = static_dir
+        self.templates_dir = templates_dir
+        self.manifest: Dict[str, str] = {}
+        # name -> (asset, immutable)
+        self.files: Dict[str, Tuple[Asset, bool]] = {}
+        self.pages: Dict[str, Asset] = {}
+
+    def load(self):
+        """Build the assets if needed and load them and the rendered pages"""
+        manifest = _load_manifest(self.static_dir)
+        if _is_stale(self.static_dir, manifest):
+            build_assets(self.static_dir)
+            manifest = _load_manifest(self.static_dir)
+        self.manifest = dict(manifest["files"])
+        dist_dir = os.path.join(self.static_dir, DIST_NAME)
+        files = {}
+        for source, target in self.manifest.items():
+            target_path = os.path.join(dist_dir, target)
+            with open(target_path, "rb") as f:
+                data = f.read()
+            variants = {}
+            for encoding, suffix in SUFFIXES.items():
+                if os.path.exists(target_path + suffix):
+                    with open(target_path + suffix, "rb") as f:
+                        variants[encoding] = f.read()
+            media_type = mimetypes.guess_type(source)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type == "application/javascript":
+                media_type += "; charset=utf-8"
+            asset = Asset(data, media_type, variants)
+            files[source] = (asset, False)
+            files[target] = (asset, True)
+        self.files = files
+        self.pages = self._render_pages()
+        logger.info("Loaded %s static assets and %s pages into memory", len(self.manifest), len(self.pages))
+        return self
+
+    def url(self, path: str) -> str:
+        """Public URL of a static file, content-hashed when built"""
+        return f"/static/{self.manifest.get(path, path)}"
+
+    def _render_pages(self) -> Dict[str, Asset]:
+        """Render every template once; they depend on nothing but asset URLs"""
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+        env = Environment(loader=FileSystemLoader(self.templates_dir),
+                          autoescape=select_autoescape(["html"]))
+        env.globals["asset_url"] = self.url
+        pages = {}
+        for name in env.list_templates(extensions=["html"]):
+            html = env.get_template(name).render().encode("utf-8")
+            pages[name] = Asset(html, "text/html; charset=utf-8", compress(html, ".html"))
+        return pages
+
+
+# Global asset store (loaded on application startup)
+asset_store = AssetStore()
+
+
+if __name__ == "__main__":
+    manifest = build_assets()
+    for source, target in manifest.items():
+        print(f"{source} -> {DIST_NAME}/{target}")
@@ -8,7 +8,12 @@ to plaintext so local development / localhost works without extra setup.
 
 import os
 import json
-from typing import Optional, Dict, Any, TYPE_CHECKING
+import logging
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple, TYPE_CHECKING
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -24,13 +29,15 @@ except Exception:
     _CRYPTO_AVAILABLE = False
 
 
+logger = logging.getLogger(__name__)
+
 USER_KEYS_FILE = "user_keys.json"
 MASTER_KEY_ENV = "MASTER_KEY"
 
 # Warn if a master key exists but cryptography isn't installed
 if os.getenv(MASTER_KEY_ENV) and not _CRYPTO_AVAILABLE:
-    print(
-        "WARNING: MASTER_KEY is set but 'cryptography' is not available; "
+    logger.warning(
+        "MASTER_KEY is set but 'cryptography' is not available; "
         "encryption will be disabled. Install 'cryptography' or unset MASTER_KEY."
     )
 
@@ -50,6 +57,12 @@ def has_master_key() -> bool:
     return bool(_get_master_key()) and _CRYPTO_AVAILABLE
 
 
+@lru_cache(maxsize=1)
+def _fernet_for(key: bytes) -> "Fernet": #type: ignore
+    # Building a Fernet parses and splits the key; do it once per MASTER_KEY
+    return Fernet(key)
+
+
 def _get_fernet() -> Optional["Fernet"]: #type: ignore
     key = _get_master_key()
     if not key:
@@ -57,7 +70,7 @@ def _get_fernet() -> Optional["Fernet"]: #type: ignore
     if not _CRYPTO_AVAILABLE:
         # cryptography isn't available; cannot create a Fernet instance
         return None
-    return Fernet(key)
+    return _fernet_for(key)
 
 
 def encrypt_value(plaintext: str) -> str:
@@ -80,39 +93,103 @@ def decrypt_value(ciphertext_or_plain: str) -> str:
         return ciphertext_or_plain
 
 
-def load_user_keys() -> Dict[str, Any]:
-    """Load user keys from JSON file, decrypting values when possible."""
-    if os.path.exists(USER_KEYS_FILE):
-        try:
-            with open(USER_KEYS_FILE, "r", encoding="utf-8") as f:
-                raw = json.load(f)
-        except Exception as e:
-            print(f"Error loading user keys: {e}")
-            return {}
-        # Decrypt only values (assumes mapping of key->value)
-        decrypted: Dict[str, Any] = {}
-        for k, v in raw.items():
-            if isinstance(v, str):
-                decrypted[k] = decrypt_value(v)
-            else:
-                decrypted[k] = v
-        return decrypted
-    return {}
+def _read_user_keys(path: str) -> Dict[str, Any]:
+    """Read the keys file and decrypt its values"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except Exception as e:
+        logger.error("Error loading user keys: %s", e)
+        return {}
+    # Decrypt only values (assumes mapping of key->value)
+    decrypted: Dict[str, Any] = {}
+    for k, v in raw.items():
+        if isinstance(v, str):
+            decrypted[k] = decrypt_value(v)
+        else:
+            decrypted[k] = v
+    return decrypted
+
+
+class UserKeyStore:
+    """
+    Decrypted contents of user_keys.json, cached in memory
 
+    The file is stat'ed at most once per ``check_interval`` seconds and only
+    re-read and decrypted when its mtime or size changed, so looking keys up
+    per request normally touches neither the disk nor Fernet. Saves replace
+    the file atomically and update the cache directly.
+    """
 
-def save_user_keys(user_keys: Dict[str, Any]):
-    """Save user keys to JSON file, encrypting values when possible."""
-    try:
+    def __init__(self, path: str = USER_KEYS_FILE, check_interval: float = 5.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._keys: Dict[str, Any] = {}
+        # (mtime_ns, size) of the file the cache was loaded from; None when missing
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def get(self) -> Dict[str, Any]:
+        """Current keys (shared; do not mutate)"""
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self.refresh(now)
+        return self._keys
+
+    def refresh(self, now: Optional[float] = None):
+        """Reload the keys if the file changed since the last load"""
+        with self._lock:
+            self._checked_at = time.monotonic() if now is None else now
+            signature = self._stat()
+            if signature == self._signature:
+                return
+            self._keys = _read_user_keys(self.path) if signature else {}
+            self._signature = signature
+
+    def save(self, user_keys: Dict[str, Any]):
+        """Encrypt and write the keys, replacing the file in one step"""
         to_save: Dict[str, Any] = {}
         for k, v in user_keys.items():
             if isinstance(v, str):
                 to_save[k] = encrypt_value(v)
             else:
                 to_save[k] = v
-        with open(USER_KEYS_FILE, "w", encoding="utf-8") as f:
-            json.dump(to_save, f, indent=2)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with self._lock:
+            # mkstemp creates the file readable by the owner only
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".user_keys-")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(to_save, f, indent=2)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            self._keys = dict(user_keys)
+            self._signature = self._stat()
+            self._checked_at = time.monotonic()
+
+
+def load_user_keys() -> Dict[str, Any]:
+    """Load user keys (decrypted), from memory unless the file changed."""
+    return dict(user_key_store.get())
+
+
+def save_user_keys(user_keys: Dict[str, Any]):
+    """Save user keys to JSON file, encrypting values when possible."""
+    try:
+        user_key_store.save(user_keys)
     except Exception as e:
-        print(f"Error saving user keys: {e}")
+        logger.error("Error saving user keys: %s", e)
 
 
 def get_api_key_from_sources(env_var: str, json_key: str) -> Optional[str]:
@@ -140,6 +217,170 @@ class Settings(BaseSettings):
     port: int = 8000
     debug: bool = True
 
+    # Speech-to-text turn detection (defaults for every new session)
+    stt_end_of_turn_silence_ms: int = 500
+    stt_voice_activity_threshold: float = 0.5
+    # Learn the end-of-turn silence from each user's pauses and cut-offs
+    stt_adaptive_turn_detection: bool = True
+    stt_min_end_of_turn_silence_ms: int = 160
+    stt_max_end_of_turn_silence_ms: int = 2000
+    # Keep the streaming connection open between recordings (push-to-talk).
+    # The idle window is capped at KEEP_WARM_MAX_IDLE_SECONDS (stt_service)
+    # because AssemblyAI bills for the whole time the session is open.
+    stt_keep_warm: bool = False
+    stt_keep_warm_idle_seconds: float = 20.0
+    stt_keepalive_interval_seconds: float = 1.0
+
+    # LLM conversation window: approximate token budget for history sent per
+    # request, with a message-count safety cap
+    llm_history_token_budget: int = 2000
+    llm_history_max_messages: int = 50
+    # Summarize turns evicted from the window in the background (extra LLM call)
+    llm_history_summarize: bool = False
+
+    # Response cache for context-free first questions (shared across sessions)
+    response_cache_enabled: bool = False
+    # Also match near-identical questions by character trigram similarity
+    response_cache_similarity: bool = False
+    response_cache_threshold: float = 0.85
+    response_cache_ttl_seconds: float = 3600.0
+    response_cache_max_entries: int = 256
+
+    # Session state (conversation history, turn detection) and the exact
+    # response cache tier (app/services/session_store.py): "memory" (single
+    # worker), "sqlite" (workers of one machine) or "redis" (several nodes)
+    session_store: str = "memory"
+    session_store_path: str = "sessions.db"
+    session_store_url: str = "redis://127.0.0.1:6379/0"
+    # Sessions not touched for this long are forgotten
+    session_ttl_seconds: float = 86400.0
+    # Resume tokens (app/core/resume.py) are signed with this secret (falls
+    # back to MASTER_KEY); set it when running several workers
+    session_secret: Optional[str] = None
+    # A dropped connection keeps its handler for this long, so an in-flight
+    # turn keeps running and its messages are replayed on reconnect
+    session_resume_grace_seconds: float = 30.0
+    # Replay buffer per session, trimmed as the client acknowledges messages;
+    # the byte cap times max_sessions_per_worker is the worst case per worker
+    # (500 MiB at the defaults)
+    session_replay_max_messages: int = 512
+    session_replay_max_bytes: int = 1024 * 1024
+
+    # Per-connection limits, checked on a timer wheel (0 disables a limit):
+    # recording without speech, connected without any client message, total
+    # connection time, microphone audio rate, and live sessions per worker
+    session_recording_idle_seconds: float = 60.0
+    session_idle_seconds: float = 900.0
+    session_max_duration_seconds: float = 4 * 3600.0
+    session_max_audio_bytes_per_minute: int = 4 * 1024 * 1024
+    max_sessions_per_worker: int = 500
+
+    # WebSocket compression (app/core/ws_compression.py, needs `python -m app.serve`):
+    # "off", "all" or "selective" (skip audio and messages under
+    # ws_compress_min_bytes), plus the zlib settings of the compressor
+    ws_compression: str = "selective"
+    ws_compress_min_bytes: int = 256
+    ws_compress_audio: bool = False
+    ws_compress_level: int = 6
+    ws_compress_mem_level: int = 5
+    ws_compress_window_bits: int = 12
+
+    # Turn scheduler (app/services/scheduler.py): concurrent LLM/TTS turns per
+    # worker, per API key and per session; waiting turns are served
+    # round-robin across sessions and dropped after scheduler_max_wait_seconds
+    scheduler_max_concurrent: int = 32
+    scheduler_per_key: int = 4
+    scheduler_per_session: int = 1
+    scheduler_max_queued: int = 128
+    scheduler_max_queued_per_session: int = 2
+    scheduler_max_wait_seconds: float = 10.0
+
+    # Load shedding (app/core/overload.py): thresholds for levels 1-3 (shed
+    # interim transcripts, text-only replies, refuse new recordings) per signal
+    overload_enabled: bool = True
+    overload_check_interval_ms: int = 500
+    overload_loop_lag_ms: str = "100,250,500"
+    overload_queue_depth: str = "500,2000,5000"
+    overload_tts_in_flight: str = "24,48,96"
+    # Step down once every signal is below this share of the current level's
+    # thresholds for the cooldown
+    overload_recover_ratio: float = 0.7
+    overload_cooldown_seconds: float = 5.0
+
+    # Circuit breakers per upstream (app/core/resilience.py): open when the
+    # failure or slow-call share of the last breaker_window calls reaches its
+    # rate, fail fast for breaker_open_seconds, then let trial calls through
+    circuit_breaker_enabled: bool = True
+    breaker_window: int = 20
+    breaker_min_calls: int = 5
+    breaker_failure_rate: float = 0.5
+    breaker_slow_call_seconds: float = 10.0
+    breaker_slow_call_rate: float = 0.8
+    breaker_open_seconds: float = 15.0
+    breaker_half_open_calls: int = 1
+    # Retries with full-jitter backoff, paid from a budget shared by all
+    # upstreams (each first attempt earns retry_budget_ratio of a retry)
+    retry_max_attempts: int = 2
+    retry_base_delay_ms: int = 200
+    retry_max_delay_ms: int = 2000
+    retry_budget_ratio: float = 0.2
+    retry_budget_min_per_second: float = 0.5
+    # Upper bound on one Murf synthesis, so a hung socket counts as a failure
+    tts_timeout_seconds: float = 30.0
+
+    # Background health probes of the upstreams (app/services/health_service.py);
+    # /health/ serves the cached results. The TTS probe defaults to WS_MURF_URL
+    # (or the fake Murf server) over HTTP
+    health_probe_enabled: bool = True
+    health_probe_interval_seconds: float = 30.0
+    health_probe_timeout_seconds: float = 5.0
+    health_probe_window: int = 50
+    health_probe_stt_url: str = "https://streaming.assemblyai.com/"
+    health_probe_llm_url: str = "https://generativelanguage.googleapis.com/"
+    health_probe_tts_url: Optional[str] = None
+
+    # Service backends: real vendors, or deterministic local fakes ("fake")
+    # for load and performance testing without vendor costs
+    stt_backend: str = "assemblyai"
+    llm_backend: str = "gemini"
+    tts_backend: str = "murf"
+    ws_murf_url: str = "wss://api.murf.ai/v1/speech/stream-input"
+    # Fake backends (app/services/fakes.py)
+    fake_stt_script: str = "Hello there|What can you do|Tell me something calming about the ocean"
+    fake_stt_ms_per_word: int = 250
+    fake_llm_first_token_ms: int = 300
+    fake_llm_token_ms: int = 30
+    fake_llm_response_words: int = 40
+    fake_murf_port: int = 8765
+    fake_murf_ms_per_word: int = 250
+    fake_murf_frame_delay_ms: int = 20
+    fake_redis_port: int = 6390
+
+    # Import the vendor SDKs in a background thread after startup instead of
+    # on the first turn that needs them (app/core/preload.py)
+    preload_vendor_sdks: bool = True
+
+    # Per-turn latency traces: "json" (log line), "otel" (OpenTelemetry spans
+    # when the SDK is installed), "both" or "none"
+    tracing_exporter: str = "json"
+
+    # Logging (app/core/logging.py): records are written by a background
+    # thread; per-chunk debug events are logged once every log_sample_every
+    log_level: str = "INFO"
+    log_file: Optional[str] = None
+    log_sample_every: int = 50
+
+    # Event loop monitoring (app/core/loop_monitor.py): heartbeat interval and
+    # the stall length after which the blocking stack is captured
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval_ms: int = 100
+    loop_slow_callback_ms: int = 250
+    # Token for the /admin endpoints (X-Admin-Token header); without one they
+    # are only served to direct connections from localhost
+    admin_token: Optional[str] = None
+    # How often per-request key lookups check user_keys.json for changes
+    user_keys_check_interval_seconds: float = 5.0
+
     class Config:
         env_file = ".env"
         extra = "ignore"  # Ignore extra environment variables
@@ -153,6 +394,9 @@ class Settings(BaseSettings):
 # Global settings instance
 settings = Settings()
 
+# Global user key store instance
+user_key_store = UserKeyStore(USER_KEYS_FILE, settings.user_keys_check_interval_seconds)
+
 
 
 # --- Per-request API key extraction ---
@@ -1,40 +1,148 @@
-# """Logging configuration""" # Uncomment to enable logging
-# import logging
-# import sys
-# from typing import Any
-
-
-# def setup_logging() -> None:
-#     """Configure logging for the application"""
-    
-#     # Create formatter
-#     formatter = logging.Formatter(
-#         "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-#         datefmt="%Y-%m-%d %H:%M:%S"
-#     )
-    
-#     # Console handler
-#     console_handler = logging.StreamHandler(sys.stdout)
-#     console_handler.setFormatter(formatter)
-#     console_handler.setLevel(logging.INFO)
-    
-#     # File handler (optional)
-#     file_handler = logging.FileHandler("app.log", encoding="utf-8")
-#     file_handler.setFormatter(formatter)
-#     file_handler.setLevel(logging.DEBUG)
-    
-#     # Root logger configuration
-#     root_logger = logging.getLogger()
-#     root_logger.setLevel(logging.DEBUG)
-#     root_logger.addHandler(console_handler)
-#     root_logger.addHandler(file_handler)
-    
-#     # Suppress noisy loggers
-#     logging.getLogger("httpx").setLevel(logging.WARNING)
-#     logging.getLogger("httpcore").setLevel(logging.WARNING)
-#     logging.getLogger("websockets").setLevel(logging.WARNING)
-
-
-# def get_logger(name: str) -> logging.Logger:
-#     """Get a logger instance"""
-#     return logging.getLogger(name)
+"""Logging configuration
+
+Log calls only enqueue the record: a QueueListener thread formats and writes
+it, so slow stdout/file I/O never blocks the event loop or the STT threads.
+Messages are formatted lazily (``logger.debug("x %s", value)``) in the
+listener thread, API keys are redacted before anything is written, and
+per-chunk events can be sampled with ``sampled()``.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+
+# Secrets to mask wherever they appear (bounded, most recent kept)
+_MAX_SECRETS = 256
+_secrets: "OrderedDict[str, None]" = OrderedDict()
+
+_SECRET_PATTERNS = (
+    # api_key=..., "google_api_key": "...", 'murf_api_key': '...'
+    re.compile(r"""(?i)(api[_-]?key['"]?\s*[:=]\s*['"]?)([^'"\s&,}]+)"""),
+    # Google API keys
+    re.compile(r"(AIza)[0-9A-Za-z_\-]{30,}"),
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def register_secret(value: Optional[str]):
+    """Mask this value in every log message from now on"""
+    if not value or len(value) < 8:
+        return
+    _secrets[value] = None
+    _secrets.move_to_end(value)
+    while len(_secrets) > _MAX_SECRETS:
+        _secrets.popitem(last=False)
+
+
+def redact(text: str) -> str:
+    """Replace API keys in text with a short masked prefix"""
+    for secret in list(_secrets):
+        if secret in text:
+            text = text.replace(secret, secret[:4] + "***")
+    for pattern in _SECRET_PATTERNS:
+        text = pattern.sub(lambda m: m.group(1) + "***", text)
+    return text
+
+
+class RedactingFilter(logging.Filter):
+    """Formats the record (in the listener thread) and masks secrets"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        redacted = redact(message)
+        if redacted is not message:
+            record.msg = redacted
+            record.args = None
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting to the listener thread.
+
+    The stock handler formats in the calling thread; we enqueue the record as
+    is. Arguments are therefore formatted slightly later - pass values, not
+    objects that are mutated right after the log call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class Sampler:
+    """Lets through one of every ``every`` events per key"""
+
+    def __init__(self, every: int):
+        self.every = max(1, every)
+        self._counts = {}
+
+    def __call__(self, key: str) -> bool:
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+# Sampler for per-chunk / per-frame events:
+#     if sampled("stt.interim"): logger.debug(...)
+sampled = Sampler(settings.log_sample_every)
+
+
+def setup_logging() -> None:
+    """Configure queue-based logging for the application (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    # Create formatter
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+    redacting_filter = RedactingFilter()
+
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(formatter)
+    console_handler.addFilter(redacting_filter)
+    handlers = [console_handler]
+
+    # File handler (optional)
+    if settings.log_file:
+        file_handler = logging.FileHandler(settings.log_file, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        file_handler.addFilter(redacting_filter)
+        handlers.append(file_handler)
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    # Root logger configuration
+    root_logger = logging.getLogger()
+    root_logger.setLevel(settings.log_level.upper())
+    root_logger.addHandler(_LazyQueueHandler(log_queue))
+
+    # Suppress noisy loggers
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a logger instance"""
+    return logging.getLogger(name)
@@ -0,0 +1,186 @@
+"""Event loop lag monitoring, stall capture and sampling profiler
+
+A heartbeat task on the event loop measures how late it wakes up compared to
+when it was scheduled (loop lag). A watchdog thread watches the heartbeat:
+when the loop has not ticked for ``loop_slow_callback_ms`` it grabs the loop
+thread's stack with ``sys._current_frames()`` - i.e. whatever blocking call
+(``StreamingClient.stream``, a sync Gemini iterator, ...) is holding the
+loop - and records it once per stall.
+
+``SamplingProfiler`` samples thread stacks the same way for N seconds and
+returns them in folded ("collapsed") format for flamegraph.pl / speedscope.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter as _TallyCounter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import LOOP_LAG, SLOW_CALLBACKS
+
+logger = get_logger(__name__)
+
+# Recent stalls kept for the admin endpoint
+MAX_SLOW_CALLBACKS = 50
+# Deepest stack recorded per sample
+MAX_STACK_DEPTH = 64
+
+
+# Weight of the newest lag sample in the moving average
+LAG_SMOOTHING = 0.3
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def format_stack(frame, folded: bool = False) -> List[str]:
+    """Stack of ``frame`` from the outermost call to the innermost"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        if folded:
+            # No line numbers so samples from the same function aggregate
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        else:
+            stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class LoopMonitor:
+    """Measures event loop lag and captures the stack of slow callbacks"""
+
+    def __init__(self, interval_ms: int = 100, slow_callback_ms: int = 250):
+        self.interval = interval_ms / 1000
+        self.slow_callback = slow_callback_ms / 1000
+        self.slow_callbacks: Deque[Dict[str, Any]] = deque(maxlen=MAX_SLOW_CALLBACKS)
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        # Moving average of the lag (the overload controller's signal)
+        self.avg_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Stall currently being reported by the watchdog
+        self._stall: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the heartbeat on the running loop and the watchdog thread"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Stop the heartbeat and watchdog"""
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        """Sleep for the interval and record how late the loop woke us up"""
+        while True:
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - scheduled)
+            self._last_beat = now
+            self.last_lag = lag
+            self.avg_lag += (lag - self.avg_lag) * LAG_SMOOTHING
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+            if self._stall is not None:
+                self._end_stall(lag)
+
+    def _watch(self):
+        """Watchdog thread: snapshot the loop thread while it is stalled"""
+        poll = max(0.01, self.slow_callback / 4)
+        while not self._stop.wait(poll):
+            overdue = time.monotonic() - self._last_beat - self.interval
+            if overdue >= self.slow_callback and self._stall is None:
+                self._begin_stall(overdue)
+
+    def _begin_stall(self, overdue: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stall = {
+            "detected_at": time.time(),
+            "blocked_ms_when_detected": round(overdue * 1000, 1),
+            "stack": format_stack(frame) if frame is not None else [],
+        }
+        self._stall = stall
+        self.slow_callbacks.append(stall)
+        SLOW_CALLBACKS.inc()
+
+    def _end_stall(self, lag: float):
+        stall, self._stall = self._stall, None
+        stall["blocked_ms"] = round(lag * 1000, 1)
+        logger.warning("Event loop blocked for %.0fms in %s", lag * 1000,
+                       stall["stack"][-1] if stall["stack"] else "unknown")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current lag figures and the most recent stalls"""
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "slow_callback_ms": self.slow_callback * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "avg_lag_ms": round(self.avg_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "slow_callbacks": list(self.slow_callbacks),
+        }
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling thread stacks from a background thread"""
+
+    def __init__(self, thread_id: Optional[int] = None):
+        # None samples every thread except the profiler itself
+        self.thread_id = thread_id
+        self.samples = 0
+        self._stacks: "_TallyCounter[str]" = _TallyCounter()
+
+    def run(self, seconds: float, hz: int) -> str:
+        """Sample for ``seconds`` (blocking) and return folded stacks"""
+        interval = 1.0 / hz
+        deadline = time.monotonic() + seconds
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or (self.thread_id is not None and thread_id != self.thread_id):
+                    continue
+                stack = format_stack(frame, folded=True)
+                root = names.get(thread_id, str(thread_id))
+                self._stacks[";".join([root] + stack)] += 1
+            self.samples += 1
+            time.sleep(interval)
+        return self.folded()
+
+    def folded(self) -> str:
+        """``frame;frame;frame count`` lines, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+# Global monitor instance (started on application startup)
+loop_monitor = LoopMonitor(settings.loop_monitor_interval_ms, settings.loop_slow_callback_ms)
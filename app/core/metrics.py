@@ -0,0 +1,202 @@
+"""Low-overhead in-process metrics with Prometheus text exposition
+
+Collectors are plain Python objects updated without locks: increments run on
+the event loop (or under the GIL from STT threads), where a rare lost update
+is an acceptable price for keeping locks off the audio hot path.
+"""
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value, optionally split by labels"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+                for labels, value in list(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is computed at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self._value = 0.0
+        self._callback = callback
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1.0):
+        self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self._value -= amount
+
+    def value(self) -> float:
+        if self._callback is not None:
+            try:
+                return float(self._callback())
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self.value()}"]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket histogram, optionally split by labels"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket"
+                             f"{_format_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together at scrape time"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and voice pipeline metrics
+registry = Registry()
+
+STAGE_LATENCY = registry.register(Histogram(
+    "voice_stage_latency_seconds", "Latency of voice pipeline stages per turn", ["stage"]))
+TURNS = registry.register(Counter(
+    "voice_turns_total", "Completed conversational turns"))
+LLM_CHUNKS = registry.register(Counter(
+    "llm_chunks_total", "LLM response chunks streamed to clients"))
+TTS_BYTES = registry.register(Counter(
+    "tts_audio_bytes_total", "Synthesized audio bytes sent to clients"))
+TTS_CHARS = registry.register(Counter(
+    "tts_text_chars_total", "Characters of LLM responses and of the speakable text sent to TTS", ["stage"]))
+AUDIO_FRAMES = registry.register(Counter(
+    "audio_frames_received_total", "Microphone audio frames received from clients"))
+AUDIO_FRAMES_DROPPED = registry.register(Counter(
+    "audio_frames_dropped_total", "Microphone audio frames dropped (no active transcriber)"))
+RESPONSE_CACHE = registry.register(Counter(
+    "response_cache_requests_total", "Response cache lookups by result", ["result"]))
+ACTIVE_SESSIONS = registry.register(Gauge(
+    "ws_active_sessions", "Open /ws sessions"))
+SESSION_RESUMES = registry.register(Counter(
+    "ws_session_resumes_total", "Reconnects with a resume token by outcome", ["outcome"]))
+REPLAYED_MESSAGES = registry.register(Counter(
+    "ws_replayed_messages_total", "Outbound messages replayed to resumed sessions"))
+SCHEDULER_WAIT = registry.register(Histogram(
+    "scheduler_wait_seconds", "Time turns waited for an LLM/TTS slot"))
+SCHEDULER_REJECTED = registry.register(Counter(
+    "scheduler_rejected_turns_total", "Turns refused or dropped by the scheduler by reason", ["reason"]))
+OVERLOAD_TRANSITIONS = registry.register(Counter(
+    "overload_transitions_total", "Changes of the load shedding level by new level", ["level"]))
+SHED = registry.register(Counter(
+    "overload_shed_total", "Work skipped by load shedding", ["kind"]))
+SESSION_LIMITS = registry.register(Counter(
+    "ws_session_limits_total", "Sessions stopped or throttled by a resource limit", ["limit"]))
+WS_DEFLATE_BYTES = registry.register(Counter(
+    "ws_deflate_bytes_total", "Outgoing /ws message bytes before and after permessage-deflate", ["stage"]))
+WS_DEFLATE_SKIPPED = registry.register(Counter(
+    "ws_deflate_skipped_total", "Outgoing /ws messages sent uncompressed by the policy by reason", ["reason"]))
+CIRCUIT_TRANSITIONS = registry.register(Counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes by upstream and new state",
+    ["upstream", "state"]))
+CIRCUIT_REJECTED = registry.register(Counter(
+    "circuit_breaker_rejected_total", "Calls failed fast by an open circuit breaker", ["upstream"]))
+RETRIES = registry.register(Counter(
+    "upstream_retries_total", "Retries of failed upstream calls by outcome", ["upstream", "outcome"]))
+UPSTREAM_PROBE_LATENCY = registry.register(Histogram(
+    "upstream_probe_latency_seconds", "Round trip of the background health probes by service", ["service"]))
+UPSTREAM_PROBE_FAILURES = registry.register(Counter(
+    "upstream_probe_failures_total", "Health probes that got no HTTP response by service", ["service"]))
+LOOP_LAG = registry.register(Histogram(
+    "event_loop_lag_seconds", "Delay of the loop monitor heartbeat past its scheduled time",
+    buckets=LOOP_LAG_BUCKETS))
+SLOW_CALLBACKS = registry.register(Counter(
+    "event_loop_slow_callbacks_total", "Event loop stalls longer than the slow callback threshold"))
+
+
+def record_turn(spans_ms: Dict[str, float]):
+    """Feed a finished turn trace into the stage latency histograms"""
+    TURNS.inc()
+    for stage, duration_ms in spans_ms.items():
+        STAGE_LATENCY.observe(duration_ms / 1000, stage)
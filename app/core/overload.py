@@ -0,0 +1,164 @@
+"""Overload controller: progressive load shedding with hysteresis
+
+Three signals are read every ``overload_check_interval_ms``: event loop
+lag (the smoothed heartbeat lag of app/core/loop_monitor.py, so 0 when
+``LOOP_MONITOR_ENABLED`` is off), the number of messages waiting in all
+outbound queues, and the number of TTS syntheses in flight. Each signal maps to a level through its three thresholds and the
+highest one wins:
+
+    0 NORMAL            everything enabled
+    1 SHED_INTERIM      interim transcripts are not sent
+    2 TEXT_ONLY         responses skip TTS (``text_only`` flag on the reply)
+    3 REFUSE_RECORDING  new recordings are refused with a ``busy`` message
+
+The level rises as soon as a threshold is crossed. It falls one level at a
+time, and only after every signal has stayed below ``overload_recover_ratio``
+of the current level's thresholds for ``overload_cooldown_seconds``, so the
+service does not flap around a threshold.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import registry, Gauge, OVERLOAD_TRANSITIONS
+
+logger = get_logger(__name__)
+
+NORMAL = 0
+SHED_INTERIM = 1
+TEXT_ONLY = 2
+REFUSE_RECORDING = 3
+
+LEVEL_NAMES = ("normal", "shed_interim", "text_only", "refuse_recording")
+
+
+def parse_thresholds(value: str) -> Tuple[float, float, float]:
+    """``"100,250,500"`` -> thresholds for levels 1, 2 and 3"""
+    parts = tuple(float(p) for p in value.split(","))
+    if len(parts) != 3 or list(parts) != sorted(parts):
+        raise ValueError(f"expected three ascending thresholds, got {value!r}")
+    return parts  # type: ignore[return-value]
+
+
+def level_for(value: float, thresholds: Sequence[float]) -> int:
+    """Highest level whose threshold ``value`` reaches"""
+    level = NORMAL
+    for index, threshold in enumerate(thresholds, 1):
+        if value >= threshold:
+            level = index
+    return level
+
+
+class OverloadController:
+    """Derives the shedding level from loop lag, queue depth and TTS in flight"""
+
+    def __init__(self,
+                 interval_ms: Optional[int] = None,
+                 recover_ratio: Optional[float] = None,
+                 cooldown_seconds: Optional[float] = None):
+        self.interval = (interval_ms or settings.overload_check_interval_ms) / 1000
+        self.recover_ratio = recover_ratio or settings.overload_recover_ratio
+        self.cooldown = settings.overload_cooldown_seconds if cooldown_seconds is None else cooldown_seconds
+        self.thresholds: Dict[str, Tuple[float, float, float]] = {
+            "loop_lag_ms": parse_thresholds(settings.overload_loop_lag_ms),
+            "queue_depth": parse_thresholds(settings.overload_queue_depth),
+            "tts_in_flight": parse_thresholds(settings.overload_tts_in_flight),
+        }
+        self.level = NORMAL
+        self.tts_in_flight = 0
+        # Set by the WebSocket handler module: total outbound queue depth
+        self.queue_depth_source: Callable[[], int] = lambda: 0
+        self._calm_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start sampling on the running loop"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @contextmanager
+    def tts(self) -> Iterator[None]:
+        """Count a TTS synthesis as in flight for the duration of the block"""
+        self.tts_in_flight += 1
+        try:
+            yield
+        finally:
+            self.tts_in_flight -= 1
+
+    def signals(self) -> Dict[str, float]:
+        try:
+            queue_depth = self.queue_depth_source()
+        except Exception:
+            queue_depth = 0
+        return {
+            "loop_lag_ms": loop_monitor.avg_lag * 1000,
+            "queue_depth": queue_depth,
+            "tts_in_flight": self.tts_in_flight,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.evaluate()
+
+    def evaluate(self, now: Optional[float] = None) -> int:
+        """Update the level from the current signals"""
+        now = time.monotonic() if now is None else now
+        signals = self.signals()
+        target = max(level_for(signals[name], limits) for name, limits in self.thresholds.items())
+
+        if target > self.level:
+            self._set_level(target, signals)
+            self._calm_since = None
+        elif self.level > NORMAL and self._below_recovery(signals):
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.cooldown:
+                self._set_level(self.level - 1, signals)
+                self._calm_since = now
+        else:
+            self._calm_since = None
+        return self.level
+
+    def _below_recovery(self, signals: Dict[str, float]) -> bool:
+        """Every signal is comfortably below the current level's thresholds"""
+        index = self.level - 1
+        return all(signals[name] < limits[index] * self.recover_ratio
+                   for name, limits in self.thresholds.items())
+
+    def _set_level(self, level: int, signals: Dict[str, float]):
+        previous, self.level = self.level, level
+        OVERLOAD_TRANSITIONS.inc(1, LEVEL_NAMES[level])
+        log = logger.warning if level > previous else logger.info
+        log("Overload level %s -> %s (loop lag %.0fms, queued %s, TTS in flight %s)",
+            LEVEL_NAMES[previous], LEVEL_NAMES[level], signals["loop_lag_ms"],
+            signals["queue_depth"], signals["tts_in_flight"])
+
+    def snapshot(self) -> Dict[str, object]:
+        return {"level": LEVEL_NAMES[self.level], "signals": self.signals()}
+
+
+# Global controller instance (started on application startup)
+overload = OverloadController()
+
+registry.register(Gauge("overload_level", "Load shedding level (0 normal .. 3 refusing recordings)",
+                        callback=lambda: overload.level))
+registry.register(Gauge("tts_in_flight", "TTS syntheses in progress",
+                        callback=lambda: overload.tts_in_flight))
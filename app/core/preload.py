@@ -0,0 +1,57 @@
+"""Background preloading of the vendor SDKs
+
+The STT, LLM and TTS service modules (and the search scraper's httpx and
+bs4) are imported on first use, so the app starts listening without paying
+for assemblyai, google.generativeai (gRPC, protobuf) and friends. To keep
+that cost off the first conversational turn as well, a daemon thread imports
+them right after startup. A request that needs a module while it is still
+being loaded simply waits on Python's import lock for it.
+"""
+import importlib
+import threading
+import time
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_thread: Optional[threading.Thread] = None
+
+
+def modules_to_preload() -> List[str]:
+    """Modules the configured backends will import on their first use"""
+    modules = []
+    if settings.stt_backend != "fake":
+        modules.append("app.services.stt_service")
+    if settings.llm_backend != "fake":
+        modules.append("app.services.llm_service")
+    # The fake TTS backend also uses the real Murf client
+    modules.append("app.services.tts_service")
+    if settings.stt_backend == "fake" or settings.llm_backend == "fake":
+        modules.append("app.services.fakes")
+    modules.extend(("httpx", "bs4"))
+    return modules
+
+
+def _preload(modules: List[str]):
+    started = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # Surfaces again, with context, when the module is first used
+            logger.warning("Preloading %s failed: %s", name, e)
+    logger.info("Preloaded %s modules in %.0fms", len(modules),
+                (time.perf_counter() - started) * 1000)
+
+
+def start_preload() -> Optional[threading.Thread]:
+    """Import the vendor SDKs in a daemon thread (once per process)"""
+    global _thread
+    if _thread is None:
+        _thread = threading.Thread(target=_preload, args=(modules_to_preload(),),
+                                   name="vendor-preload", daemon=True)
+        _thread.start()
+    return _thread
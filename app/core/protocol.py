@@ -0,0 +1,189 @@
+"""Wire protocols for the /ws endpoint
+
+Two codecs share one interface so the handler does not care which is in use:
+
+``JsonCodec`` (default)
+    JSON text frames, raw binary frames for microphone PCM, and TTS audio as
+    base64 inside a ``tts_response`` JSON message. Outbound messages carry a
+    ``seq`` field.
+
+``BinaryCodec`` (subprotocol ``calm-guide.binary.v1``)
+    Every message, in both directions, is a binary frame with a fixed
+    20-byte big-endian header followed by optional JSON metadata and a raw
+    body::
+
+        version   u8    protocol version (1)
+        type      u8    FRAME_JSON or FRAME_AUDIO
+        flags     u16   reserved, 0
+        seq       u32   per-direction sequence number
+        timestamp u64   sender monotonic clock, microseconds
+        meta_len  u32   length of the JSON metadata that follows
+
+    JSON messages carry the message as metadata and no body; their ISO
+    ``timestamp`` field is dropped in favour of the header timestamp. Audio
+    frames carry ``{"type": "tts_response", "turn_id": ...}`` as metadata
+    and the WAV bytes as the body (client -> server: no metadata, PCM body),
+    so the browser never base64-decodes megabyte strings.
+
+Clients opt in by offering the subprotocol when connecting; anything else
+gets the JSON protocol. Outbound sequence numbers are what a reconnecting
+client acknowledges with ``last_seq`` (see ``app/core/resume.py``).
+"""
+import base64
+import struct
+import time
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+from app.core.serialization import (
+    MessageTemplate, PreparedMessage, dumps_bytes, loads, prepare, serialize
+)
+
+SUBPROTOCOL = "calm-guide.binary.v1"
+VERSION = 1
+
+HEADER = struct.Struct("!BBHIQI")
+
+FRAME_JSON = 1
+FRAME_AUDIO = 2
+
+# Inbound message kinds returned by Codec.decode
+INBOUND_JSON = "json"
+INBOUND_AUDIO = "audio"
+
+# Pre-built JSON for audio messages: the turn ID is hex, the timestamp ISO 8601
+# and the audio base64, so none of them needs escaping
+TTS_RESPONSE = MessageTemplate(
+    "tts_response", ("turn_id", "audio", "timestamp"), safe=("turn_id", "audio", "timestamp"))
+
+
+class FrameError(ValueError):
+    """Malformed binary frame"""
+
+
+class Frame(NamedTuple):
+    type: int
+    flags: int
+    seq: int
+    timestamp_us: int
+    meta: Optional[Dict[str, Any]]
+    body: bytes
+
+
+class PreparedFrame(NamedTuple):
+    """A binary-protocol message ready for framing (seq is assigned at send)"""
+    type: str
+    turn_id: Optional[str]
+    frame_type: int
+    meta: bytes
+    body: bytes
+
+
+def monotonic_us() -> int:
+    return time.monotonic_ns() // 1000
+
+
+def encode_frame(frame_type: int, seq: int, meta: bytes = b"", body: bytes = b"",
+                 flags: int = 0, timestamp_us: Optional[int] = None) -> bytes:
+    """Header + metadata + body"""
+    if timestamp_us is None:
+        timestamp_us = monotonic_us()
+    header = HEADER.pack(VERSION, frame_type, flags, seq & 0xFFFFFFFF, timestamp_us, len(meta))
+    return b"".join((header, meta, body))
+
+
+def decode_frame(data: bytes) -> Frame:
+    """Parse a binary frame; raises FrameError when malformed"""
+    if len(data) < HEADER.size:
+        raise FrameError(f"frame shorter than header ({len(data)} bytes)")
+    version, frame_type, flags, seq, timestamp_us, meta_len = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise FrameError(f"unsupported protocol version {version}")
+    end = HEADER.size + meta_len
+    if end > len(data):
+        raise FrameError("metadata length exceeds frame")
+    meta = loads(data[HEADER.size:end]) if meta_len else None
+    return Frame(frame_type, flags, seq, timestamp_us, meta, data[end:])
+
+
+class JsonCodec:
+    """JSON text protocol (the original /ws protocol)"""
+
+    subprotocol: Optional[str] = None
+    binary = False
+
+    def __init__(self):
+        self.seq = 0
+
+    def prepare(self, message: Dict[str, Any]) -> PreparedMessage:
+        """Serialize a message ahead of queueing it"""
+        return prepare(message)
+
+    def audio(self, turn_id: str, audio: bytes, timestamp: str) -> PreparedMessage:
+        """TTS audio message (base64 WAV in JSON)"""
+        audio_b64 = base64.b64encode(audio).decode("ascii")
+        return TTS_RESPONSE.prepare(turn_id=turn_id, audio=audio_b64, timestamp=timestamp)
+
+    def encode(self, message: Union[Dict[str, Any], PreparedMessage]) -> str:
+        """Payload for the socket (text frame); assigns the sequence number"""
+        self.seq += 1
+        # Spliced in rather than re-encoding already prepared messages
+        return '{"seq":%d,%s' % (self.seq, serialize(message)[1:])
+
+    def decode(self, message: Dict[str, Any]) -> Tuple[str, Any]:
+        """Classify an ASGI receive message as (INBOUND_JSON, dict) or (INBOUND_AUDIO, bytes)"""
+        if message.get("text") is not None:
+            return INBOUND_JSON, loads(message["text"])
+        return INBOUND_AUDIO, message.get("bytes") or b""
+
+
+class BinaryCodec:
+    """Framed binary protocol (``SUBPROTOCOL``)"""
+
+    subprotocol: Optional[str] = SUBPROTOCOL
+    binary = True
+
+    def __init__(self):
+        self.seq = 0
+
+    def prepare(self, message: Dict[str, Any]) -> PreparedFrame:
+        """Serialize a message ahead of queueing it"""
+        if "timestamp" in message:
+            # The frame header carries the timestamp
+            message = {k: v for k, v in message.items() if k != "timestamp"}
+        return PreparedFrame(message["type"], message.get("turn_id"), FRAME_JSON, dumps_bytes(message), b"")
+
+    def audio(self, turn_id: str, audio: bytes, timestamp: Optional[str] = None) -> PreparedFrame:
+        """TTS audio message (raw WAV body)"""
+        meta = dumps_bytes({"type": "tts_response", "turn_id": turn_id})
+        return PreparedFrame("tts_response", turn_id, FRAME_AUDIO, meta, audio)
+
+    def encode(self, message: Union[Dict[str, Any], PreparedFrame]) -> bytes:
+        """Payload for the socket (binary frame); assigns the sequence number"""
+        if isinstance(message, dict):
+            message = self.prepare(message)
+        self.seq += 1
+        return encode_frame(message.frame_type, self.seq, message.meta, message.body)
+
+    def decode(self, message: Dict[str, Any]) -> Tuple[str, Any]:
+        """Classify an ASGI receive message as (INBOUND_JSON, dict) or (INBOUND_AUDIO, bytes)"""
+        if message.get("text") is not None:
+            # Plain JSON text commands are still accepted
+            return INBOUND_JSON, loads(message["text"])
+        frame = decode_frame(message.get("bytes") or b"")
+        if frame.type == FRAME_JSON:
+            if not isinstance(frame.meta, dict):
+                raise FrameError("JSON frame without metadata")
+            return INBOUND_JSON, frame.meta
+        if frame.type == FRAME_AUDIO:
+            return INBOUND_AUDIO, frame.body
+        raise FrameError(f"unknown frame type {frame.type}")
+
+
+Codec = Union[JsonCodec, BinaryCodec]
+
+
+def negotiate(subprotocols) -> Codec:
+    """Pick the codec for the subprotocols offered by the client"""
+    if subprotocols and SUBPROTOCOL in subprotocols:
+        return BinaryCodec()
+    return JsonCodec()
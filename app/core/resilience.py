@@ -0,0 +1,267 @@
+"""Circuit breakers and budgeted retries for the upstream vendors
+
+Each upstream (``gemini``, ``murf``, ``assemblyai``) has one breaker shared by
+every session of the worker. It keeps the outcomes of the last
+``breaker_window`` calls and opens when the share of failures reaches
+``breaker_failure_rate`` or the share of calls slower than
+``breaker_slow_call_seconds`` reaches ``breaker_slow_call_rate``. While open,
+calls fail at once with ``CircuitOpen`` instead of waiting for a timeout;
+after ``breaker_open_seconds`` a few trial calls are let through (half-open)
+and their outcome closes or re-opens the breaker.
+
+Failed calls are retried with full-jitter exponential backoff, but every
+retry is paid for from a budget shared by all upstreams: each first attempt
+deposits ``retry_budget_ratio`` of a token, each retry spends one. When a
+vendor is down, retries stop once the budget is spent rather than
+multiplying the load on it.
+
+Errors caused by the caller (HTTP 4xx such as a bad API key, except 408/429)
+are neither retried nor counted against the upstream - one user's invalid
+key must not open the breaker for everyone.
+"""
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import CIRCUIT_TRANSITIONS, CIRCUIT_REJECTED, RETRIES
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Client-facing names of the upstreams
+SERVICE_NAMES = {"gemini": "AI", "murf": "Text-to-speech", "assemblyai": "Speech recognition"}
+
+
+class CircuitOpen(Exception):
+    """The upstream's breaker is open: fail fast"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        self.upstream = upstream
+        self.retry_after = round(max(0.0, retry_after), 1)
+        super().__init__(f"{SERVICE_NAMES.get(upstream, upstream)} service is temporarily unavailable")
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status behind a vendor SDK error, when there is one"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code  # google.api_core exceptions
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None  # websockets InvalidStatus, httpx
+
+
+def is_caller_error(error: BaseException) -> bool:
+    """True for 4xx errors (bad key, bad request) that retrying cannot fix"""
+    code = status_code(error)
+    return code is not None and 400 <= code < 500 and code not in (408, 429)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)"""
+    ceiling = min(settings.retry_max_delay_ms, settings.retry_base_delay_ms * 2 ** attempt)
+    return random.uniform(0, ceiling) / 1000
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a share of first attempts"""
+
+    def __init__(self, ratio: Optional[float] = None, min_per_second: Optional[float] = None,
+                 max_tokens: float = 10.0):
+        self.ratio = settings.retry_budget_ratio if ratio is None else ratio
+        # Trickle so a quiet worker can still retry the occasional failure
+        self.min_per_second = settings.retry_budget_min_per_second if min_per_second is None else min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount: float):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + amount + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Record a first attempt"""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def withdraw(self) -> bool:
+        """Take one retry from the budget, if any is left"""
+        with self._lock:
+            self._refill(0.0)
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Error-rate and slow-call-rate breaker over a window of recent calls"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.enabled = settings.circuit_breaker_enabled
+        self.min_calls = settings.breaker_min_calls
+        self.failure_rate = settings.breaker_failure_rate
+        self.slow_call_seconds = settings.breaker_slow_call_seconds
+        self.slow_call_rate = settings.breaker_slow_call_rate
+        self.open_seconds = settings.breaker_open_seconds
+        self.half_open_calls = settings.breaker_half_open_calls
+        self.state = CLOSED
+        # (failed, slow) per call; STT errors arrive on SDK threads
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=settings.breaker_window)
+        self._opened_at = 0.0
+        self._trials = 0  # Half-open calls in flight
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise ``CircuitOpen`` while open, without taking a trial slot"""
+        if self.enabled and self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - time.monotonic()
+            if remaining > 0:
+                CIRCUIT_REJECTED.inc(1, self.name)
+                raise CircuitOpen(self.name, remaining)
+
+    def acquire(self):
+        """Admit a call or raise ``CircuitOpen``; pair with record_*/release"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    CIRCUIT_REJECTED.inc(1, self.name)
+                    raise CircuitOpen(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    CIRCUIT_REJECTED.inc(1, self.name)
+                    raise CircuitOpen(self.name, 1.0)
+                self._trials += 1
+
+    def record_success(self, duration: float):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+                if slow:
+                    self._transition(OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._transition(CLOSED)
+                return
+            self._outcomes.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+                self._transition(OPEN)
+                return
+            self._outcomes.append((True, False))
+            self._evaluate()
+
+    def release(self):
+        """End a call whose outcome says nothing about the upstream"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+
+    def _evaluate(self):
+        if self.state != CLOSED or len(self._outcomes) < self.min_calls:
+            return
+        calls = len(self._outcomes)
+        failures = sum(1 for failed, _ in self._outcomes if failed)
+        slow = sum(1 for _, was_slow in self._outcomes if was_slow)
+        if failures / calls >= self.failure_rate or slow / calls >= self.slow_call_rate:
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state in (OPEN, CLOSED):
+            self._outcomes.clear()
+        self._trials = 0
+        self._trial_successes = 0
+        CIRCUIT_TRANSITIONS.inc(1, self.name, state)
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuit breaker %s: %s -> %s", self.name, previous, state)
+
+    def snapshot(self) -> Dict[str, object]:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failure_rate": round(sum(1 for f, _ in self._outcomes if f) / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(sum(1 for _, s in self._outcomes if s) / calls, 3) if calls else 0.0,
+            "retry_after": round(max(0.0, self._opened_at + self.open_seconds - time.monotonic()), 1)
+                           if self.state == OPEN else 0.0,
+        }
+
+
+# Global breakers (one per upstream) and the shared retry budget
+_breakers: Dict[str, CircuitBreaker] = {}
+retry_budget = RetryBudget()
+
+
+def circuit_breaker(upstream: str) -> CircuitBreaker:
+    """Breaker of ``upstream``, created on first use"""
+    breaker = _breakers.get(upstream)
+    if breaker is None:
+        breaker = _breakers.setdefault(upstream, CircuitBreaker(upstream))
+    return breaker
+
+
+def breakers_snapshot() -> Dict[str, object]:
+    return {
+        "breakers": {name: breaker.snapshot() for name, breaker in sorted(_breakers.items())},
+        "retry_budget_tokens": round(retry_budget.tokens, 2),
+    }
+
+
+async def call_with_retries(upstream: str, attempt: Callable[[], Awaitable[T]]) -> T:
+    """Run ``attempt`` through the upstream's breaker, retrying failures within budget"""
+    breaker = circuit_breaker(upstream)
+    retry_budget.deposit()
+    retry = 0
+    while True:
+        breaker.acquire()
+        started = time.monotonic()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception as e:
+            if is_caller_error(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            if retry >= settings.retry_max_attempts:
+                raise
+            if not retry_budget.withdraw():
+                RETRIES.inc(1, upstream, "budget_exhausted")
+                raise
+            delay = backoff_delay(retry)
+            retry += 1
+            RETRIES.inc(1, upstream, "retried")
+            logger.info("%s call failed (%s), retry %s in %.0fms", upstream, e, retry, delay * 1000)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success(time.monotonic() - started)
+        return result
@@ -0,0 +1,109 @@
+"""Session resume tokens and the outbound replay buffer
+
+A client that loses its WebSocket reconnects with the ``resume_token`` from
+its ``connection`` message and the sequence number of the last message it
+received. The token is ``<session_id>.<HMAC-SHA256>``, so session IDs cannot
+be guessed or forged. If the session's handler is still parked on this
+worker, every message sent after ``last_seq`` is replayed from its buffer -
+including audio synthesized while the client was away - and the turn does
+not have to be repeated. Otherwise the session is restored from the session
+store (history only). While connected, the client periodically acknowledges
+the last sequence number it received, and acknowledged messages are dropped
+from the buffer.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+from collections import deque
+from typing import Deque, List, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _load_secret() -> bytes:
+    secret = settings.session_secret or os.getenv("MASTER_KEY")
+    if secret:
+        return hashlib.sha256(b"calm-guide.resume." + secret.encode("utf-8")).digest()
+    if settings.session_store != "memory":
+        logger.warning("SESSION_SECRET is not set: resume tokens only work on the worker that issued them")
+    return secrets.token_bytes(32)
+
+
+_SECRET = _load_secret()
+
+
+def _signature(session_id: str) -> str:
+    digest = hmac.new(_SECRET, session_id.encode("ascii"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+
+def issue_token(session_id: str) -> str:
+    """Resume token for a session ID"""
+    return f"{session_id}.{_signature(session_id)}"
+
+
+def verify_token(token: Optional[str]) -> Optional[str]:
+    """Session ID of a valid resume token, None otherwise"""
+    if not token or "." not in token:
+        return None
+    session_id, signature = token.rsplit(".", 1)
+    try:
+        expected = _signature(session_id)
+    except UnicodeEncodeError:
+        return None
+    if not hmac.compare_digest(signature, expected):
+        return None
+    return session_id
+
+
+Payload = Union[str, bytes]
+
+
+class ReplayBuffer:
+    """Most recent outbound payloads by sequence number, bounded by count and size.
+
+    The newest payload is always kept, even if it alone exceeds ``max_bytes``
+    (a long TTS answer), so the message a client most likely missed survives.
+    """
+
+    def __init__(self, max_messages: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_messages = max_messages or settings.session_replay_max_messages
+        self.max_bytes = max_bytes or settings.session_replay_max_bytes
+        self._items: Deque[Tuple[int, Payload]] = deque()
+        self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def append(self, seq: int, payload: Payload):
+        self._items.append((seq, payload))
+        self._bytes += len(payload)
+        while len(self._items) > 1 and (len(self._items) > self.max_messages or self._bytes > self.max_bytes):
+            _, old = self._items.popleft()
+            self._bytes -= len(old)
+
+    def ack(self, last_seq: int):
+        """Drop the payloads the client has confirmed receiving"""
+        while self._items and self._items[0][0] <= last_seq:
+            _, old = self._items.popleft()
+            self._bytes -= len(old)
+
+    def since(self, last_seq: int) -> Tuple[List[Payload], bool]:
+        """Payloads after ``last_seq`` and whether some were already evicted (a gap)"""
+        if not self._items:
+            return [], False
+        gap = self._items[0][0] > last_seq + 1
+        return [payload for seq, payload in self._items if seq > last_seq], gap
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
@@ -0,0 +1,126 @@
+"""JSON serialization for WebSocket messages
+
+Uses orjson or msgspec when installed and falls back to the standard library.
+Messages can be serialized before they are queued (``prepare``) so the work
+happens where the message is produced - e.g. on the STT thread - rather than
+in the sender task. ``MessageTemplate`` pre-builds the JSON of a fixed-shape
+message and inserts fields declared ``safe`` (base64 audio, hex IDs, ISO
+timestamps) verbatim: for a megabyte of base64 audio that skips the encoder's
+escape scan and copy entirely. For small messages a single orjson call on
+the dict is faster than a template, so only use templates for large payloads.
+"""
+import json
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Union
+
+try:
+    import orjson
+    BACKEND = "orjson"
+except ImportError:
+    orjson = None  # type: ignore
+    try:
+        import msgspec
+        BACKEND = "msgspec"
+    except ImportError:
+        msgspec = None  # type: ignore
+        BACKEND = "json"
+
+if BACKEND == "orjson":
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return orjson.dumps(obj)
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Parse JSON text or bytes"""
+        return orjson.loads(data)
+
+    JSONDecodeError = orjson.JSONDecodeError
+
+elif BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return _encoder.encode(obj)
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Parse JSON text or bytes"""
+        return _decoder.decode(data)
+
+    JSONDecodeError = msgspec.DecodeError
+
+else:
+    _json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumps_bytes(obj: Any) -> bytes:
+        """Serialize to UTF-8 JSON bytes"""
+        return _json_encoder.encode(obj).encode("utf-8")
+
+    def loads(data: Union[str, bytes]) -> Any:
+        """Parse JSON text or bytes"""
+        return json.loads(data)
+
+    JSONDecodeError = json.JSONDecodeError
+
+
+if BACKEND == "json":
+    def dumps(obj: Any) -> str:
+        """Serialize to a JSON string (for text frames)"""
+        return _json_encoder.encode(obj)
+else:
+    def dumps(obj: Any) -> str:
+        """Serialize to a JSON string (for text frames)"""
+        # Text frames need str; decoding the encoder's UTF-8 output is a
+        # single pass and still far cheaper than json.dumps
+        return dumps_bytes(obj).decode("utf-8")
+
+
+class PreparedMessage(NamedTuple):
+    """A message already serialized, with the fields the sender inspects"""
+    type: str
+    turn_id: Optional[str]
+    text: str
+
+
+class MessageTemplate:
+    """Pre-built JSON for a message type with a fixed set of fields"""
+
+    def __init__(self, message_type: str, fields: Iterable[str], safe: Iterable[str] = ()):
+        self.type = message_type
+        self.fields = tuple(fields)
+        self.safe = tuple(name for name in self.fields if name in frozenset(safe))
+        self._encoded = tuple(name for name in self.fields if name not in self.safe)
+        self._head = '{"type":' + dumps(message_type)
+        self._safe_keys = tuple(',' + dumps(name) + ':"' for name in self.safe)
+
+    def render(self, **values: Any) -> str:
+        """JSON text for the message; every declared field is required"""
+        parts = [self._head]
+        for name, key in zip(self.safe, self._safe_keys):
+            parts.append(key)
+            parts.append(values[name])
+            parts.append('"')
+        if self._encoded:
+            # One encoder call for all fields that may need escaping
+            body = dumps({name: values[name] for name in self._encoded})
+            parts.append(',')
+            parts.append(body[1:])
+        else:
+            parts.append('}')
+        return "".join(parts)
+
+    def prepare(self, **values: Any) -> PreparedMessage:
+        """Render into a PreparedMessage for the send queue"""
+        return PreparedMessage(self.type, values.get("turn_id"), self.render(**values))
+
+
+def prepare(message: Dict[str, Any]) -> PreparedMessage:
+    """Serialize a message dict ahead of queueing it"""
+    return PreparedMessage(message["type"], message.get("turn_id"), dumps(message))
+
+
+def serialize(message: Union[Dict[str, Any], PreparedMessage]) -> str:
+    """JSON text for a queued message (dict or already prepared)"""
+    if isinstance(message, PreparedMessage):
+        return message.text
+    return dumps(message)
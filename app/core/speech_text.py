@@ -0,0 +1,187 @@
+"""Markdown to speakable text, incrementally as the LLM streams
+
+The LLM answers in markdown. Sent to Murf as-is, bullets, asterisks, code
+and URLs are billed and either read out or turned into odd pauses.
+``SpeechNormalizer`` consumes the response chunk by chunk and returns
+sentence segments ready for synthesis:
+
+- heading, list, quote and table markers are removed; list items and
+  headings end with a period so they are read as separate phrases
+- emphasis, strikethrough and inline code keep their text only;
+  ``[text](url)`` becomes its text, ``![alt](url)`` its alt text
+- bare URLs become "link to <domain>"
+- a fenced code block becomes one sentence pointing at the text reply
+
+A segment is returned once it can no longer change: a finished line, or a
+finished sentence inside a line whose inline markup is closed. ``to_speech``
+normalizes a complete text in one call.
+"""
+import re
+import urllib.parse
+from typing import List
+
+CODE_BLOCK_PHRASE = "There is a code example in the text reply."
+
+# Line prefixes: bullets, numbered items, headings and block quotes
+_LINE_PREFIX = re.compile(r"\s*(?:[-*+]|\d{1,3}[.)]|#{1,6}|>+)[ \t]+")
+_FENCE = re.compile(r"\s*(?:```|~~~)")
+_RULE = re.compile(r"\s*(?:[-*_]\s*){3,}$")
+_TABLE_SEPARATOR = re.compile(r"\s*\|?\s*:?-{2,}:?\s*(?:\|\s*:?-{2,}:?\s*)*\|?\s*$")
+
+_IMAGE = re.compile(r"!\[([^\]]*)\]\([^)]*\)")
+_LINK = re.compile(r"\[([^\]]+)\]\([^)\s]*(?:\s+\"[^\"]*\")?\)")
+_INLINE_CODE = re.compile(r"`+([^`]+)`+")
+_URL = re.compile(r"<?(?:https?://|www\.)[^\s<>`()\[\]]+>?")
+_STRONG = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_EMPHASIS = re.compile(r"(?<![\w*])\*(?=\S)(.+?)(?<=\S)\*(?![\w*])|(?<![\w_])_(?=\S)(.+?)(?<=\S)_(?![\w_])")
+_STRIKE = re.compile(r"~~(.+?)~~")
+_HTML_BREAK = re.compile(r"<br\s*/?>", re.IGNORECASE)
+_STRAY_MARKUP = re.compile(r"\*\*|__|~~|`")
+_SPACES = re.compile(r"\s+")
+
+# A sentence ends at . ! ? (plus closing quotes/brackets) followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]*\s+")
+_TERMINAL = ".!?:;,"
+_FIRST_TOKEN = re.compile(r"\S\s")
+_URL_TRAILING = ".,;:!?'\""
+
+
+def _url_to_speech(match: "re.Match") -> str:
+    url = match.group(0).strip("<>")
+    # Sentence punctuation right after a URL is not part of it
+    stripped = url.rstrip(_URL_TRAILING)
+    trailing = url[len(stripped):]
+    if not stripped.startswith(("http://", "https://")):
+        stripped = "http://" + stripped
+    domain = urllib.parse.urlsplit(stripped).hostname or ""
+    if domain.startswith("www."):
+        domain = domain[len("www."):]
+    return (f"link to {domain}" if domain else "link") + trailing
+
+
+def _emphasis_text(match: "re.Match") -> str:
+    return match.group(1) or match.group(2) or ""
+
+
+def inline_to_speech(text: str) -> str:
+    """Strip inline markdown and verbalize URLs in one line of text"""
+    text = _IMAGE.sub(r"\1", text)
+    text = _LINK.sub(r"\1", text)
+    text = _INLINE_CODE.sub(r"\1", text)
+    text = _URL.sub(_url_to_speech, text)
+    text = _STRONG.sub(r"\2", text)
+    text = _EMPHASIS.sub(_emphasis_text, text)
+    text = _STRIKE.sub(r"\1", text)
+    text = _HTML_BREAK.sub(" ", text)
+    text = _STRAY_MARKUP.sub("", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+def _inline_closed(text: str) -> bool:
+    """True when no link, code span or emphasis is still open in ``text``"""
+    return (text.count("[") == text.count("]") and text.count("(") <= text.count(")")
+            and text.count("`") % 2 == 0 and text.count("**") % 2 == 0)
+
+
+class SpeechNormalizer:
+    """Incremental markdown to speech segments for one response"""
+
+    def __init__(self):
+        self._buffer = ""
+        # True while the buffer starts at the beginning of a line
+        self._line_start = True
+        # Whether the current line had a list/heading marker (gets a period)
+        self._item = False
+        self._in_code = False
+        self.chars_in = 0
+        self.chars_out = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        """Add an LLM chunk; return the segments it completed"""
+        self.chars_in += len(chunk)
+        self._buffer += chunk
+        segments: List[str] = []
+        while True:
+            newline = self._buffer.find("\n")
+            if newline < 0:
+                break
+            line, self._buffer = self._buffer[:newline], self._buffer[newline + 1:]
+            self._line(line, segments)
+        if not self._in_code:
+            self._partial(segments)
+        return self._count(segments)
+
+    def flush(self) -> List[str]:
+        """End of the response: return whatever is left"""
+        segments: List[str] = []
+        if self._buffer and not self._in_code:
+            self._line(self._buffer, segments)
+        self._buffer = ""
+        self._line_start = True
+        self._item = False
+        self._in_code = False
+        return self._count(segments)
+
+    def _count(self, segments: List[str]) -> List[str]:
+        self.chars_out += sum(len(s) for s in segments)
+        return segments
+
+    def _line(self, line: str, segments: List[str]):
+        """A complete line (the rest of it, when its start was already emitted)"""
+        line_start, self._line_start = self._line_start, True
+        item, self._item = self._item, False
+        if line_start and _FENCE.match(line):
+            if not self._in_code:
+                segments.append(CODE_BLOCK_PHRASE)
+            self._in_code = not self._in_code
+            return
+        if self._in_code:
+            return
+        if line_start:
+            if _RULE.match(line) or _TABLE_SEPARATOR.match(line):
+                return
+            if line.lstrip().startswith("|"):
+                # Table row: read the cells as a list
+                line = ", ".join(c.strip() for c in line.strip().strip("|").split("|") if c.strip())
+                item = True
+            else:
+                prefix = _LINE_PREFIX.match(line)
+                if prefix:
+                    line = line[prefix.end():]
+                    item = True
+        text = inline_to_speech(line)
+        if not text:
+            return
+        if item and text[-1] not in _TERMINAL:
+            text += "."
+        segments.append(text)
+
+    def _partial(self, segments: List[str]):
+        """Emit finished sentences from the unfinished current line"""
+        if self._line_start:
+            stripped = self._buffer.lstrip()
+            # Wait until the line's first token shows whether it is a marker
+            if not _FIRST_TOKEN.search(stripped) or stripped.startswith(("|", "```", "~~~")):
+                return
+            prefix = _LINE_PREFIX.match(self._buffer)
+            if prefix:
+                self._buffer = self._buffer[prefix.end():]
+                self._item = True
+            self._line_start = False
+        start = 0
+        for match in _SENTENCE_END.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()]
+            if _inline_closed(sentence):
+                text = inline_to_speech(sentence)
+                if text:
+                    segments.append(text)
+                start = match.end()
+        self._buffer = self._buffer[start:]
+
+
+def to_speech(text: str) -> str:
+    """Normalize a complete markdown text for speech"""
+    normalizer = SpeechNormalizer()
+    segments = normalizer.feed(text)
+    segments.extend(normalizer.flush())
+    return " ".join(segments)
@@ -0,0 +1,106 @@
+"""Hashed timer wheel for coarse per-session timeouts
+
+Thousands of sessions each need a few timeouts (idle, maximum duration) that
+are usually pushed back by activity. One asyncio task per session - or a
+``loop.call_later`` handle re-armed on every audio frame - costs far more than
+the timeouts are worth. The wheel keeps timers in ``slots`` buckets indexed
+by expiry tick and a single task advances it once per tick, so scheduling
+and cancelling are O(1) and only the current bucket is looked at per tick.
+
+Callers record activity with a timestamp and check it when their timer
+fires, re-arming for the remaining time (lazy expiry), instead of touching
+the wheel on every event.
+"""
+import asyncio
+import math
+import time
+from typing import Callable, List, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class Timer:
+    """Handle of a scheduled callback"""
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: int, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """Single-task timer wheel with ``tick`` second resolution"""
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots: List[List[Timer]] = [[] for _ in range(slots)]
+        self._now = 0  # Ticks elapsed since start
+        self._task: Optional[asyncio.Task] = None
+        self.pending = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start advancing on the running loop"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timer:
+        """Call ``callback`` (on the loop) after roughly ``delay`` seconds"""
+        if not self.running:
+            self.start()  # Lazily, from the first caller on the loop
+        ticks = max(1, math.ceil(delay / self.tick))
+        timer = Timer(self._now + ticks, callback)
+        self._slots[timer.deadline % len(self._slots)].append(timer)
+        self.pending += 1
+        return timer
+
+    async def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            # Catch up on ticks missed while the loop was blocked
+            while next_tick <= time.monotonic():
+                self._advance()
+                next_tick += self.tick
+
+    def _advance(self):
+        self._now += 1
+        index = self._now % len(self._slots)
+        bucket = self._slots[index]
+        if not bucket:
+            return
+        due, later = [], []
+        for timer in bucket:
+            if timer.cancelled:
+                continue
+            (due if timer.deadline <= self._now else later).append(timer)
+        self._slots[index] = later
+        self.pending -= len(bucket) - len(later)
+        for timer in due:
+            try:
+                timer.callback()
+            except Exception as e:
+                logger.error("Timer callback failed: %s", e)
+
+
+# Global wheel instance (one tick per second)
+timer_wheel = TimerWheel()
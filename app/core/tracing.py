@@ -0,0 +1,122 @@
+"""Per-turn latency tracing across the STT, LLM and TTS stages"""
+import json
+import logging
+import time
+import uuid
+from typing import Dict, Optional, Any
+
+from app.core.config import settings
+from app.core.metrics import record_turn
+
+try:
+    from opentelemetry import trace as _otel_trace
+    _OTEL_AVAILABLE = True
+except Exception:
+    # OpenTelemetry is optional; without it only the JSON exporter is used
+    _otel_trace = None  # type: ignore
+    _OTEL_AVAILABLE = False
+
+trace_logger = logging.getLogger("app.tracing")
+
+# Stage marks in pipeline order
+STAGES = (
+    "turn_end_received",   # STT reported the end of the user's turn
+    "turn_admitted",       # Turn got an LLM/TTS slot from the scheduler
+    "llm_request_sent",    # Request handed to the LLM
+    "llm_first_token",
+    "llm_last_token",
+    "tts_request",         # Text handed to TTS
+    "tts_connect",         # TTS WebSocket connected
+    "tts_first_audio",     # First audio frame received from TTS
+    "tts_complete",        # Last audio frame received from TTS
+    "audio_sent",          # Audio message written to the client socket
+)
+
+# Derived spans: name -> (start mark, end mark)
+SPANS = {
+    "admission_wait": ("turn_end_received", "turn_admitted"),
+    "llm_time_to_first_token": ("llm_request_sent", "llm_first_token"),
+    "llm_stream": ("llm_first_token", "llm_last_token"),
+    "tts_connect": ("tts_request", "tts_connect"),
+    "tts_time_to_first_audio": ("tts_request", "tts_first_audio"),
+    "tts_synthesis": ("tts_request", "tts_complete"),
+    "audio_delivery": ("tts_complete", "audio_sent"),
+    "turn_total": ("turn_end_received", "audio_sent"),
+}
+
+
+class TurnTrace:
+    """Monotonic timestamps for the stages of one conversational turn"""
+
+    def __init__(self, session_id: str, turn_id: Optional[str] = None):
+        self.session_id = session_id
+        self.turn_id = turn_id or uuid.uuid4().hex[:12]
+        self.started = time.monotonic()
+        self.started_wall_ns = time.time_ns()
+        self.marks: Dict[str, float] = {}
+        self.finished = False
+
+    def mark(self, stage: str):
+        """Record a stage; only the first occurrence counts"""
+        if stage not in self.marks:
+            self.marks[stage] = time.monotonic()
+
+    def _ms(self, start: str, end: str) -> Optional[float]:
+        if start in self.marks and end in self.marks:
+            return round((self.marks[end] - self.marks[start]) * 1000, 2)
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """Stage offsets and span durations in milliseconds"""
+        offsets = {stage: round((self.marks[stage] - self.started) * 1000, 2)
+                   for stage in STAGES if stage in self.marks}
+        spans = {}
+        for name, (start, end) in SPANS.items():
+            duration = self._ms(start, end)
+            if duration is not None:
+                spans[name] = duration
+        return {"turn_id": self.turn_id, "session_id": self.session_id,
+                "stages_ms": offsets, "spans_ms": spans}
+
+    def _wall_ns(self, stage: str) -> int:
+        return self.started_wall_ns + int((self.marks[stage] - self.started) * 1e9)
+
+    def finish(self) -> Dict[str, Any]:
+        """Mark the trace complete and hand it to the configured exporter"""
+        self.finished = True
+        summary = self.summary()
+        record_turn(summary["spans_ms"])
+        export_trace(self, summary)
+        return summary
+
+
+def export_trace(trace: TurnTrace, summary: Dict[str, Any]):
+    """Export a finished trace as a JSON log line and/or OpenTelemetry spans"""
+    exporter = settings.tracing_exporter
+    if exporter in ("json", "both"):
+        trace_logger.info("turn_trace %s", json.dumps(summary, separators=(",", ":")))
+    if exporter in ("otel", "both") and _OTEL_AVAILABLE:
+        _export_otel(trace)
+
+
+def _export_otel(trace: TurnTrace):
+    """Emit the turn and its stage spans retroactively to the global tracer"""
+    if "turn_end_received" not in trace.marks:
+        return
+    tracer = _otel_trace.get_tracer("calm-guide.voice-pipeline")
+    last_stage = max(trace.marks, key=trace.marks.get)
+    root = tracer.start_span("voice_turn", start_time=trace._wall_ns("turn_end_received"),
+                             attributes={"turn.id": trace.turn_id, "session.id": trace.session_id})
+    context = _otel_trace.set_span_in_context(root)
+    for name, (start, end) in SPANS.items():
+        if name == "turn_total" or start not in trace.marks or end not in trace.marks:
+            continue
+        span = tracer.start_span(name, context=context, start_time=trace._wall_ns(start))
+        span.end(end_time=trace._wall_ns(end))
+    root.end(end_time=trace._wall_ns(last_stage))
+
+
+def mark(trace: Optional[TurnTrace], stage: str):
+    """Mark a stage on an optional trace (services are also used untraced)"""
+    if trace is not None:
+        trace.mark(stage)
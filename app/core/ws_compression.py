@@ -0,0 +1,130 @@
+"""Selective permessage-deflate for /ws
+
+uvicorn negotiates permessage-deflate (RFC 7692) with every browser that
+offers it and then compresses every outgoing message. Most of the /ws
+bytes are TTS audio: a WAV body (binary protocol) or its base64 text
+(``tts_response``), which deflate shrinks little or not at all for a lot of
+CPU, and the rest are interim transcripts and LLM chunks of a few dozen
+bytes, where the deflate block overhead eats the gain.
+
+``WS_COMPRESSION`` picks the policy per worker:
+
+    off        do not negotiate the extension
+    all        compress every message (uvicorn's default behaviour)
+    selective  negotiate it, but send audio and messages shorter than
+               ``WS_COMPRESS_MIN_BYTES`` uncompressed
+
+The extension allows any message to go out uncompressed (RSV1 unset), so
+the policy needs nothing from the client. Incoming messages are
+decompressed as usual. The policy needs uvicorn's websockets protocol
+replaced by ``CompressionPolicyWebSocketProtocol``, which only works when
+uvicorn is started from Python: the ``uvicorn`` CLI's ``--ws`` accepts only
+its built-in implementations. ``python -m app.serve`` (the Procfile) and
+``python main.py`` (local runs) both install it.
+
+``python -m benchmarks.ws_compression`` measures bytes saved against CPU
+time for each policy on a turn's message mix; with ``--check`` it serves a
+turn through uvicorn with this protocol and verifies which frames arrive
+compressed.
+"""
+from typing import Optional
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.frames import CTRL_OPCODES, OP_BINARY, OP_CONT, OP_TEXT, Frame
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+
+from app.core.config import settings
+from app.core.metrics import WS_DEFLATE_BYTES, WS_DEFLATE_SKIPPED
+from app.core.protocol import FRAME_JSON, HEADER
+
+POLICIES = ("off", "all", "selective")
+
+# The JSON codec writes '{"seq":N,"type":...' so the type is near the start
+_TTS_MARKER = b'"type":"tts_response"'
+_TYPE_SCAN_BYTES = 48
+
+
+def skip_reason(opcode, data: bytes, min_bytes: int, compress_audio: bool = False) -> Optional[str]:
+    """Why a message should be sent uncompressed, or None to compress it"""
+    if len(data) < min_bytes:
+        return "small"
+    if compress_audio:
+        return None
+    if opcode is OP_TEXT:
+        if _TTS_MARKER in bytes(data[:_TYPE_SCAN_BYTES]):
+            return "audio"
+    elif opcode is OP_BINARY:
+        # Binary protocol: only FRAME_JSON frames carry compressible text
+        if len(data) < HEADER.size or data[1] != FRAME_JSON:
+            return "audio"
+    return None
+
+
+class SelectivePerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate that leaves some messages uncompressed"""
+
+    def __init__(self, *args, min_bytes: int = 0, compress_audio: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_bytes = min_bytes
+        self.compress_audio = compress_audio
+        # Continuation frames follow the decision made for their first frame
+        self._skipping = False
+
+    def encode(self, frame: Frame) -> Frame:
+        if frame.opcode in CTRL_OPCODES:
+            return frame
+        if frame.opcode is not OP_CONT:
+            reason = skip_reason(frame.opcode, frame.data, self.min_bytes, self.compress_audio)
+            self._skipping = reason is not None
+            if reason is not None:
+                WS_DEFLATE_SKIPPED.inc(1, reason)
+        if self._skipping:
+            return frame
+        encoded = super().encode(frame)
+        WS_DEFLATE_BYTES.inc(len(frame.data), "raw")
+        WS_DEFLATE_BYTES.inc(len(encoded.data), "compressed")
+        return encoded
+
+
+class SelectiveDeflateFactory(ServerPerMessageDeflateFactory):
+    """Negotiates like the stock factory but builds the selective extension"""
+
+    def __init__(self, min_bytes: int, compress_audio: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.min_bytes = min_bytes
+        self.compress_audio = compress_audio
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, SelectivePerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            min_bytes=self.min_bytes,
+            compress_audio=self.compress_audio,
+        )
+
+
+def extension_factories(policy: Optional[str] = None) -> list:
+    """Server extension factories offered to clients under ``policy``"""
+    policy = policy or settings.ws_compression
+    if policy == "off":
+        return []
+    compress_settings = {"level": settings.ws_compress_level, "memLevel": settings.ws_compress_mem_level}
+    window_bits = settings.ws_compress_window_bits
+    if policy == "all":
+        return [ServerPerMessageDeflateFactory(server_max_window_bits=window_bits,
+                                               compress_settings=compress_settings)]
+    return [SelectiveDeflateFactory(settings.ws_compress_min_bytes, settings.ws_compress_audio,
+                                    server_max_window_bits=window_bits, compress_settings=compress_settings)]
+
+
+class CompressionPolicyWebSocketProtocol(WebSocketProtocol):
+    """uvicorn websockets protocol offering the extensions of the configured policy"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Replaces the all-or-nothing factory uvicorn passed to websockets
+        self.available_extensions = extension_factories()
@@ -1,6 +1,6 @@
 """Pydantic models for request/response validation"""
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Dict, Optional, List
 from enum import Enum
 
 
@@ -11,11 +11,31 @@ class TranscriptionResponse(BaseModel):
     duration: Optional[float] = Field(None, description="Audio duration in seconds")
 
 
+class ProbeLatency(BaseModel):
+    """Round-trip latency of the recent health probes of one upstream"""
+    last: float = Field(..., description="Latest probe (ms)")
+    p50: float = Field(..., description="Median (ms)")
+    p90: float = Field(..., description="90th percentile (ms)")
+    p99: float = Field(..., description="99th percentile (ms)")
+    samples: int = Field(..., description="Probes in the window")
+
+
+class ServiceHealth(BaseModel):
+    """Cached probe result of one upstream service"""
+    status: str = Field(..., description="available/unavailable (no API key)/unreachable/unknown")
+    reachable: Optional[bool] = Field(None, description="Whether the last probe got a response")
+    probed: bool = Field(..., description="False for fake backends without a server")
+    latency_ms: Optional[ProbeLatency] = Field(None, description="Probe latency percentiles")
+    checked_at: Optional[float] = Field(None, description="Time of the last probe")
+    error: Optional[str] = Field(None, description="Error of the last failed probe")
+
+
 class HealthStatus(BaseModel):
     """Health check response"""
     status: str = Field(..., description="Overall health status (healthy/degraded/down)")
     missing_api_keys: List[str] = Field(default_factory=list, description="List of missing API keys")
     timestamp: float = Field(..., description="Health check timestamp")
+    services: Dict[str, ServiceHealth] = Field(default_factory=dict, description="Per-service probe results")
 
 
 class ErrorTestResponse(BaseModel):
@@ -0,0 +1,32 @@
+"""Production launcher: uvicorn with the /ws compression policy
+
+The ``uvicorn`` CLI only accepts its built-in ``--ws`` implementations, so
+the selective permessage-deflate of app/core/ws_compression.py needs uvicorn
+started from Python. The Procfile runs
+
+    python -m app.serve
+
+which reads ``PORT`` and ``WEB_CONCURRENCY`` like the CLI command did and
+listens on ``HOST`` (0.0.0.0 by default). There is no reload; for local
+development use ``python main.py``.
+"""
+import os
+
+import uvicorn
+
+from app.core.ws_compression import CompressionPolicyWebSocketProtocol
+
+
+def main():
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        # Selective permessage-deflate (WS_COMPRESSION), see app/core/ws_compression.py
+        ws=CompressionPolicyWebSocketProtocol,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Token-budgeted conversation history for the LLM service"""
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Any
+import asyncio
+import time
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Summarizer signature: (previous_summary, evicted_messages) -> new summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast approximate token count (~4 characters per token for English)"""
+    return max(1, (len(text) + 3) // 4)
+
+
+class ConversationHistory:
+    """Per-session message window bounded by an approximate token budget.
+
+    Each message is counted once when it is appended and a running total is
+    kept per session, so trimming never rescans the history. Messages evicted
+    from the front can optionally be folded into a rolling summary by a
+    background task; the summary is sent ahead of the remaining messages.
+    """
+
+    def __init__(self,
+                 token_budget: Optional[int] = None,
+                 max_messages: Optional[int] = None,
+                 summarizer: Optional[Summarizer] = None):
+        self.token_budget = token_budget or settings.llm_history_token_budget
+        self.max_messages = max_messages or settings.llm_history_max_messages
+        self.summarizer = summarizer
+        self._messages: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._totals: Dict[str, int] = {}
+        self._summaries: Dict[str, str] = {}
+        self._pending_evicted: Dict[str, List[Dict[str, Any]]] = {}
+        self._summary_tasks: Dict[str, asyncio.Task] = {}
+
+    def append(self, session_id: str, role: str, content: str) -> Dict[str, Any]:
+        """Add a message and evict the oldest ones beyond the budget"""
+        messages = self._messages.setdefault(session_id, deque())
+        entry = {
+            "role": role,
+            "content": content,
+            "timestamp": time.time(),
+            "tokens": estimate_tokens(content),
+            # Gemini contents entry, rendered once
+            "gemini": {"role": "user" if role == "user" else "model", "parts": [content]},
+        }
+        messages.append(entry)
+        self._totals[session_id] = self._totals.get(session_id, 0) + entry["tokens"]
+
+        evicted = []
+        # Always keep the newest message, even if it alone exceeds the budget
+        while len(messages) > 1 and (self._totals[session_id] > self.token_budget or
+                                     len(messages) > self.max_messages):
+            old = messages.popleft()
+            self._totals[session_id] -= old["tokens"]
+            evicted.append(old)
+
+        if evicted and self.summarizer:
+            self._schedule_summary(session_id, evicted)
+        return entry
+
+    def messages(self, session_id: str) -> List[Dict[str, Any]]:
+        """Messages currently inside the window, oldest first"""
+        return list(self._messages.get(session_id, ()))
+
+    def total_tokens(self, session_id: str) -> int:
+        """Approximate tokens of the messages inside the window"""
+        return self._totals.get(session_id, 0)
+
+    def summary(self, session_id: str) -> str:
+        """Rolling summary of evicted messages (empty when disabled)"""
+        return self._summaries.get(session_id, "")
+
+    def contents(self, session_id: str) -> List[Dict[str, Any]]:
+        """Structured Gemini contents for the window, prefixed by the summary"""
+        contents = [m["gemini"] for m in self._messages.get(session_id, ())]
+        # Gemini expects the conversation to open with a user turn
+        while contents and contents[0]["role"] != "user":
+            contents = contents[1:]
+
+        summary = self._summaries.get(session_id)
+        if summary and contents:
+            first = contents[0]
+            contents = [{
+                "role": "user",
+                "parts": [f"(Summary of our earlier conversation: {summary})", *first["parts"]],
+            }] + contents[1:]
+        return contents
+
+    def export(self, session_id: str) -> Dict[str, Any]:
+        """JSON-serializable window and summary of a session (see ``restore``)"""
+        return {
+            "messages": [{"role": m["role"], "content": m["content"], "timestamp": m["timestamp"]}
+                         for m in self._messages.get(session_id, ())],
+            "summary": self._summaries.get(session_id, ""),
+        }
+
+    def restore(self, session_id: str, state: Dict[str, Any]):
+        """Replace a session's history with an exported one"""
+        self.clear(session_id)
+        for message in state.get("messages", ()):
+            entry = self.append(session_id, message["role"], message["content"])
+            entry["timestamp"] = message.get("timestamp", entry["timestamp"])
+        if state.get("summary"):
+            self._summaries[session_id] = state["summary"]
+
+    def clear(self, session_id: str):
+        """Drop all history for a session"""
+        self._messages.pop(session_id, None)
+        self._totals.pop(session_id, None)
+        self._summaries.pop(session_id, None)
+        self._pending_evicted.pop(session_id, None)
+        task = self._summary_tasks.pop(session_id, None)
+        if task:
+            task.cancel()
+
+    def _schedule_summary(self, session_id: str, evicted: List[Dict[str, Any]]):
+        """Queue evicted messages for background summarization"""
+        self._pending_evicted.setdefault(session_id, []).extend(evicted)
+        if session_id in self._summary_tasks:
+            return  # The running task picks up the new messages
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # No loop (sync caller) - summarize on the next async append
+        self._summary_tasks[session_id] = loop.create_task(self._summarize(session_id))
+
+    async def _summarize(self, session_id: str):
+        """Fold pending evicted messages into the rolling summary"""
+        try:
+            while self._pending_evicted.get(session_id):
+                batch = self._pending_evicted.pop(session_id)
+                previous = self._summaries.get(session_id, "")
+                try:
+                    summary = await self.summarizer(previous, batch)
+                except Exception as e:
+                    logger.error("History summarization failed: %s", e)
+                    return
+                if summary:
+                    # Keep the summary itself within a quarter of the budget
+                    max_chars = self.token_budget
+                    self._summaries[session_id] = summary.strip()[:max_chars]
+        finally:
+            self._summary_tasks.pop(session_id, None)
@@ -0,0 +1,347 @@
+"""Deterministic local stand-ins for AssemblyAI, Gemini and Murf (load testing)
+
+Select them with ``STT_BACKEND=fake``, ``LLM_BACKEND=fake`` and
+``TTS_BACKEND=fake``. The fake Murf server can also be run on its own, and
+a Redis stand-in serves ``SESSION_STORE=redis`` for multi-worker testing:
+
+    python -m app.services.fakes --port 8765
+    python -m app.services.fakes --service redis --port 6390
+"""
+import asyncio
+import base64
+import json
+import random
+import struct
+import time
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.tracing import TurnTrace, mark
+from app.services.conversation import ConversationHistory
+from app.services.turn_detection import AdaptiveTurnDetector
+
+_FILLER = (
+    "Here is a calm and concise answer that keeps the conversation moving while "
+    "giving the pipeline a realistic amount of text to stream and synthesize"
+).split()
+
+
+class FakeStreamingTranscriber:
+    """Streaming transcriber that turns incoming audio into scripted turns.
+
+    Every ``fake_stt_ms_per_word`` of non-silent audio reveals the next word of
+    the current scripted utterance as an interim transcript; the last word
+    ends the turn. Utterances are taken from ``fake_stt_script`` in order and
+    repeat when exhausted. Callbacks run synchronously on the caller's thread.
+    """
+
+    def __init__(self, sample_rate: int = 16000, api_key: Optional[str] = None,
+                 turn_detector: Optional[AdaptiveTurnDetector] = None,
+                 script: Optional[List[str]] = None):
+        self.sample_rate = sample_rate
+        self.api_key = api_key
+        self.turn_detector = turn_detector or AdaptiveTurnDetector()
+        self.script = script or [u.strip() for u in settings.fake_stt_script.split("|") if u.strip()]
+        self.bytes_per_word = max(2, sample_rate * 2 * settings.fake_stt_ms_per_word // 1000)
+        self.on_transcript_callback: Optional[Callable] = None
+        self.on_turn_end_callback: Optional[Callable] = None
+        self.connected = False
+        self.paused = False
+        self._utterance_index = 0
+        self._word_index = 0
+        self._pending_bytes = 0
+
+    def start_streaming(self, on_transcript: Callable = None, on_turn_end: Callable = None) -> bool:
+        """Start a (local) streaming session"""
+        self.on_transcript_callback = on_transcript
+        self.on_turn_end_callback = on_turn_end
+        self.connected = True
+        self.paused = False
+        return True
+
+    def is_connected(self) -> bool:
+        return self.connected
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self, on_transcript: Callable = None, on_turn_end: Callable = None) -> bool:
+        if not self.connected:
+            return False
+        return self.start_streaming(on_transcript, on_turn_end)
+
+    def send_keepalive(self):
+        pass
+
+    def stop_streaming(self):
+        self.connected = False
+        self.paused = False
+
+    def stream_audio(self, audio_chunk: bytes):
+        """Count audio towards the next scripted word"""
+        if not self.connected or self.paused or not self.script:
+            return
+        if not any(audio_chunk):
+            return  # Silence never advances the script
+        self._pending_bytes += len(audio_chunk)
+        while self._pending_bytes >= self.bytes_per_word:
+            self._pending_bytes -= self.bytes_per_word
+            self._advance()
+
+    def _advance(self):
+        words = self.script[self._utterance_index % len(self.script)].split()
+        self._word_index += 1
+        transcript = " ".join(words[:self._word_index])
+        if self._word_index < len(words):
+            self.turn_detector.observe_speech_start()
+            if self.on_transcript_callback:
+                self.on_transcript_callback(transcript, False)
+            return
+
+        self.turn_detector.observe_turn([])
+        self._utterance_index += 1
+        self._word_index = 0
+        if self.on_turn_end_callback:
+            self.on_turn_end_callback(transcript)
+
+
+class FakeLLMService:
+    """Token streamer with configurable first-token and per-token latency"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        self.api_key = api_key
+        self.history = ConversationHistory()
+        self.first_token_delay = settings.fake_llm_first_token_ms / 1000
+        self.token_delay = settings.fake_llm_token_ms / 1000
+        self.response_words = settings.fake_llm_response_words
+
+    def is_available(self) -> bool:
+        return True
+
+    def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
+        return self.history.messages(session_id)
+
+    def add_to_conversation(self, session_id: str, role: str, content: str):
+        self.history.append(session_id, role, content)
+
+    def clear_conversation(self, session_id: str):
+        self.history.clear(session_id)
+
+    def _response_words(self, text: str) -> List[str]:
+        words = f'You said "{text}".'.split()
+        while len(words) < self.response_words:
+            words.extend(_FILLER)
+        return words[:max(self.response_words, 1)]
+
+    async def generate_streaming_response(self, text: str, session_id: str = "default",
+                                          trace: Optional[TurnTrace] = None) -> AsyncGenerator[str, None]:
+        """Stream a deterministic answer one word at a time"""
+        self.add_to_conversation(session_id, "user", text)
+        mark(trace, "llm_request_sent")
+        await asyncio.sleep(self.first_token_delay)
+        words = self._response_words(text)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            mark(trace, "llm_first_token")
+            yield word if i == len(words) - 1 else word + " "
+        mark(trace, "llm_last_token")
+        self.add_to_conversation(session_id, "assistant", " ".join(words))
+
+    async def generate_response(self, text: str, session_id: str = "default") -> str:
+        accumulated_response = ""
+        async for chunk in self.generate_streaming_response(text, session_id):
+            accumulated_response += chunk
+        return accumulated_response
+
+
+def wav_header(data_size: int, sample_rate: int = 44100, channels: int = 1, bits: int = 16) -> bytes:
+    """Canonical 44-byte PCM WAV header"""
+    byte_rate = sample_rate * channels * bits // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1, channels,
+        sample_rate, byte_rate, channels * bits // 8, bits, b"data", data_size
+    )
+
+
+class FakeMurfServer:
+    """Local WebSocket server speaking the Murf stream-input protocol.
+
+    For each text message it streams ``fake_murf_ms_per_word`` of 44.1kHz mono
+    WAV audio per word as base64 ``audio`` frames (WAV header on the first
+    frame), followed by ``{"final": true}``. The PCM payload is seeded noise so
+    it compresses like real speech rather than like silence.
+    """
+
+    SAMPLE_RATE = 44100
+    FRAME_MS = 100
+
+    def __init__(self, host: str = "127.0.0.1", port: Optional[int] = None):
+        self.host = host
+        self.port = port or settings.fake_murf_port
+        self.frame_delay = settings.fake_murf_frame_delay_ms / 1000
+        self.ms_per_word = settings.fake_murf_ms_per_word
+        self._server = None
+
+    async def start(self):
+        import websockets
+        self._server = await websockets.serve(self._handle, self.host, self.port, max_size=None)
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, websocket):
+        try:
+            async for raw in websocket:
+                message = json.loads(raw)
+                if "text" not in message:
+                    continue  # voice_config
+                await self._synthesize(websocket, message["text"], message.get("context_id"))
+        except Exception:
+            pass
+
+    async def _synthesize(self, websocket, text: str, context_id: Optional[str]):
+        words = max(1, len(text.split()))
+        frame_bytes = self.SAMPLE_RATE * 2 * self.FRAME_MS // 1000
+        total = self.SAMPLE_RATE * 2 * words * self.ms_per_word // 1000
+        total -= total % 2
+        rng = random.Random(len(text))
+        sent = 0
+        first = True
+        while sent < total:
+            size = min(frame_bytes, total - sent)
+            pcm = rng.randbytes(size)
+            payload = (wav_header(total, self.SAMPLE_RATE) + pcm) if first else pcm
+            first = False
+            sent += size
+            await websocket.send(json.dumps({
+                "audio": base64.b64encode(payload).decode("ascii"),
+                "context_id": context_id
+            }))
+            if self.frame_delay:
+                await asyncio.sleep(self.frame_delay)
+        await websocket.send(json.dumps({"final": True, "context_id": context_id}))
+
+
+class FakeRedisServer:
+    """In-memory server speaking enough RESP for ``RedisStore``.
+
+    Supports PING, SELECT, AUTH (any password), GET, SET (with EX/PX), DEL and
+    EXPIRE; keys expire lazily on read. One keyspace for all databases.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: Optional[int] = None):
+        self.host = host
+        self.port = port or settings.fake_redis_port
+        self._data: Dict[bytes, tuple] = {}
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_command(self, reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # Inline command (e.g. from telnet)
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def _execute(self, args: List[bytes]) -> bytes:
+        command = args[0].upper()
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if command == b"GET":
+            value = self._get(args[1])
+            return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+        if command == b"SET":
+            expires = None
+            options = [a.upper() for a in args[3:]]
+            if b"EX" in options:
+                expires = time.monotonic() + float(args[3 + options.index(b"EX") + 1])
+            elif b"PX" in options:
+                expires = time.monotonic() + float(args[3 + options.index(b"PX") + 1]) / 1000
+            self._data[args[1]] = (args[2], expires)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            return b":%d\r\n" % sum(self._data.pop(k, None) is not None for k in args[1:])
+        if command == b"EXPIRE":
+            value = self._get(args[1])
+            if value is None:
+                return b":0\r\n"
+            self._data[args[1]] = (value, time.monotonic() + float(args[2]))
+            return b":1\r\n"
+        return b"-ERR unknown command '%s'\r\n" % command
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if not args:
+                    continue
+                try:
+                    reply = self._execute(args)
+                except (IndexError, ValueError):
+                    reply = b"-ERR syntax error\r\n"
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def fake_murf_url() -> str:
+    """WebSocket URL of the local Murf stand-in"""
+    return f"ws://127.0.0.1:{settings.fake_murf_port}/v1/speech/stream-input"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a local stand-in server")
+    parser.add_argument("--service", choices=("murf", "redis"), default="murf")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args()
+
+    async def _serve():
+        if args.service == "redis":
+            server = await FakeRedisServer(args.host, args.port).start()
+            print(f"Fake Redis server listening on redis://{args.host}:{server.port}")
+        else:
+            server = await FakeMurfServer(args.host, args.port).start()
+            print(f"Fake Murf server listening on ws://{args.host}:{server.port}")
+        await asyncio.Future()
+
+    asyncio.run(_serve())
@@ -1,108 +1,212 @@
-"""Health monitoring service"""
-from typing import List
+"""Health monitoring service
+
+A background prober sends a plain HTTP request to each upstream (AssemblyAI,
+Gemini, Murf) every ``health_probe_interval_seconds`` and keeps a window of
+round-trip latencies. Any HTTP response counts as reachable - the probes
+carry no API keys, so a 401/404 still proves DNS, TLS and the vendor's edge
+are up. ``/health/`` is served from the cached results; only the check of
+which API keys the caller sent happens per request.
+"""
+import asyncio
 import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import UPSTREAM_PROBE_LATENCY, UPSTREAM_PROBE_FAILURES
+
+logger = get_logger(__name__)
+
+# Service name -> API key the service needs
+SERVICE_KEYS = {
+    "stt_service": "assemblyai_api_key",
+    "llm_service": "google_api_key",
+    "tts_service": "murf_api_key",
+}
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _http_url(url: str) -> str:
+    """Probe WebSocket endpoints over plain HTTP(S)"""
+    if url.startswith("wss://"):
+        return "https://" + url[len("wss://"):]
+    if url.startswith("ws://"):
+        return "http://" + url[len("ws://"):]
+    return url
 
-from httpx import get
-from app.core.config import settings, get_api_key_from_env
-# from app.core.logging import get_logger
-from app.models.schemas import HealthStatus
 
-from app.services.stt_service import STTService
-from app.services.llm_service import LLMService
-from app.services.tts_service import TTSService
+def probe_targets() -> Dict[str, Optional[str]]:
+    """URL probed per service; None for fake backends without a server (or an empty URL)"""
+    tts_url = settings.health_probe_tts_url or settings.ws_murf_url
+    if settings.tts_backend == "fake" and not settings.health_probe_tts_url:
+        from app.services.fakes import fake_murf_url
+        tts_url = fake_murf_url()
+    return {
+        "stt_service": None if settings.stt_backend == "fake" else settings.health_probe_stt_url or None,
+        "llm_service": None if settings.llm_backend == "fake" else settings.health_probe_llm_url or None,
+        "tts_service": _http_url(tts_url) if tts_url else None,
+    }
 
-# logger = get_logger(__name__)
 
+class UpstreamHealth:
+    """Probe results of one upstream"""
+
+    def __init__(self, name: str, url: Optional[str], window: int):
+        self.name = name
+        self.url = url
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        # Local fakes without a server are always reachable
+        self.reachable: Optional[bool] = True if url is None else None
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.consecutive_failures = 0
+        self.snapshot: Dict[str, object] = {}
+        self._refresh_snapshot()
+
+    def record(self, latency_ms: Optional[float], error: Optional[str] = None):
+        self.checked_at = time.time()
+        if error is None:
+            self.reachable = True
+            self.error = None
+            self.consecutive_failures = 0
+            self.latencies_ms.append(latency_ms)
+        else:
+            self.reachable = False
+            self.error = error
+            self.consecutive_failures += 1
+        self._refresh_snapshot()
+
+    def _refresh_snapshot(self):
+        """Precompute the response fragment so requests only read it"""
+        ordered = sorted(self.latencies_ms)
+        latency = None
+        if ordered:
+            latency = {
+                "last": round(self.latencies_ms[-1], 1),
+                "p50": round(_percentile(ordered, 0.50), 1),
+                "p90": round(_percentile(ordered, 0.90), 1),
+                "p99": round(_percentile(ordered, 0.99), 1),
+                "samples": len(ordered),
+            }
+        self.snapshot = {
+            "reachable": self.reachable,
+            "probed": self.url is not None,
+            "latency_ms": latency,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class HealthProber:
+    """Background reachability and latency probes of the upstream services"""
 
-class HealthService:
-    """Service for monitoring application health"""
-    
     def __init__(self):
-        # logger.info("Health service initialized")
-        pass
-    
-    def check_api_keys(self) -> List[str]:
-        """
-        Check for missing API keys
-        
-        Note: API keys are now handled per-user via headers, so this mainly
-        checks if any keys are provided in the current request.
-        
-        Returns:
-            List of missing API key names (empty if all keys are provided)
-        """
-        # Since we now use per-user API keys, we don't check environment variables
-        # The actual key validation happens in check_services()
-        return []
-    
-    def check_services(self, api_keys: dict = None) -> dict:
-        """
-        Check availability of all services
-        
-        Args:
-            api_keys: Dictionary of API keys from request headers (optional)
-            
-        Returns:
-            Dictionary with service status
-        """
-        from app.services.stt_service import STTService
-        from app.services.llm_service import LLMService  
-        from app.services.tts_service import TTSService
-        
-        # Use provided API keys or None
-        assemblyai_key = api_keys.get('assemblyai_api_key') if api_keys else None
-        google_key = api_keys.get('google_api_key') if api_keys else None
-        murf_key = api_keys.get('murf_api_key') if api_keys else None
-        
-        # Create service instances with provided API keys (or None)
-        stt = STTService(api_key=assemblyai_key)
-        llm = LLMService(api_key=google_key)
-        tts = TTSService(api_key=murf_key)
-        
-        return {
-            "stt_service": "available" if stt.is_available() else "unavailable",
-            "llm_service": "available" if llm.is_available() else "unavailable", 
-            "tts_service": "available" if tts.is_available() else "unavailable"
+        self.interval = settings.health_probe_interval_seconds
+        self.timeout = settings.health_probe_timeout_seconds
+        self.upstreams: Dict[str, UpstreamHealth] = {
+            name: UpstreamHealth(name, url, settings.health_probe_window)
+            for name, url in probe_targets().items()
         }
-    
-    def get_health_status(self, api_keys: dict = None) -> HealthStatus:
+        # Services on a fake backend, which need no API key
+        self.fake = {name for name, backend in (("stt_service", settings.stt_backend),
+                                                ("llm_service", settings.llm_backend),
+                                                ("tts_service", settings.tts_backend))
+                     if backend == "fake"}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start probing on the running loop"""
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        import httpx  # Lazily, like the other vendor clients
+        async with httpx.AsyncClient(timeout=self.timeout, follow_redirects=False,
+                                     headers={"User-Agent": "CalmGuide-health/1.0"}) as client:
+            while True:
+                await self.probe_all(client)
+                await asyncio.sleep(self.interval)
+
+    async def probe_all(self, client):
+        """Probe every upstream concurrently"""
+        await asyncio.gather(*(self._probe(client, upstream)
+                               for upstream in self.upstreams.values() if upstream.url))
+
+    async def _probe(self, client, upstream: UpstreamHealth):
+        started = time.perf_counter()
+        try:
+            await client.get(upstream.url)
+        except Exception as e:
+            UPSTREAM_PROBE_FAILURES.inc(1, upstream.name)
+            if upstream.consecutive_failures == 0:
+                logger.warning("Health probe of %s (%s) failed: %s", upstream.name, upstream.url, e)
+            upstream.record(None, f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+            return
+        latency = time.perf_counter() - started
+        UPSTREAM_PROBE_LATENCY.observe(latency, upstream.name)
+        if upstream.reachable is False:
+            logger.info("Health probe of %s recovered", upstream.name)
+        upstream.record(latency * 1000)
+
+    def get_health_status(self, api_keys: Optional[dict] = None) -> dict:
         """
-        Get overall health status
-        
-        Args:
-            api_keys: Dictionary of API keys from request headers (optional)
-            
-        Returns:
-            HealthStatus object with current health information
+        Overall status from the cached probes and the caller's API keys
+
+        A service is available when its upstream answered the last probe and
+        the caller sent its API key (fake backends need no key).
         """
-        missing_keys = self.check_api_keys()
-        services = self.check_services(api_keys)
-        
-        # Count available services
-        available_services = sum(1 for status in services.values() if status == "available")
-        total_services = len(services)
-        
-        # Determine overall status
-        # In the per-user API key system:
-        # - If no API keys provided: "Down" (user needs to provide keys)
-        # - If API keys provided: "Healthy" if all services available, "Degraded" if some available
-        if api_keys and any(api_keys.values()):  # Check if any API keys are provided
-            if available_services > 0:
-                status = "Healthy" if available_services == total_services else "Degraded"
+        api_keys = api_keys or {}
+        services = {}
+        missing = []
+        available = 0
+        for name, upstream in self.upstreams.items():
+            key_name = SERVICE_KEYS[name]
+            has_key = name in self.fake or bool(api_keys.get(key_name))
+            if not has_key:
+                missing.append(key_name)
+            if upstream.reachable is None:
+                state = "unknown"  # First probe still in flight
+            elif not upstream.reachable:
+                state = "unreachable"
+            elif not has_key:
+                state = "unavailable"
             else:
-                status = "Down"
+                state = "available"
+                available += 1
+            services[name] = {"status": state, **upstream.snapshot}
+
+        if available == len(services):
+            status = "Healthy"
+        elif available:
+            status = "Degraded"
         else:
-            # No API keys provided - system is down until user provides keys
             status = "Down"
-
-        # logger.info(f"Health check: {status}, services: {services}")
-        
-        return HealthStatus(
-            status=status,
-            missing_api_keys=[],  # No longer relevant in per-user system
-            timestamp=time.time()
-        )
+        return {
+            "status": status,
+            "missing_api_keys": missing,
+            "timestamp": time.time(),
+            "services": services,
+        }
 
 
-# Global health service instance
-health_service = HealthService()
+# Global health prober instance (started on application startup)
+health_prober = HealthProber()
@@ -2,11 +2,15 @@
 import google.generativeai as genai
 from typing import AsyncGenerator, List, Dict, Any, Optional
 from app.core.config import settings
-# from app.core.logging import get_logger
+from app.services.conversation import ConversationHistory
+from app.services.response_cache import response_cache
+from app.core.tracing import TurnTrace, mark
+from app.core.logging import get_logger, sampled
+from app.core.resilience import CircuitOpen, call_with_retries, circuit_breaker
 import asyncio
 import time
 
-# logger = get_logger(__name__)
+logger = get_logger(__name__)
 
 PERSONA = {
     "name": "Calm Guide",
@@ -31,18 +35,50 @@ PERSONA = {
     }
 }
 
+
+def build_system_instruction(persona: Dict[str, Any]) -> str:
+    """Render the persona into a compact system instruction"""
+    return (
+        f"You are {persona['name']}, a {persona['tone']} AI assistant. "
+        f"Greet with '{persona['greeting']}' only in your first reply of a conversation. "
+        f"{persona['instructions']} "
+        f"About you: {persona['your_info']} "
+        f"If a question is ambiguous, ask e.g. '{persona['example_response']['clarify']}'"
+    )
+
+
+# Static prompt prefix - built once at import, sent as Gemini's system_instruction
+SYSTEM_INSTRUCTION = build_system_instruction(PERSONA)
+
+SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an assistant. "
+    "Keep names, facts, preferences and open questions; drop greetings and filler. "
+    "Answer with the summary only, in at most 120 words."
+)
+
 class LLMService:
     """Language Model service using Google Gemini AI"""
     
     def __init__(self, api_key: Optional[str] = None):
         self.model = None
-        self.conversation_history: Dict[str, List[Dict[str, str]]] = {}
+        # Token-budgeted history; evicted turns are optionally summarized
+        self.history = ConversationHistory(
+            summarizer=self._summarize_history if settings.llm_history_summarize else None
+        )
         self.api_key = api_key
         if not self.api_key:
             return
         try:
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.5-flash')
+            self.model = genai.GenerativeModel(
+                'gemini-2.5-flash',
+                system_instruction=SYSTEM_INSTRUCTION
+            )
+            self.generation_config = genai.types.GenerationConfig(
+                temperature=0.7,
+                max_output_tokens=2000,
+                top_p=0.9
+            )
         except Exception as e:
             self.model = None
     
@@ -52,108 +88,131 @@ class LLMService:
     
     def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a session"""
-        return self.conversation_history.get(session_id, [])
+        return self.history.messages(session_id)
     
     def add_to_conversation(self, session_id: str, role: str, content: str):
-        """Add message to conversation history"""
-        if session_id not in self.conversation_history:
-            self.conversation_history[session_id] = []
-        
-        self.conversation_history[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": time.time()
-        })
-        
-        # Keep only last 20 messages to prevent context overflow
-        if len(self.conversation_history[session_id]) > 20:
-            self.conversation_history[session_id] = self.conversation_history[session_id][-20:]
+        """Add message to conversation history (oldest messages beyond the token budget are evicted)"""
+        self.history.append(session_id, role, content)
     
     def clear_conversation(self, session_id: str):
         """Clear conversation history for a session"""
-        if session_id in self.conversation_history:
-            del self.conversation_history[session_id]
-            # logger.info(f"Cleared conversation history for session: {session_id}")
-    
-    def _format_conversation_context(self, session_id: str) -> str:
-        """Format conversation history as context"""
-        history = self.get_conversation_history(session_id)
-        if not history:
-            return ""
-        
-        context_parts = []
-        for msg in history[-10:]:  # Use last 10 messages for context
+        self.history.clear(session_id)
+        logger.info("Cleared conversation history for session: %s", session_id)
+
+    async def _summarize_history(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        """Fold evicted messages into the rolling conversation summary"""
+        lines = [f"Current summary: {previous_summary or '(none)'}", "New messages:"]
+        for msg in messages:
             role_label = "User" if msg["role"] == "user" else "Assistant"
-            context_parts.append(f"{role_label}: {msg['content']}")
-        
-        return "\n".join(context_parts)
-    
+            lines.append(f"{role_label}: {msg['content']}")
+        response = await self.model.generate_content_async(
+            f"{SUMMARY_PROMPT}\n\n" + "\n".join(lines),
+            generation_config=genai.types.GenerationConfig(temperature=0.2, max_output_tokens=256)
+        )
+        return response.text
+
     async def generate_streaming_response(self, 
                                         text: str, 
-                                        session_id: str = "default") -> AsyncGenerator[str, None]:
+                                        session_id: str = "default",
+                                        trace: Optional[TurnTrace] = None) -> AsyncGenerator[str, None]:
         """Generate streaming response from LLM"""
         if not self.is_available():
             yield "I'm sorry, but the AI service is currently unavailable. Please try again later."
             return
         
         try:
+            # Only context-free first turns may be answered from / stored in the cache
+            cacheable = response_cache.enabled and not self.history.messages(session_id)
+            if cacheable:
+                cached = await response_cache.lookup(text)
+                if cached is not None:
+                    self.add_to_conversation(session_id, "user", text)
+                    mark(trace, "llm_request_sent")
+                    for chunk in cached.chunks:
+                        mark(trace, "llm_first_token")
+                        yield chunk
+                        await asyncio.sleep(0)
+                    mark(trace, "llm_last_token")
+                    self.add_to_conversation(session_id, "assistant", cached.text)
+                    return
+
+            # Fail fast before touching the history while Gemini is down
+            circuit_breaker("gemini").check()
+
             # Add user message to conversation history
             self.add_to_conversation(session_id, "user", text)
             
-            # Build prompt with conversation context
-            context = self._format_conversation_context(session_id)
-            
-            # Create system prompt
-            system_prompt = (f"You are {PERSONA['name']}, a {PERSONA['tone']} AI assistant. "
-                             f"Your greeting is: '{PERSONA['greeting']} (only the first time you will be using, not for each responses.)' "
-                             f"Your instructions are: '{PERSONA['instructions']}' "
-                             f"Here's an example response: '{PERSONA['example_response']['short_answer']}' If asked for more detail, check '{PERSONA['your_info']}' or '{PERSONA}")
-
-            # Build the full prompt
-            if context:
-                full_prompt = f"{system_prompt}\n\nConversation history:\n{context}\n\nUser: {text}\n\nAssistant:"
-            else:
-                full_prompt = f"{system_prompt}\n\nUser: {text}\n\nAssistant:"
+            # Persona goes in system_instruction; history (including this
+            # message) goes as structured multi-turn contents
+            contents = self.history.contents(session_id)
             
-            # logger.info(f"Generating streaming response for session {session_id}: '{text[:50]}...'")
+            logger.debug("Generating streaming response for session %s: '%s...'", session_id, text[:50])
             
-            # Generate streaming response
-            response = self.model.generate_content(
-                full_prompt,
-                stream=True,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=2000,
-                    top_p=0.9
-                )
-            )
+            # Generate streaming response; the request up to its first chunk
+            # is retried (nothing has been yielded yet) behind Gemini's breaker
+            mark(trace, "llm_request_sent")
+            stream, first = await call_with_retries("gemini", lambda: self._open_stream(contents))
             
             accumulated_response = ""
             chunk_count = 0
+            chunks: List[str] = []
             
-            for chunk in response:
+            async for chunk in self._rest_of_stream(first, stream):
                 if chunk.text:
+                    mark(trace, "llm_first_token")
                     chunk_count += 1
                     accumulated_response += chunk.text
-                    # logger.debug(f"Streaming chunk {chunk_count}: '{chunk.text[:30]}...'")
+                    chunks.append(chunk.text)
+                    if sampled("llm.chunk"):
+                        logger.debug("Streaming chunk %s: '%s...'", chunk_count, chunk.text[:30])
                     yield chunk.text
                     
                     # Small delay to make streaming visible
                     await asyncio.sleep(0.05)
             
+            mark(trace, "llm_last_token")
+
             # Add assistant response to conversation history
             if accumulated_response:
                 self.add_to_conversation(session_id, "assistant", accumulated_response)
-                # logger.info(f"Completed streaming response for session {session_id}. "
-                #           f"Total chunks: {chunk_count}, Length: {len(accumulated_response)}")
+                if cacheable:
+                    await response_cache.store(text, chunks)
+                logger.info("Completed streaming response for session %s. Total chunks: %s, Length: %s",
+                            session_id, chunk_count, len(accumulated_response))
             else:
-                # logger.warning(f"Empty response generated for session {session_id}")
+                logger.warning("Empty response generated for session %s", session_id)
                 yield "I'm sorry, I couldn't generate a response. Please try again."
                 
+        except CircuitOpen:
+            # Surfaced to the handler, which tells the client to retry later
+            raise
         except Exception as e:
-            # logger.error(f"LLM service error for session {session_id}: {str(e)}")
+            logger.error("LLM service error for session %s: %s", session_id, e)
             yield f"I encountered an error while processing your request: {str(e)}"
     
+    async def _open_stream(self, contents):
+        """Start a streaming request and read its first chunk (without blocking the loop)"""
+        response = await self.model.generate_content_async(
+            contents,
+            stream=True,
+            generation_config=self.generation_config
+        )
+        stream = response.__aiter__()
+        try:
+            first = await stream.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return stream, first
+
+    @staticmethod
+    async def _rest_of_stream(first, stream):
+        """The chunk read by _open_stream followed by the remaining ones"""
+        if first is None:
+            return
+        yield first
+        async for chunk in stream:
+            yield chunk
+
     async def generate_response(self, text: str, session_id: str = "default") -> str:
         """Generate non-streaming response (legacy support)"""
         accumulated_response = ""
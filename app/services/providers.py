@@ -0,0 +1,88 @@
+"""Provider interfaces for the STT/LLM/TTS stages and backend selection"""
+from typing import AsyncGenerator, Callable, Dict, List, Optional, Protocol
+
+from app.core.config import settings
+from app.core.tracing import TurnTrace
+from app.services.conversation import ConversationHistory
+from app.services.turn_detection import AdaptiveTurnDetector
+
+# Vendor SDKs (assemblyai, google.generativeai, websockets) are imported by the
+# service modules, which are only imported here on first use - keep them out
+# of module scope so the app starts without loading them (app/core/preload.py).
+
+# Hard cap on how long a paused (keep-warm) session may stay open, whatever
+# the settings say - an open streaming session is billed even when silent.
+KEEP_WARM_MAX_IDLE_SECONDS = 60.0
+
+
+class StreamingTranscriber(Protocol):
+    """Streaming speech-to-text with turn detection callbacks"""
+
+    api_key: Optional[str]
+    paused: bool
+    turn_detector: AdaptiveTurnDetector
+
+    def start_streaming(self, on_transcript: Callable = None, on_turn_end: Callable = None) -> bool: ...
+    def stream_audio(self, audio_chunk: bytes) -> None: ...
+    def stop_streaming(self) -> None: ...
+    def is_connected(self) -> bool: ...
+    def pause(self) -> None: ...
+    def resume(self, on_transcript: Callable = None, on_turn_end: Callable = None) -> bool: ...
+    def send_keepalive(self) -> None: ...
+
+
+class LanguageModel(Protocol):
+    """Streaming chat model with per-session conversation history"""
+
+    api_key: Optional[str]
+    history: ConversationHistory
+
+    def is_available(self) -> bool: ...
+    def get_conversation_history(self, session_id: str) -> List[Dict[str, str]]: ...
+    def add_to_conversation(self, session_id: str, role: str, content: str) -> None: ...
+    def clear_conversation(self, session_id: str) -> None: ...
+    def generate_streaming_response(self, text: str, session_id: str = "default",
+                                    trace: Optional[TurnTrace] = None) -> AsyncGenerator[str, None]: ...
+    async def generate_response(self, text: str, session_id: str = "default") -> str: ...
+
+
+class SpeechSynthesizer(Protocol):
+    """Text-to-speech returning WAV audio (base64 or raw bytes)"""
+
+    api_key: Optional[str]
+
+    def is_available(self) -> bool: ...
+    async def generate_speech(self, text: str, trace: Optional[TurnTrace] = None) -> str: ...
+    async def generate_speech_bytes(self, text: str, trace: Optional[TurnTrace] = None) -> bytes: ...
+
+
+def create_transcriber(api_key: Optional[str],
+                       turn_detector: Optional[AdaptiveTurnDetector] = None,
+                       sample_rate: int = 16000) -> StreamingTranscriber:
+    """Build the configured streaming transcriber (``settings.stt_backend``)"""
+    if settings.stt_backend == "fake":
+        from app.services.fakes import FakeStreamingTranscriber
+        return FakeStreamingTranscriber(sample_rate=sample_rate, api_key=api_key,
+                                        turn_detector=turn_detector)
+    from app.services.stt_service import AssemblyAIStreamingTranscriber
+    return AssemblyAIStreamingTranscriber(sample_rate=sample_rate, api_key=api_key,
+                                          turn_detector=turn_detector)
+
+
+def create_llm(api_key: Optional[str]) -> LanguageModel:
+    """Build the configured language model (``settings.llm_backend``)"""
+    if settings.llm_backend == "fake":
+        from app.services.fakes import FakeLLMService
+        return FakeLLMService(api_key=api_key)
+    from app.services.llm_service import LLMService
+    return LLMService(api_key=api_key)
+
+
+def create_tts(api_key: Optional[str]) -> SpeechSynthesizer:
+    """Build the configured speech synthesizer (``settings.tts_backend``)"""
+    from app.services.tts_service import TTSService
+    if settings.tts_backend == "fake":
+        # Real Murf client pointed at the local stand-in server
+        from app.services.fakes import fake_murf_url
+        return TTSService(api_key=api_key or "local-fake-key", ws_url=fake_murf_url())
+    return TTSService(api_key=api_key)
@@ -0,0 +1,179 @@
+"""Opt-in cache of LLM responses (and their TTS audio) for repeated first questions"""
+from typing import FrozenSet, List, Optional
+import hashlib
+import re
+import time
+
+from cachetools import TTLCache
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import RESPONSE_CACHE
+from app.core.serialization import dumps_bytes, loads
+from app.services.session_store import KeyValueStore, session_store
+
+logger = get_logger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+# Words that do not change what is being asked
+_FILLER_WORDS = frozenset({"um", "uh", "hey", "hi", "please", "so", "okay", "ok", "well"})
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip punctuation and filler words, collapse whitespace"""
+    words = _PUNCTUATION.sub(" ", text.lower()).split()
+    return " ".join(w for w in words if w not in _FILLER_WORDS)
+
+
+def character_ngrams(text: str, n: int = 3) -> FrozenSet[str]:
+    """Character n-grams of a normalized question (padded at word edges)"""
+    padded = f" {_WHITESPACE.sub(' ', text)} "
+    return frozenset(padded[i:i + n] for i in range(max(1, len(padded) - n + 1)))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard similarity of two n-gram sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class CachedResponse:
+    """A cached answer: the streamed chunks plus optional synthesized audio"""
+
+    def __init__(self, question: str, chunks: List[str]):
+        self.question = question
+        self.ngrams = character_ngrams(question)
+        self.chunks = chunks
+        self.text = "".join(chunks)
+        self.audio: Optional[bytes] = None
+        self.created = time.time()
+        self.hits = 0
+
+
+class ResponseCache:
+    """Two-tier response cache for context-free first turns.
+
+    The exact tier matches normalized question text. The optional similarity
+    tier compares character trigrams (Jaccard) against cached questions and
+    accepts the best match above ``threshold`` - cheap enough to scan a few
+    hundred entries per lookup without an embedding model.
+
+    With a shared ``store`` the exact tier and the audio are also kept there,
+    so an answer generated by one worker is replayed by all of them; the
+    similarity tier only scans entries this worker has seen.
+    """
+
+    def __init__(self,
+                 max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None,
+                 similarity: Optional[bool] = None,
+                 threshold: Optional[float] = None,
+                 store: Optional[KeyValueStore] = None):
+        self.enabled = settings.response_cache_enabled
+        self.similarity = settings.response_cache_similarity if similarity is None else similarity
+        self.threshold = threshold if threshold is not None else settings.response_cache_threshold
+        max_entries = max_entries or settings.response_cache_max_entries
+        ttl_seconds = ttl_seconds or settings.response_cache_ttl_seconds
+        self.ttl = ttl_seconds
+        self.shared_store = store
+        self._entries: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        # Response text -> question key, so audio can be found for similar hits
+        self._by_response: TTLCache = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+
+    @staticmethod
+    def _shared_key(kind: str, text: str) -> str:
+        return f"response_cache:{kind}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+    async def _shared_get(self, key: str) -> Optional[bytes]:
+        try:
+            return await self.shared_store.get(key)
+        except Exception as e:
+            logger.warning("Shared response cache read failed: %s", e)
+            return None
+
+    async def _shared_set(self, key: str, value: bytes):
+        try:
+            await self.shared_store.set(key, value, self.ttl)
+        except Exception as e:
+            logger.warning("Shared response cache write failed: %s", e)
+
+    def _remember(self, key: str, chunks: List[str]) -> CachedResponse:
+        entry = CachedResponse(key, list(chunks))
+        self._entries[key] = entry
+        self._by_response[entry.text] = key
+        return entry
+
+    async def lookup(self, text: str) -> Optional[CachedResponse]:
+        """Find a cached response for a question, exact match first"""
+        key = normalize_question(text)
+        if not key:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is None and self.shared_store is not None:
+            data = await self._shared_get(self._shared_key("q", key))
+            if data:
+                entry = self._remember(key, loads(data))
+        if entry is not None:
+            entry.hits += 1
+            RESPONSE_CACHE.inc(1, "exact_hit")
+            return entry
+
+        if self.similarity:
+            grams = character_ngrams(key)
+            best, best_score = None, self.threshold
+            for candidate in list(self._entries.values()):
+                score = jaccard(grams, candidate.ngrams)
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None:
+                best.hits += 1
+                RESPONSE_CACHE.inc(1, "similar_hit")
+                return best
+
+        RESPONSE_CACHE.inc(1, "miss")
+        return None
+
+    async def store(self, text: str, chunks: List[str]):
+        """Cache the streamed chunks of a response"""
+        key = normalize_question(text)
+        if key and chunks:
+            self._remember(key, chunks)
+            if self.shared_store is not None:
+                await self._shared_set(self._shared_key("q", key), dumps_bytes(list(chunks)))
+
+    def _entry_for_response(self, response_text: str) -> Optional[CachedResponse]:
+        key = self._by_response.get(response_text)
+        entry = self._entries.get(key) if key is not None else None
+        if entry is not None and entry.text == response_text:
+            return entry
+        return None
+
+    async def audio_for(self, response_text: str) -> Optional[bytes]:
+        """Cached WAV audio for a response text that came from (or went into) the cache"""
+        entry = self._entry_for_response(response_text)
+        if entry is None:
+            return None
+        if entry.audio is None and self.shared_store is not None:
+            entry.audio = await self._shared_get(self._shared_key("a", response_text))
+        return entry.audio
+
+    async def attach_audio(self, response_text: str, audio: bytes):
+        """Remember the synthesized WAV audio of a cached response"""
+        entry = self._entry_for_response(response_text)
+        if entry is not None and audio:
+            entry.audio = audio
+            if self.shared_store is not None:
+                await self._shared_set(self._shared_key("a", response_text), audio)
+
+    def clear(self):
+        """Drop all cached responses"""
+        self._entries.clear()
+        self._by_response.clear()
+
+
+# Global response cache instance - shared by all sessions of this worker, and
+# across workers through the session store when that is shared
+response_cache = ResponseCache(store=session_store.store if session_store.shared else None)
@@ -0,0 +1,191 @@
+"""Admission control and fair scheduling of upstream LLM/TTS work
+
+Every turn needs a slot before it calls the LLM and TTS. Slots are capped
+globally, per API key (so one key cannot hit the vendor rate limit for
+everyone sharing the worker) and per session. Turns that cannot start right
+away wait in per-session queues that are served round-robin, so a user
+firing turns back to back cannot starve other sessions. A turn that waited
+longer than ``scheduler_max_wait_seconds`` is dropped - by then the user has
+moved on - and a turn that would overflow the queues is refused at once;
+both surface to the client as a ``busy`` message.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import registry, Gauge, SCHEDULER_REJECTED, SCHEDULER_WAIT
+
+logger = get_logger(__name__)
+
+
+class SchedulerBusy(Exception):
+    """A turn was not admitted; ``reason`` is sent to the client"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("session_id", "key", "future", "granted")
+
+    def __init__(self, session_id: str, key: Optional[str], future: asyncio.Future):
+        self.session_id = session_id
+        self.key = key
+        self.future = future
+        self.granted = False
+
+
+def key_id(api_key: Optional[str]) -> Optional[str]:
+    """Short hash of an API key, so raw keys are not kept as dict keys"""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class TurnScheduler:
+    """Global, per-key and per-session concurrency caps with a fair queue"""
+
+    def __init__(self,
+                 max_concurrent: Optional[int] = None,
+                 per_key: Optional[int] = None,
+                 per_session: Optional[int] = None,
+                 max_queued: Optional[int] = None,
+                 max_queued_per_session: Optional[int] = None,
+                 max_wait_seconds: Optional[float] = None):
+        self.max_concurrent = max_concurrent or settings.scheduler_max_concurrent
+        self.per_key = per_key or settings.scheduler_per_key
+        self.per_session = per_session or settings.scheduler_per_session
+        self.max_queued = max_queued or settings.scheduler_max_queued
+        self.max_queued_per_session = max_queued_per_session or settings.scheduler_max_queued_per_session
+        self.max_wait = max_wait_seconds or settings.scheduler_max_wait_seconds
+        self.running = 0
+        self.queued = 0
+        self._session_running: Dict[str, int] = {}
+        self._key_running: Dict[str, int] = {}
+        # Session -> waiting turns; sessions rotate to the end once served
+        self._queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+
+    def _can_run(self, session_id: str, key: Optional[str]) -> bool:
+        return (self.running < self.max_concurrent and
+                self._session_running.get(session_id, 0) < self.per_session and
+                (key is None or self._key_running.get(key, 0) < self.per_key))
+
+    def _start(self, session_id: str, key: Optional[str]):
+        self.running += 1
+        self._session_running[session_id] = self._session_running.get(session_id, 0) + 1
+        if key is not None:
+            self._key_running[key] = self._key_running.get(key, 0) + 1
+
+    def _decrement(self, counts: Dict[str, int], name: str):
+        remaining = counts.get(name, 0) - 1
+        if remaining > 0:
+            counts[name] = remaining
+        else:
+            counts.pop(name, None)
+
+    def release(self, session_id: str, key: Optional[str]):
+        """Free a slot and hand it to the next eligible waiter"""
+        self.running -= 1
+        self._decrement(self._session_running, session_id)
+        if key is not None:
+            self._decrement(self._key_running, key)
+        self._dispatch()
+
+    def _remove(self, waiter: _Waiter):
+        queue = self._queues.get(waiter.session_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self._queues[waiter.session_id]
+        # Its departure may unblock turns queued behind it in the same session
+        self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots round-robin across sessions with waiting turns"""
+        progressed = True
+        while progressed and self._queues and self.running < self.max_concurrent:
+            progressed = False
+            for session_id, queue in self._queues.items():
+                waiter = queue[0]
+                if not self._can_run(session_id, waiter.key):
+                    continue
+                queue.popleft()
+                self.queued -= 1
+                if queue:
+                    self._queues.move_to_end(session_id)
+                else:
+                    del self._queues[session_id]
+                self._start(session_id, waiter.key)
+                waiter.granted = True
+                waiter.future.set_result(None)
+                progressed = True
+                break  # Restart from the least recently served session
+
+    def _retry_after(self) -> float:
+        """Rough wait before a refused client should try again"""
+        return round(min(self.max_wait, 1.0 + self.queued / max(1, self.max_concurrent)), 1)
+
+    async def acquire(self, session_id: str, api_key: Optional[str] = None):
+        """Wait for a slot; raises SchedulerBusy when refused or expired"""
+        key = key_id(api_key)
+        if session_id not in self._queues and self._can_run(session_id, key):
+            self._start(session_id, key)
+            SCHEDULER_WAIT.observe(0.0)
+            return
+
+        if self.queued >= self.max_queued:
+            SCHEDULER_REJECTED.inc(1, "overloaded")
+            raise SchedulerBusy("overloaded", self._retry_after())
+        queue = self._queues.setdefault(session_id, deque())
+        if len(queue) >= self.max_queued_per_session:
+            SCHEDULER_REJECTED.inc(1, "too_many_turns")
+            raise SchedulerBusy("too_many_turns", self._retry_after())
+
+        waiter = _Waiter(session_id, key, asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        self.queued += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.granted:
+                return  # Granted as the deadline passed
+            self._remove(waiter)
+            SCHEDULER_REJECTED.inc(1, "expired")
+            raise SchedulerBusy("expired", self._retry_after())
+        except asyncio.CancelledError:
+            if waiter.granted:
+                self.release(session_id, key)
+            else:
+                self._remove(waiter)
+            raise
+        SCHEDULER_WAIT.observe(time.monotonic() - started)
+
+    @asynccontextmanager
+    async def slot(self, session_id: str, api_key: Optional[str] = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block"""
+        await self.acquire(session_id, api_key)
+        try:
+            yield
+        finally:
+            self.release(session_id, key_id(api_key))
+
+    def snapshot(self) -> Dict[str, int]:
+        return {"running": self.running, "queued": self.queued, "sessions_waiting": len(self._queues)}
+
+
+# Global scheduler instance - shared by all sessions of this worker
+turn_scheduler = TurnScheduler()
+
+registry.register(Gauge("scheduler_running_turns", "Turns holding an LLM/TTS slot",
+                        callback=lambda: turn_scheduler.running))
+registry.register(Gauge("scheduler_queued_turns", "Turns waiting for an LLM/TTS slot",
+                        callback=lambda: turn_scheduler.queued))
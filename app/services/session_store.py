@@ -0,0 +1,295 @@
+"""Session state and shared cache storage
+
+Everything a reconnecting client needs to pick up where it left off - the
+conversation history and the learned turn-detection parameters - is saved
+as one JSON document per session, so a reconnect that lands on another
+worker (or another node) resumes the same conversation. The exact tier of
+the response cache uses the same store.
+
+Backends (``SESSION_STORE``):
+
+``memory``
+    A dict in this process. Single worker only; the default.
+``sqlite``
+    A WAL-mode SQLite file (``SESSION_STORE_PATH``) shared by the workers of
+    one machine.
+``redis``
+    Any Redis-compatible server (``SESSION_STORE_URL``), for several nodes.
+    ``python -m app.services.fakes --service redis`` runs a local stand-in.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Protocol, Tuple
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.serialization import dumps_bytes, loads
+
+logger = get_logger(__name__)
+
+SESSION_KEY_PREFIX = "session:"
+
+
+class KeyValueStore(Protocol):
+    """Async byte-string store with per-key expiry"""
+
+    async def get(self, key: str) -> Optional[bytes]: ...
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None: ...
+    async def delete(self, key: str) -> None: ...
+    async def close(self) -> None: ...
+
+
+class MemoryStore:
+    """In-process store (state is lost with the worker and not shared)"""
+
+    # Expired keys nobody reads again are swept at most this often
+    SWEEP_INTERVAL = 60.0
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        now = time.monotonic()
+        self._data[key] = (value, now + ttl if ttl else None)
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        """Drop expired entries (sessions that were never resumed)"""
+        expired = [k for k, (_, expires) in self._data.items() if expires is not None and expires <= now]
+        for key in expired:
+            del self._data[key]
+        self._next_sweep = now + self.SWEEP_INTERVAL
+        if expired:
+            logger.debug("Swept %s expired entries from the memory store", len(expired))
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    async def close(self):
+        self._data.clear()
+
+
+class SQLiteStore:
+    """SQLite-backed store shared by the workers of one machine"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            # WAL lets readers in other workers proceed while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)")
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, time.time())).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float]):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                         (key, value, expires))
+            # Opportunistic cleanup instead of a sweeper task
+            conn.execute("DELETE FROM kv WHERE expires IS NOT NULL AND expires <= ?", (time.time(),))
+
+    def _delete(self, key: str):
+        with self._lock:
+            self._connection().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # SQLite calls block, so they run in the default executor
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
+
+
+class RedisError(Exception):
+    """Error reply from the Redis server"""
+
+
+class RedisStore:
+    """Minimal asyncio client for a Redis-compatible server (GET/SET/DEL only)"""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        # One request in flight at a time on the single connection
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [await self._read_reply() for _ in range(int(rest))]
+        raise RedisError(f"unexpected reply {line!r}")
+
+    async def _connect(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", self.db)
+
+    async def _call(self, *args: Any) -> Any:
+        self._writer.write(self._encode(*args))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def execute(self, *args: Any) -> Any:
+        """Send one command, reconnecting once if the connection dropped"""
+        async with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._call(*args)
+                except RedisError:
+                    raise  # A complete error reply: the connection is still in sync
+                except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                    self._reset()
+                    if attempt == 2:
+                        raise
+                except BaseException:
+                    # Cancelled or timed out mid-command: a reply may still be
+                    # pending and would be read as the answer to the next one
+                    self._reset()
+                    raise
+
+    def _reset(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.execute("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if ttl:
+            await self.execute("SET", key, value, "PX", int(ttl * 1000))
+        else:
+            await self.execute("SET", key, value)
+
+    async def delete(self, key: str):
+        await self.execute("DEL", key)
+
+    async def close(self):
+        async with self._lock:
+            self._reset()
+
+
+def create_store() -> KeyValueStore:
+    """Build the configured store (``settings.session_store``)"""
+    if settings.session_store == "sqlite":
+        return SQLiteStore(settings.session_store_path)
+    if settings.session_store == "redis":
+        return RedisStore(settings.session_store_url)
+    return MemoryStore()
+
+
+class SessionStore:
+    """Per-session state documents on top of a KeyValueStore"""
+
+    def __init__(self, store: Optional[KeyValueStore] = None, ttl_seconds: Optional[float] = None):
+        self.store = store or create_store()
+        self.ttl = ttl_seconds or settings.session_ttl_seconds
+
+    @property
+    def shared(self) -> bool:
+        """Whether other workers see the same data"""
+        return not isinstance(self.store, MemoryStore)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Saved state of a session, or None (errors are logged, not raised)"""
+        try:
+            data = await self.store.get(SESSION_KEY_PREFIX + session_id)
+            return loads(data) if data else None
+        except Exception as e:
+            logger.error("Failed to load session %s: %s", session_id, e)
+            return None
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        """Save the state of a session, refreshing its expiry"""
+        try:
+            await self.store.set(SESSION_KEY_PREFIX + session_id, dumps_bytes(state), self.ttl)
+        except Exception as e:
+            logger.error("Failed to save session %s: %s", session_id, e)
+
+    async def delete(self, session_id: str):
+        try:
+            await self.store.delete(SESSION_KEY_PREFIX + session_id)
+        except Exception as e:
+            logger.error("Failed to delete session %s: %s", session_id, e)
+
+    async def close(self):
+        await self.store.close()
+
+
+# Global session store instance (backend chosen by SESSION_STORE)
+session_store = SessionStore()
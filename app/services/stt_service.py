@@ -1,38 +1,62 @@
 """Speech-to-Text service using AssemblyAI"""
 import assemblyai as aai
 from app.core.config import settings
-# from app.core.logging import get_logger
+from app.core.logging import get_logger, sampled
+from app.core.resilience import circuit_breaker, is_caller_error
 from app.models.schemas import TranscriptionResponse
 from assemblyai.streaming.v3 import (
     StreamingClient, StreamingClientOptions, StreamingParameters, 
     StreamingEvents
 )
 from typing import Optional, Callable
+import time
+from app.services.turn_detection import AdaptiveTurnDetector, word_pauses_ms
+from app.services.providers import KEEP_WARM_MAX_IDLE_SECONDS
 
-# logger = get_logger(__name__)
+logger = get_logger(__name__)
+
+# Duration of the silence frame sent as a keepalive (AssemblyAI accepts 50-1000ms)
+KEEPALIVE_FRAME_MS = 50
 
 class AssemblyAIStreamingTranscriber:
     """AssemblyAI streaming transcriber for real-time audio"""
-    
-    def __init__(self, sample_rate: int = 16000, api_key: Optional[str] = None):
+
+    def __init__(self, sample_rate: int = 16000, api_key: Optional[str] = None,
+                 turn_detector: Optional[AdaptiveTurnDetector] = None):
         self.sample_rate = sample_rate
         self.client = None
         self.on_transcript_callback: Optional[Callable] = None
         self.on_turn_end_callback: Optional[Callable] = None
         self.current_turn_transcript = ""
         self.api_key = api_key
+        # Per-session turn detection parameters (shared across transcribers)
+        self.turn_detector = turn_detector or AdaptiveTurnDetector()
+        self._last_observed_turn = None
+        # True while the connection is held open between recordings
+        self.paused = False
+        # Set when AssemblyAI ends the session on its side (SDK thread)
+        self.closed = False
+        self._silence_frame = b"\x00" * (self.sample_rate * KEEPALIVE_FRAME_MS // 1000 * 2)
+        # Error of the last failed start, so the caller can tell whether a retry may help
+        self.last_error: Optional[Exception] = None
         if not self.api_key:
             return
         aai.settings.api_key = self.api_key
         
     def start_streaming(self, on_transcript: Callable = None, on_turn_end: Callable = None):
-        """Start streaming transcription session"""
+        """Start streaming transcription session (raises CircuitOpen while AssemblyAI is failing)"""
         if not self.api_key:
             return False
+        breaker = circuit_breaker("assemblyai")
+        breaker.acquire()
+        started = time.monotonic()
+        self.last_error = None
         try:
             self.on_transcript_callback = on_transcript
             self.on_turn_end_callback = on_turn_end
             self.current_turn_transcript = ""
+            self.paused = False
+            self.closed = False
             self.client = StreamingClient(
                 StreamingClientOptions(
                     api_key=self.api_key,
@@ -46,20 +70,26 @@ class AssemblyAIStreamingTranscriber:
             self.client.on(StreamingEvents.Termination, self._on_termination)
             self.client.on(StreamingEvents.Error, self._on_error)
             
-            # Connect with streaming parameters
+            # Connect with streaming parameters; turn detection is learned per session
             self.client.connect(StreamingParameters(
                 sample_rate=self.sample_rate,
                 format_turns=True,
                 interim_results=True,
-                end_of_turn_silence_threshold=500,
-                voice_activity_threshold=0.5
+                **self.turn_detector.streaming_parameters()
             ))
             
-            # logger.info("AssemblyAI streaming session started successfully")
+            breaker.record_success(time.monotonic() - started)
+            logger.info("AssemblyAI streaming session started successfully")
             return True
             
         except Exception as e:
-            # logger.error(f"Failed to start streaming: {e}")
+            self.last_error = e
+            # A rejected key is the caller's problem, not an AssemblyAI outage
+            if is_caller_error(e):
+                breaker.release()
+            else:
+                breaker.record_failure()
+            logger.error("Failed to start streaming: %s", e)
             return False
     
     def stream_audio(self, audio_chunk: bytes):
@@ -68,29 +98,66 @@ class AssemblyAIStreamingTranscriber:
             try:
                 self.client.stream(audio_chunk)
             except Exception as e:
-                # logger.error(f"Error streaming audio: {e}")
-                pass
+                # Called per audio frame: a dropped connection would flood the log
+                if sampled("stt.stream_error"):
+                    logger.error("Error streaming audio: %s", e)
     
+    def is_connected(self) -> bool:
+        """Check if a streaming connection is open"""
+        return self.client is not None and not self.closed
+
+    def pause(self):
+        """Stop listening but keep the streaming connection open for reuse"""
+        if not self.client:
+            return
+        self.paused = True
+        # Flush the in-progress turn so the last utterance is still delivered
+        force_endpoint = getattr(self.client, 'force_endpoint', None)
+        if force_endpoint:
+            try:
+                force_endpoint()
+            except Exception as e:
+                logger.error("Error forcing endpoint: %s", e)
+
+    def resume(self, on_transcript: Callable = None, on_turn_end: Callable = None) -> bool:
+        """Reuse a paused connection for a new recording"""
+        if not self.is_connected():
+            return False
+        self.on_transcript_callback = on_transcript
+        self.on_turn_end_callback = on_turn_end
+        self.current_turn_transcript = ""
+        self.paused = False
+        return True
+
+    def send_keepalive(self):
+        """Send a short silence frame so a paused session is not timed out"""
+        if self.client and self.paused:
+            self.stream_audio(self._silence_frame)
+
     def stop_streaming(self):
         """Stop streaming session"""
+        self.paused = False
         if self.client:
             try:
                 self.client.disconnect(terminate=True)
                 self.client = None
-                # logger.info("AssemblyAI streaming session stopped")
+                logger.info("AssemblyAI streaming session stopped")
             except Exception as e:
-                # logger.error(f"Error stopping stream: {e}")
-                pass
+                logger.error("Error stopping stream: %s", e)
+
+    def _mark_closed(self, client):
+        """The server ended the session: a paused connection can no longer be resumed"""
+        # Late events of a previous client must not close its replacement
+        if client is None or client is self.client:
+            self.closed = True
 
     def _on_begin(self, client, event):
         """Handle streaming session begin event"""
         try:
             session_id = getattr(event, 'id', 'unknown')
-            # logger.info(f"Streaming session started: {session_id}")
-            print(f"[AssemblyAI] Session Started: {session_id}")
+            logger.info("Streaming session started: %s", session_id)
         except Exception as e:
-            # logger.error(f"Error in _on_begin: {e}")
-            print("[AssemblyAI] Session Started")
+            logger.error("Error in _on_begin: %s", e)
     
     def _on_turn(self, client, event):
         """Handle turn event with transcript"""
@@ -101,66 +168,67 @@ class AssemblyAIStreamingTranscriber:
             if transcript:
                 self.current_turn_transcript = transcript
 
-                # logger.info(f"Turn Transcript: {transcript} (end_of_turn: {is_end_of_turn})")
-                print(f"[TURN] {transcript}")
-                print(f"   - End of Turn: {is_end_of_turn}")
-
                 if is_end_of_turn:
-                    print(f"[TURN COMPLETE] Final: {transcript}")
-                    print("   - User stopped talking")
+                    logger.debug("Turn complete: %s", transcript)
+
+                    # Feed mid-turn pauses into the adaptive threshold. With
+                    # format_turns the same turn ends twice (raw, then formatted),
+                    # so only observe it once.
+                    turn_order = getattr(event, 'turn_order', None)
+                    if turn_order is None or turn_order != self._last_observed_turn:
+                        self._last_observed_turn = turn_order
+                        self.turn_detector.observe_turn(word_pauses_ms(getattr(event, 'words', None)))
 
                     # ONLY send to UI when turn actually ends (user paused)
                     if self.on_turn_end_callback:
                         try:
                             self.on_turn_end_callback(transcript)
                         except Exception as e:
-                            # logger.error(f"Error in turn end callback: {e}")
-                            pass
+                            logger.error("Error in turn end callback: %s", e)
 
                     self.current_turn_transcript = ""
                 else:
                     # Interim result during speaking - only send for real-time feedback
-                    print("   - Still speaking (interim)")
-                    
+                    if sampled("stt.interim"):
+                        logger.debug("Interim transcript: %s", transcript)
+
+                    # Speech resuming right after a turn end means we cut the user off
+                    self.turn_detector.observe_speech_start()
+
                     # Send interim results for status display only
                     if self.on_transcript_callback:
                         try:
                             self.on_transcript_callback(transcript, False)
                         except Exception as e:
-                            # logger.error(f"Error in transcript callback: {e}")
-                            pass
+                            logger.error("Error in transcript callback: %s", e)
 
             else:
                 if self.on_transcript_callback:
                     try:
                         self.on_transcript_callback(transcript, False)
                     except Exception as e:
-                        # logger.error(f"Error in transcript callback: {e}")
-                        pass
+                        logger.error("Error in transcript callback: %s", e)
 
         except Exception as e:
-            # logger.error(f"Error in _on_turn: {e}")
-            pass
+            logger.error("Error in _on_turn: %s", e)
 
     def _on_termination(self, client, event):
         """Handle session termination"""
         try:
+            self._mark_closed(client)
             duration = getattr(event, 'audio_duration_seconds', 'unknown')
-            # logger.info(f"Session terminated after {duration} seconds")
-            print(f"[AssemblyAI] Session terminated - Duration: {duration}s")
+            logger.info("Session terminated after %s seconds", duration)
         except Exception as e:
-            # logger.error(f"Error in _on_termination: {e}")
-            print("[AssemblyAI] Session terminated")
+            logger.error("Error in _on_termination: %s", e)
     
     def _on_error(self, client, error):
         """Handle streaming errors"""
         try:
+            self._mark_closed(client)
             error_msg = str(error) if error else "Unknown error"
-            # logger.error(f"Streaming error: {error_msg}")
-            print(f"[ERROR] Streaming error: {error_msg}")
+            logger.error("Streaming error: %s", error_msg)
         except Exception as e:
-            # logger.error(f"Error in _on_error: {e}")
-            print("[ERROR] Unknown streaming error")
+            logger.error("Error in _on_error: %s", e)
 
 class STTService:
     """Speech-to-Text service using AssemblyAI"""
@@ -168,12 +236,12 @@ class STTService:
     def __init__(self, api_key: Optional[str] = None):
         key_to_use = api_key  # Only use provided API key, no fallback to settings
         if not key_to_use:
-            # logger.warning("AssemblyAI API key not found")
+            logger.warning("AssemblyAI API key not found")
             self._transcriber = None
         else:
             aai.settings.api_key = key_to_use
             self._transcriber = aai.Transcriber()
-            # logger.info("STT service initialized with AssemblyAI")
+            logger.info("STT service initialized with AssemblyAI")
     
     def is_available(self) -> bool:
         """Check if STT service is available"""
@@ -185,19 +253,19 @@ class STTService:
             raise Exception("AssemblyAI API key not configured")
         
         try:
-            # logger.info(f"Starting transcription for {len(audio_data)} bytes of audio")
+            logger.info("Starting transcription for %s bytes of audio", len(audio_data))
 
             transcript = self._transcriber.transcribe(audio_data)
             
             if transcript.status == aai.TranscriptStatus.error:
-                # logger.error(f"Transcription failed: {transcript.error}")
+                logger.error("Transcription failed: %s", transcript.error)
                 raise Exception(f"Transcription failed: {transcript.error}")
             
             if not transcript.text or transcript.text.strip() == "":
-                # logger.warning("No speech detected in audio")
+                logger.warning("No speech detected in audio")
                 raise Exception("No speech detected in the audio")
 
-            # logger.info(f"Transcription successful: '{transcript.text[:50]}...'")
+            logger.debug("Transcription successful: '%s...'", transcript.text[:50])
 
             return TranscriptionResponse(
                 text=transcript.text,
@@ -206,7 +274,7 @@ class STTService:
             )
             
         except Exception as e:
-            # logger.error(f"STT service error: {str(e)}")
+            logger.error("STT service error: %s", e)
             raise Exception(f"Speech-to-text failed: {str(e)}")
 
 # Global instances - removed since we now use per-user API keys
@@ -4,19 +4,21 @@ import asyncio
 import websockets
 import json
 import base64
-import re
 from typing import Optional
 from app.core.config import settings
-# from app.core.logging import get_logger
+from app.core.tracing import TurnTrace, mark
+from app.core.logging import get_logger, sampled
+from app.core.resilience import CircuitOpen, call_with_retries
+from app.core.speech_text import to_speech
 
-# logger = get_logger(__name__)
+logger = get_logger(__name__)
 
 class TTSService:
     """Text-to-Speech service using Murf AI WebSocket API"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, ws_url: Optional[str] = None):
         self.api_key = api_key
-        self.ws_url = "wss://api.murf.ai/v1/speech/stream-input"  # Hardcoded WebSocket URL
+        self.ws_url = ws_url or settings.ws_murf_url
         self.context_id = "fastapi-demo-context-001"
         if not self.api_key:
             self._available = False
@@ -27,107 +29,117 @@ class TTSService:
         """Check if TTS service is available"""
         return bool(self.api_key)
 
-    def _preprocess_text(self, text: str) -> str:
-        """Preprocess text by replacing URLs with readable format"""
-        def url_replacer(match):
-            url = match.group(0)
-            # Remove markdown formatting if present
-            url_clean = url.strip('`').strip()
-            # Extract domain
-            domain = re.sub(r'^https?://', '', url_clean).split('/')[0]
-            if domain:
-                return f'link to {domain}'
-            return 'link'
-
-        # Replace URLs in the text (http/https, bare or markdown/backtick-wrapped)
-        url_pattern = r'`?(https?://[^\s`]+)`?'
-        return re.sub(url_pattern, url_replacer, text)
-
-    async def generate_speech(self, text: str) -> str:
+    async def generate_speech(self, text: str, trace: Optional[TurnTrace] = None,
+                              normalized: bool = False) -> str:
         """
         Generate speech from text using Murf TTS via WebSocket.
         Returns the complete base64 audio data ready for browser playback.
         """
+        audio = await self.generate_speech_bytes(text, trace=trace, normalized=normalized)
+        return base64.b64encode(audio).decode('utf-8') if audio else ""
+
+    async def generate_speech_bytes(self, text: str, trace: Optional[TurnTrace] = None,
+                                    normalized: bool = False) -> bytes:
+        """
+        Generate speech from text using Murf TTS via WebSocket.
+        Returns the complete WAV file as bytes (empty on failure); raises
+        CircuitOpen when Murf's circuit breaker is open. Markdown ``text`` is
+        made speakable first unless it is already ``normalized``.
+        """
         if not self.is_available():
-            print(f"[DEBUG] TTS service not available, api_key: {bool(self.api_key)}")
-            return ""
+            logger.warning("TTS service not available, api_key present: %s", bool(self.api_key))
+            return b""
 
         try:
-            print(f"[DEBUG] Starting TTS generation for text: {text[:50]}...")
-            # Preprocess text
-            processed_text = self._preprocess_text(text)
-            print(f"[DEBUG] Processed text: {processed_text[:50]}...")
-
-            async with websockets.connect(
-                f"{self.ws_url}?api-key={self.api_key}&sample_rate=44100&channel_type=MONO&format=WAV"
-            ) as ws:
-                # Send voice config with static context_id
-                voice_config_msg = {
-                    "voice_config": {
-                        "voiceId": "en-US-amara",
-                        "style": "Conversational",
-                        "rate": 0,
-                        "pitch": 0,
-                        "variation": 1
-                    },
-                    "context_id": self.context_id
-                }
-                # logger.debug(f'Sending voice config: {voice_config_msg}')
-                await ws.send(json.dumps(voice_config_msg))
-
-                # Send processed text
-                text_msg = {
-                    "text": processed_text,
-                    "end": True,
-                    "context_id": self.context_id
-                }
-                # logger.debug(f'Sending text: {text_msg}')
-                await ws.send(json.dumps(text_msg))
-
-                # Collect all audio chunks
-                audio_chunks = []
-                first_chunk = True
-
-                while True:
-                    response = await ws.recv()
-                    data = json.loads(response)
-
-                    if "audio" in data:
-                        audio_b64 = data["audio"]
-
-                        # Decode base64 to bytes for processing
-                        audio_bytes = base64.b64decode(audio_b64)
-
-                        # Skip WAV header only for the first chunk
-                        if first_chunk and len(audio_bytes) > 44:
-                            # Keep the WAV header for the first chunk since we need it for browser playback
-                            # The browser's Web Audio API can handle WAV files with headers
-                            audio_chunks.append(audio_bytes)
-                            first_chunk = False
-                        else:
-                            # For subsequent chunks, append the raw audio data
-                            audio_chunks.append(audio_bytes)
-
-                        # logger.debug(f"Received audio chunk: {len(audio_bytes)} bytes")
-
-                    if data.get("final"):
-                        break
-
-                # Combine all audio chunks
-                if audio_chunks:
-                    # For browser playback, we need to reconstruct a proper WAV file
-                    combined_audio = b''.join(audio_chunks)
-                    combined_b64 = base64.b64encode(combined_audio).decode('utf-8')
-
-                    print(f"[DEBUG] TTS generation completed, audio length: {len(combined_b64)}")
-                    return combined_b64
-                else:
-                    print(f"[DEBUG] TTS returned empty audio")
-                    return ""
-
+            logger.debug("Starting TTS generation for text: %s...", text[:50])
+            # Strip markdown and verbalize URLs (app/core/speech_text.py)
+            processed_text = text if normalized else to_speech(text)
+            if not processed_text:
+                return b""
+            logger.debug("Processed text: %s...", processed_text[:50])
+
+            # Retried as a unit (nothing reaches the client before it completes);
+            # an open breaker raises CircuitOpen to the caller at once
+            return await call_with_retries("murf", lambda: asyncio.wait_for(
+                self._synthesize(processed_text, trace), settings.tts_timeout_seconds))
+
+        except CircuitOpen:
+            raise
         except Exception as e:
-            print(f"[DEBUG] TTS service error: {e}")
-            return ""
+            logger.error("TTS service error: %s", e)
+            return b""
+
+    async def _synthesize(self, processed_text: str, trace: Optional[TurnTrace] = None) -> bytes:
+        """One Murf WebSocket synthesis; raises on connection or protocol errors"""
+        async with websockets.connect(
+            f"{self.ws_url}?api-key={self.api_key}&sample_rate=44100&channel_type=MONO&format=WAV"
+        ) as ws:
+            mark(trace, "tts_connect")
+            # Send voice config with static context_id
+            voice_config_msg = {
+                "voice_config": {
+                    "voiceId": "en-US-amara",
+                    "style": "Conversational",
+                    "rate": 0,
+                    "pitch": 0,
+                    "variation": 1
+                },
+                "context_id": self.context_id
+            }
+            logger.debug('Sending voice config: %s', voice_config_msg)
+            await ws.send(json.dumps(voice_config_msg))
+
+            # Send processed text
+            text_msg = {
+                "text": processed_text,
+                "end": True,
+                "context_id": self.context_id
+            }
+            logger.debug('Sending text: %s', text_msg)
+            await ws.send(json.dumps(text_msg))
+
+            # Collect all audio chunks
+            audio_chunks = []
+            first_chunk = True
+
+            while True:
+                response = await ws.recv()
+                data = json.loads(response)
+
+                if "audio" in data:
+                    mark(trace, "tts_first_audio")
+                    audio_b64 = data["audio"]
+
+                    # Decode base64 to bytes for processing
+                    audio_bytes = base64.b64decode(audio_b64)
+
+                    # Skip WAV header only for the first chunk
+                    if first_chunk and len(audio_bytes) > 44:
+                        # Keep the WAV header for the first chunk since we need it for browser playback
+                        # The browser's Web Audio API can handle WAV files with headers
+                        audio_chunks.append(audio_bytes)
+                        first_chunk = False
+                    else:
+                        # For subsequent chunks, append the raw audio data
+                        audio_chunks.append(audio_bytes)
+
+                    if sampled("tts.chunk"):
+                        logger.debug("Received audio chunk: %s bytes", len(audio_bytes))
+
+                if data.get("final"):
+                    mark(trace, "tts_complete")
+                    break
+
+            # Combine all audio chunks
+            if audio_chunks:
+                # For browser playback, we need to reconstruct a proper WAV file
+                combined_audio = b''.join(audio_chunks)
+
+                logger.debug("TTS generation completed, audio length: %s", len(combined_audio))
+                return combined_audio
+            else:
+                logger.warning("TTS returned empty audio")
+                return b""
 
 
 # Legacy function for backward compatibility
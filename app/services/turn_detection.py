@@ -0,0 +1,188 @@
+"""Adaptive end-of-turn detection parameters per WebSocket session"""
+from collections import deque
+from typing import Dict, Any, Iterable, Optional
+import math
+import time
+
+from app.core.config import settings
+
+
+def _number(value: Any, name: str) -> float:
+    """A finite, non-negative number from client input"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{name} must be a non-negative number")
+    return float(value)
+
+
+class AdaptiveTurnDetector:
+    """Learns turn-detection thresholds from how a single user speaks.
+
+    Two signals are observed:
+
+    * pause lengths - gaps between words *inside* a finished turn. A user who
+      routinely pauses 600ms mid-sentence needs a longer end-of-turn silence
+      than one who never pauses for more than 150ms.
+    * false turn ends - the turn was closed too early. We see this as a
+      duplicate/``turn_update`` of the previous turn, or as the user resuming
+      speech almost immediately after a turn end.
+
+    The resulting ``end_of_turn_silence_ms`` is applied the next time a
+    streaming session connects.
+    """
+
+    # Silence added on top of the typical mid-turn pause
+    PAUSE_MARGIN_MS = 150
+    # Percentile of observed pauses a turn end has to outlast
+    PAUSE_PERCENTILE = 0.9
+    # Minimum number of pauses before we trust the observations
+    MIN_PAUSE_SAMPLES = 8
+    # How fast the threshold moves towards its target (0..1)
+    SMOOTHING = 0.3
+    # Multiplier applied when a turn was cut off too early
+    FALSE_END_BACKOFF = 1.25
+    # Speech resuming within this window after a turn end counts as a cut-off
+    QUICK_RESUME_SECONDS = 0.8
+
+    def __init__(self,
+                 end_of_turn_silence_ms: Optional[int] = None,
+                 voice_activity_threshold: Optional[float] = None,
+                 adaptive: Optional[bool] = None):
+        # An explicit 0 is a (clamped) value, not "use the default"
+        self.base_silence_ms = (end_of_turn_silence_ms if end_of_turn_silence_ms is not None
+                                else settings.stt_end_of_turn_silence_ms)
+        self.voice_activity_threshold = (voice_activity_threshold
+                                         if voice_activity_threshold is not None
+                                         else settings.stt_voice_activity_threshold)
+        self.adaptive = settings.stt_adaptive_turn_detection if adaptive is None else adaptive
+        self.min_silence_ms = settings.stt_min_end_of_turn_silence_ms
+        self.max_silence_ms = settings.stt_max_end_of_turn_silence_ms
+
+        self._current_ms = float(self._clamp(self.base_silence_ms))
+        self._pauses: deque = deque(maxlen=64)
+        self._last_turn_end: Optional[float] = None
+        self._awaiting_speech = False
+        self.turns = 0
+        self.false_turn_ends = 0
+
+    def _clamp(self, value: float) -> float:
+        return max(self.min_silence_ms, min(self.max_silence_ms, value))
+
+    @property
+    def end_of_turn_silence_ms(self) -> int:
+        """Silence (ms) after which the current user's turn is considered over"""
+        if not self.adaptive:
+            return int(self._clamp(self.base_silence_ms))
+        return int(round(self._current_ms))
+
+    def configure(self,
+                  end_of_turn_silence_ms: Optional[int] = None,
+                  voice_activity_threshold: Optional[float] = None,
+                  adaptive: Optional[bool] = None):
+        """
+        Apply client-provided overrides; a fixed threshold resets learning
+
+        Values are clamped to their range (silence to the configured min/max,
+        voice activity to 0..1); raises ValueError for non-numeric, negative
+        or non-finite ones, before anything is changed.
+        """
+        if voice_activity_threshold is not None:
+            voice_activity_threshold = min(1.0, _number(voice_activity_threshold, "voice_activity_threshold"))
+        if end_of_turn_silence_ms is not None:
+            end_of_turn_silence_ms = _number(end_of_turn_silence_ms, "end_of_turn_silence_ms")
+        if adaptive is not None and not isinstance(adaptive, bool):
+            raise ValueError("adaptive must be true or false")
+        if voice_activity_threshold is not None:
+            self.voice_activity_threshold = voice_activity_threshold
+        if adaptive is not None:
+            self.adaptive = adaptive
+        if end_of_turn_silence_ms is not None:
+            self.base_silence_ms = int(self._clamp(end_of_turn_silence_ms))
+            self._current_ms = float(self.base_silence_ms)
+            self._pauses.clear()
+
+    def observe_turn(self, pause_lengths_ms: Iterable[float]):
+        """Record a completed turn and the pauses between its words"""
+        self.turns += 1
+        self._last_turn_end = time.monotonic()
+        self._awaiting_speech = True
+        for pause in pause_lengths_ms:
+            if pause > 0:
+                self._pauses.append(pause)
+
+        if not self.adaptive or len(self._pauses) < self.MIN_PAUSE_SAMPLES:
+            return
+
+        ordered = sorted(self._pauses)
+        index = min(len(ordered) - 1, int(len(ordered) * self.PAUSE_PERCENTILE))
+        target = self._clamp(ordered[index] + self.PAUSE_MARGIN_MS)
+        self._current_ms += (target - self._current_ms) * self.SMOOTHING
+
+    def observe_speech_start(self):
+        """Record the first interim transcript after a turn end"""
+        if not self._awaiting_speech:
+            return
+        self._awaiting_speech = False
+        if (self._last_turn_end is not None and
+                time.monotonic() - self._last_turn_end < self.QUICK_RESUME_SECONDS):
+            self.observe_false_turn_end()
+
+    def observe_false_turn_end(self):
+        """Record a turn that was closed while the user was still talking"""
+        self.false_turn_ends += 1
+        if self.adaptive:
+            self._current_ms = self._clamp(self._current_ms * self.FALSE_END_BACKOFF)
+
+    def streaming_parameters(self) -> Dict[str, Any]:
+        """Turn-detection keyword arguments for ``StreamingParameters``"""
+        return {
+            "end_of_turn_silence_threshold": self.end_of_turn_silence_ms,
+            "voice_activity_threshold": self.voice_activity_threshold,
+        }
+
+    def export(self) -> Dict[str, Any]:
+        """Learned state, for saving with the session (see ``restore``)"""
+        return {
+            "base_silence_ms": self.base_silence_ms,
+            "voice_activity_threshold": self.voice_activity_threshold,
+            "adaptive": self.adaptive,
+            "current_ms": self._current_ms,
+            "pauses": list(self._pauses),
+            "turns": self.turns,
+            "false_turn_ends": self.false_turn_ends,
+        }
+
+    def restore(self, state: Dict[str, Any]):
+        """Continue from state exported by another connection"""
+        self.base_silence_ms = int(self._clamp(state.get("base_silence_ms", self.base_silence_ms)))
+        self.voice_activity_threshold = float(state.get("voice_activity_threshold", self.voice_activity_threshold))
+        self.adaptive = bool(state.get("adaptive", self.adaptive))
+        self._current_ms = float(self._clamp(state.get("current_ms", self._current_ms)))
+        self._pauses.clear()
+        self._pauses.extend(float(p) for p in state.get("pauses", ()))
+        self.turns = int(state.get("turns", 0))
+        self.false_turn_ends = int(state.get("false_turn_ends", 0))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current parameters and counters, as reported to the client"""
+        return {
+            "adaptive": self.adaptive,
+            "end_of_turn_silence_ms": self.end_of_turn_silence_ms,
+            "voice_activity_threshold": self.voice_activity_threshold,
+            "turns": self.turns,
+            "false_turn_ends": self.false_turn_ends,
+        }
+
+
+def word_pauses_ms(words: Iterable[Any]) -> list:
+    """Gaps (ms) between consecutive words of an AssemblyAI turn event"""
+    pauses = []
+    previous_end = None
+    for word in words or []:
+        start = getattr(word, "start", None)
+        end = getattr(word, "end", None)
+        if start is None or end is None:
+            continue
+        if previous_end is not None:
+            pauses.append(start - previous_end)
+        previous_end = end
+    return pauses
@@ -0,0 +1,90 @@
+"""Import-time budget for application cold start
+
+Imports ``main`` in fresh interpreters with ``python -X importtime`` and
+reports the median cumulative import time plus the slowest top-level
+imports. Exits non-zero when the median exceeds ``--budget-ms`` or when a
+vendor SDK that must stay lazy (see app/core/preload.py) is imported at
+module load:
+
+    python -m benchmarks.import_time --budget-ms 1000 --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Only imported on first use or by the background preload
+LAZY_MODULES = (
+    "assemblyai", "google.generativeai", "grpc", "google.protobuf", "websockets",
+    "bs4", "httpx", "app.services.stt_service", "app.services.llm_service",
+    "app.services.tts_service",
+)
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str) -> Tuple[int, Dict[str, int]]:
+    """One cold import: (total microseconds, cumulative microseconds by top-level module)"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", LOG_LEVEL="WARNING")
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    imported: Dict[str, int] = {}
+    total = 0
+    for line in completed.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        imported[name] = cumulative
+        if depth == 1:  # Direct imports of the interpreter (site, the module itself)
+            total += cumulative
+    return total, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="module to import")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000.0,
+                        help="fail when the median cold import takes longer")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    totals: List[int] = []
+    imported: Dict[str, int] = {}
+    for _ in range(args.runs):
+        total, imported = measure(args.module)
+        totals.append(total)
+
+    median_ms = statistics.median(totals) / 1000
+    eager = sorted(name for name in imported
+                   if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES))
+    slowest = sorted(imported.items(), key=lambda item: item[1], reverse=True)[:args.top]
+
+    print(f"import {args.module}: median {median_ms:.0f}ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.0f}ms, budget {args.budget_ms:.0f}ms)")
+    for name, cumulative in slowest:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+    if eager:
+        print("Imported at module load but expected to be lazy: " + ", ".join(eager))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "median_ms": round(median_ms, 1),
+                       "runs_ms": [round(t / 1000, 1) for t in totals],
+                       "slowest_ms": {n: round(c / 1000, 1) for n, c in slowest},
+                       "eager_vendor_modules": eager}, f, indent=2)
+
+    if median_ms > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Event-loop blocking caused by logging to a slow stdout
+
+Each mode runs in a child process whose stdout is a pipe drained at a fixed
+rate (a slow terminal or log shipper). A producer emits the per-interim
+logging of several concurrent sessions from the event loop while a probe
+measures how late ``asyncio.sleep`` wakes up.
+
+    python -m benchmarks.logging_blocking --seconds 5 --sessions 10
+
+Modes:
+    print          three print() lines per interim (the previous STT logging)
+    queue          the same lines through app.core.logging (QueueListener)
+    queue_sampled  one sampled debug line per interim (current STT logging)
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from benchmarks.voice_pipeline import REPO_ROOT, _percentiles
+
+MODES = ("print", "queue", "queue_sampled")
+PROBE_INTERVAL = 0.005
+INTERIMS_PER_SECOND = 20  # per session
+
+
+class SlowPipe:
+    """Pipe whose reader thread drains at most ``bytes_per_second``"""
+
+    def __init__(self, bytes_per_second: int):
+        self.read_fd, self.write_fd = os.pipe()
+        self.bytes_per_second = bytes_per_second
+        self.unthrottled = False
+        self.drained = 0
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        chunk = max(1, self.bytes_per_second // 20)
+        while True:
+            data = os.read(self.read_fd, chunk)
+            if not data:
+                return
+            self.drained += len(data)
+            if not self.unthrottled:
+                time.sleep(len(data) / self.bytes_per_second)
+
+
+def _emitter(mode: str):
+    """Return a function logging one interim transcript event"""
+    if mode == "print":
+        def emit(transcript: str):
+            print(f"[TURN] {transcript}")
+            print("   - End of Turn: False")
+            print("   - Still speaking (interim)")
+        return emit
+
+    from app.core.logging import get_logger, sampled, setup_logging
+    setup_logging()
+    logger = get_logger("benchmarks.logging")
+
+    if mode == "queue":
+        def emit(transcript: str):
+            logger.info("[TURN] %s", transcript)
+            logger.info("   - End of Turn: %s", False)
+            logger.info("   - Still speaking (interim)")
+    else:
+        def emit(transcript: str):
+            if sampled("stt.interim"):
+                logger.debug("Interim transcript: %s", transcript)
+    return emit
+
+
+async def _run(mode: str, seconds: float, sessions: int) -> Dict:
+    emit = _emitter(mode)
+    lags: List[float] = []
+    log_time = 0.0
+    events = 0
+    stop = time.monotonic() + seconds
+
+    async def probe():
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - started - PROBE_INTERVAL))
+
+    async def producer():
+        nonlocal log_time, events
+        interval = 1.0 / (INTERIMS_PER_SECOND * sessions)
+        transcript = "so I was thinking we could maybe go to the beach this weekend"
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            emit(transcript)
+            log_time += time.perf_counter() - started
+            events += 1
+            await asyncio.sleep(interval)
+
+    await asyncio.gather(probe(), producer())
+    return {
+        "mode": mode,
+        "events": events,
+        "loop_lag_ms": _percentiles(lags),
+        "time_in_log_calls_ms": round(log_time * 1000, 1),
+        "log_call_mean_us": round(log_time / max(1, events) * 1e6, 1),
+    }
+
+
+def run_child(mode: str, seconds: float, sessions: int, drain_rate: int):
+    pipe = SlowPipe(drain_rate)
+    sys.stdout = os.fdopen(pipe.write_fd, "w", buffering=1)
+    result = asyncio.run(_run(mode, seconds, sessions))
+    # Let the backlog (queue modes) flush quickly before exiting
+    pipe.unthrottled = True
+    os.write(sys.__stdout__.fileno(), (json.dumps(result) + "\n").encode())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions producing interims")
+    parser.add_argument("--drain-rate", type=int, default=4096, help="stdout drain rate in bytes/s")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    if args.mode:
+        run_child(args.mode, args.seconds, args.sessions, args.drain_rate)
+        return
+
+    results = []
+    env = dict(os.environ, LOG_LEVEL="DEBUG", PYTHONUNBUFFERED="1")
+    for mode in MODES:
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.logging_blocking", "--mode", mode,
+             "--seconds", str(args.seconds), "--sessions", str(args.sessions),
+             "--drain-rate", str(args.drain_rate)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    for result in results:
+        lag = result["loop_lag_ms"]
+        print(f"{result['mode']:>14}: loop lag p50 {lag['p50']}ms p99 {lag['p99']}ms "
+              f"max {lag['max']}ms, {result['time_in_log_calls_ms']}ms in log calls "
+              f"({result['log_call_mean_us']}us/event)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Micro-benchmark of WebSocket message serialization
+
+Serializes the message mix of one realistic conversational turn (interim
+transcripts, control messages, a streamed LLM response with its growing
+``accumulated`` text, one base64 WAV ``tts_response`` and ``turn_metrics``)
+and parses the client's inbound commands, comparing:
+
+    json           json.dumps / json.loads on dicts (the previous code path)
+    backend        app.core.serialization.dumps / loads on dicts
+    templates      MessageTemplate for tts_response, backend for the rest (handler path)
+    all_templates  also templates for interims and LLM chunks
+
+    python -m benchmarks.serialization --audio-seconds 10 --repeat 20
+"""
+import argparse
+import base64
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from app.core.serialization import BACKEND, MessageTemplate, dumps, loads
+from app.core.protocol import TTS_RESPONSE
+
+TURN_ID = "3f2a9c1d7e4b"
+RESPONSE = ("Take a slow breath in through your nose, hold it for a moment, and let it go. "
+            "Notice the sound of the waves as they roll in and out, steady and unhurried. ") * 4
+
+
+def build_turn(audio_seconds: float) -> Dict[str, List]:
+    """Messages of one turn as (type, fields) pairs plus the inbound commands"""
+    timestamp = datetime.now().isoformat()
+    words = RESPONSE.split(" ")
+    chunks = [" ".join(words[i:i + 5]) + " " for i in range(0, len(words), 5)]
+    # 44.1 kHz 16-bit mono WAV, like Murf returns
+    audio = base64.b64encode(os.urandom(int(audio_seconds * 44100 * 2) + 44)).decode()
+
+    outbound = []
+    spoken = "so I was thinking we could maybe go to the beach this weekend".split()
+    for i in range(1, len(spoken) + 1):
+        outbound.append(("interim_transcript", {"text": " ".join(spoken[:i]), "timestamp": timestamp}))
+    for message_type in ("turn_end", "llm_thinking", "llm_response_start"):
+        outbound.append((message_type, {"turn_id": TURN_ID, "message": "status", "timestamp": timestamp}))
+    accumulated = ""
+    for number, chunk in enumerate(chunks, 1):
+        accumulated += chunk
+        outbound.append(("llm_response_chunk", {"turn_id": TURN_ID, "chunk": chunk, "accumulated": accumulated,
+                                                "chunk_number": number, "timestamp": timestamp}))
+    outbound.append(("llm_response_complete", {"turn_id": TURN_ID, "final_response": accumulated,
+                                               "total_chunks": len(chunks), "timestamp": timestamp}))
+    outbound.append(("tts_response", {"turn_id": TURN_ID, "audio": audio, "timestamp": timestamp}))
+    outbound.append(("turn_metrics", {"turn_id": TURN_ID, "stages_ms": {"llm_first_token": 301.2},
+                                      "spans_ms": {"turn_total": 3805.9, "audio_delivery": 85.7}}))
+
+    inbound = [json.dumps(m) for m in (
+        {"type": "api_keys", "data": {"google_api_key": "x" * 39, "murf_api_key": "y" * 32,
+                                      "assemblyai_api_key": "z" * 32}},
+        {"type": "command", "command": "start_recording"},
+        {"type": "turn_detection", "data": {"end_of_turn_silence_ms": 600}},
+        {"type": "command", "command": "stop_recording"},
+    )]
+    return {"outbound": outbound, "inbound": inbound}
+
+
+TEMPLATES = {"tts_response": TTS_RESPONSE}
+# Templates for small messages, to show why the handler does not use them
+SMALL_TEMPLATES = {
+    "interim_transcript": MessageTemplate("interim_transcript", ("text", "timestamp"), safe=("timestamp",)),
+    "llm_response_chunk": MessageTemplate(
+        "llm_response_chunk", ("turn_id", "chunk", "accumulated", "chunk_number", "timestamp"),
+        safe=("turn_id", "timestamp")),
+}
+
+
+def strategies() -> Dict[str, Callable[[str, dict], str]]:
+    def json_dicts(message_type: str, fields: dict) -> str:
+        return json.dumps({"type": message_type, **fields})
+
+    def backend_dicts(message_type: str, fields: dict) -> str:
+        return dumps({"type": message_type, **fields})
+
+    def templates(message_type: str, fields: dict) -> str:
+        template = TEMPLATES.get(message_type)
+        if template is not None:
+            return template.render(**fields)
+        return dumps({"type": message_type, **fields})
+
+    def all_templates(message_type: str, fields: dict) -> str:
+        template = TEMPLATES.get(message_type) or SMALL_TEMPLATES.get(message_type)
+        if template is not None:
+            return template.render(**fields)
+        return dumps({"type": message_type, **fields})
+
+    return {"json": json_dicts, "backend": backend_dicts, "templates": templates,
+            "all_templates": all_templates}
+
+
+def _time(fn: Callable[[], None], repeat: int) -> float:
+    """Median seconds per call"""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+def run(audio_seconds: float, repeat: int) -> Dict:
+    turn = build_turn(audio_seconds)
+    outbound, inbound = turn["outbound"], turn["inbound"]
+    results: Dict[str, Dict] = {}
+    for name, encode in strategies().items():
+        by_type: Dict[str, float] = {}
+        for message_type in dict.fromkeys(t for t, _ in outbound):
+            group = [fields for t, fields in outbound if t == message_type]
+            by_type[message_type] = _time(lambda: [encode(message_type, f) for f in group], repeat)
+        payload = sum(len(encode(t, f)) for t, f in outbound)
+        results[name] = {
+            "turn_us": round(sum(by_type.values()) * 1e6, 1),
+            "by_type_us": {t: round(s * 1e6, 1) for t, s in by_type.items()},
+            "bytes_per_turn": payload,
+        }
+    parse = {"json": json.loads, "backend": loads}
+    for name, decode in parse.items():
+        results.setdefault(name, {})["inbound_us"] = round(
+            _time(lambda: [decode(m) for m in inbound], repeat) * 1e6, 2)
+    return {"backend": BACKEND, "audio_seconds": audio_seconds, "messages_per_turn": len(outbound),
+            "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-seconds", type=float, default=10.0, help="length of the TTS audio per turn")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results JSON here")
+    args = parser.parse_args()
+
+    report = run(args.audio_seconds, args.repeat)
+    print(f"backend: {report['backend']}, {report['messages_per_turn']} messages per turn, "
+          f"{args.audio_seconds}s of audio")
+    for name, result in report["results"].items():
+        by_type = result.get("by_type_us", {})
+        print(f"{name:>13}: {result.get('turn_us', '-')}us per turn "
+              f"(tts_response {by_type.get('tts_response', '-')}us, "
+              f"llm chunks {by_type.get('llm_response_chunk', '-')}us, "
+              f"interims {by_type.get('interim_transcript', '-')}us), "
+              f"inbound {result.get('inbound_us', '-')}us")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""End-to-end benchmark of the /ws voice pipeline using the fake backends
+
+Starts the app with STT/LLM/TTS fakes in a uvicorn subprocess, drives N
+concurrent simulated browser clients that stream 16 kHz PCM in real time,
+and reports per-turn latencies, throughput and server CPU/RSS as JSON.
+
+    python -m benchmarks.voice_pipeline --clients 20 --turns 3 --output bench.json
+    python -m benchmarks.voice_pipeline --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import websockets
+
+from app.core.protocol import FRAME_AUDIO, FRAME_JSON, SUBPROTOCOL, decode_frame, encode_frame
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * 2 * FRAME_MS // 1000
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAKE_ENV = {
+    "STT_BACKEND": "fake",
+    "LLM_BACKEND": "fake",
+    "TTS_BACKEND": "fake",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p90/p99/mean/max in milliseconds"""
+    if not values:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "p50": pick(0.50),
+        "p90": pick(0.90),
+        "p99": pick(0.99),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+class ProcessSampler:
+    """Samples CPU time and RSS of the server process from /proc (Linux)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+        self.peak_rss = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def cpu_seconds(self) -> Optional[float]:
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def rss_bytes(self) -> Optional[int]:
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    async def _run(self):
+        while True:
+            rss = self.rss_bytes()
+            if rss:
+                self.peak_rss = max(self.peak_rss, rss)
+            await asyncio.sleep(0.1)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class SimulatedClient:
+    """A browser client: streams PCM per turn and times the responses"""
+
+    def __init__(self, url: str, turns: int, timeout: float, seed: int, binary: bool = False):
+        self.url = url
+        self.turns = turns
+        self.timeout = timeout
+        self.binary = binary
+        self.seq = 0
+        self.rng = random.Random(seed)
+        self.results: List[Dict[str, float]] = []
+        self.messages_received = 0
+        self.bytes_received = 0
+        self.errors: List[str] = []
+
+    async def _recv(self, ws) -> dict:
+        raw = await asyncio.wait_for(ws.recv(), self.timeout)
+        self.messages_received += 1
+        self.bytes_received += len(raw)
+        if isinstance(raw, bytes):
+            if not self.binary:
+                return {"type": "binary"}
+            return decode_frame(raw).meta or {}
+        return json.loads(raw)
+
+    async def _send_json(self, ws, message: dict):
+        if self.binary:
+            self.seq += 1
+            await ws.send(encode_frame(FRAME_JSON, self.seq, json.dumps(message).encode()))
+        else:
+            await ws.send(json.dumps(message))
+
+    async def _send_audio(self, ws, pcm: bytes):
+        if self.binary:
+            self.seq += 1
+            await ws.send(encode_frame(FRAME_AUDIO, self.seq, body=pcm))
+        else:
+            await ws.send(pcm)
+
+    async def _stream_audio(self, ws):
+        """Send non-silent PCM frames at real-time pace until cancelled"""
+        next_send = time.perf_counter()
+        while True:
+            await self._send_audio(ws, self.rng.randbytes(FRAME_BYTES))
+            next_send += FRAME_MS / 1000
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+    async def run(self):
+        try:
+            subprotocols = [SUBPROTOCOL] if self.binary else None
+            async with websockets.connect(self.url, max_size=None, subprotocols=subprotocols) as ws:
+                await self._send_json(ws, {"type": "api_keys", "data": {}})
+                await self._send_json(ws, {"command": "start_recording"})
+                for _ in range(self.turns):
+                    await self._run_turn(ws)
+                await self._send_json(ws, {"command": "stop_recording"})
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+
+    async def _run_turn(self, ws):
+        turn: Dict[str, float] = {}
+        started = time.perf_counter()
+        streamer = asyncio.create_task(self._stream_audio(ws))
+        try:
+            while True:
+                message = await self._recv(ws)
+                now = time.perf_counter()
+                kind = message.get("type")
+                if kind in ("interim_transcript", "turn_end") and "first_transcript" not in turn:
+                    turn["first_transcript"] = now - started
+                if kind == "turn_end":
+                    turn_end = now
+                    # The user stops talking once the turn has been detected
+                    streamer.cancel()
+                    break
+            while True:
+                message = await self._recv(ws)
+                now = time.perf_counter()
+                kind = message.get("type")
+                if kind == "llm_response_chunk" and "first_llm_token" not in turn:
+                    turn["first_llm_token"] = now - turn_end
+                elif kind == "llm_response_complete":
+                    turn["llm_complete"] = now - turn_end
+                elif kind in ("tts_response", "binary"):
+                    turn["first_audio"] = now - turn_end
+                    break
+                elif kind in ("tts_error", "llm_error", "error"):
+                    self.errors.append(message.get("message", kind))
+                    break
+        finally:
+            streamer.cancel()
+        self.results.append(turn)
+
+
+async def _wait_for_server(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+async def run_benchmark(clients: int, turns: int, timeout: float, extra_env: Dict[str, str],
+                        binary: bool = False) -> dict:
+    """Run the benchmark against a fresh server and return the report"""
+    port = _free_port()
+    env = dict(os.environ, **FAKE_ENV, FAKE_MURF_PORT=str(_free_port()), **extra_env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await _wait_for_server(port)
+        sampler = ProcessSampler(server.pid)
+        baseline_rss = sampler.rss_bytes()
+        cpu_before = sampler.cpu_seconds()
+        sampler.start()
+
+        sims = [SimulatedClient(f"ws://127.0.0.1:{port}/ws", turns, timeout, seed=i, binary=binary)
+                for i in range(clients)]
+        started = time.perf_counter()
+        await asyncio.gather(*(sim.run() for sim in sims))
+        wall = time.perf_counter() - started
+
+        await sampler.stop()
+        cpu_after = sampler.cpu_seconds()
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    turns_done = [t for sim in sims for t in sim.results]
+    messages = sum(sim.messages_received for sim in sims)
+    cpu = (cpu_after - cpu_before) if cpu_before is not None and cpu_after is not None else None
+    rss_growth = (sampler.peak_rss - baseline_rss) if baseline_rss and sampler.peak_rss else None
+
+    def stage(name: str) -> dict:
+        return _percentiles([t[name] for t in turns_done if name in t])
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "clients": clients,
+            "turns_per_client": turns,
+            "protocol": "binary" if binary else "json",
+            "env": {**FAKE_ENV, **extra_env},
+        },
+        "latency_ms": {
+            "time_to_first_transcript": stage("first_transcript"),
+            "time_to_first_llm_token": stage("first_llm_token"),
+            "time_to_llm_complete": stage("llm_complete"),
+            "time_to_first_audio": stage("first_audio"),
+        },
+        "throughput": {
+            "wall_seconds": round(wall, 3),
+            "turns_completed": len([t for t in turns_done if "first_audio" in t]),
+            "messages_received": messages,
+            "messages_per_second": round(messages / wall, 2) if wall else None,
+            "bytes_received": sum(sim.bytes_received for sim in sims),
+        },
+        "server": {
+            "cpu_seconds": round(cpu, 3) if cpu is not None else None,
+            "cpu_seconds_per_session": round(cpu / clients, 4) if cpu is not None else None,
+            "baseline_rss_bytes": baseline_rss,
+            "peak_rss_bytes": sampler.peak_rss or None,
+            "rss_bytes_per_session": int(rss_growth / clients) if rss_growth is not None else None,
+        },
+        "errors": [e for sim in sims for e in sim.errors][:20],
+    }
+
+
+def compare(before: dict, after: dict) -> List[str]:
+    """Human-readable deltas between two reports"""
+    lines = []
+    for section in ("latency_ms", "throughput", "server"):
+        for key, old in before.get(section, {}).items():
+            new = after.get(section, {}).get(key)
+            pairs = old.items() if isinstance(old, dict) else [("", old)]
+            for sub, old_value in pairs:
+                new_value = new.get(sub) if isinstance(new, dict) else new
+                if not isinstance(old_value, (int, float)) or not isinstance(new_value, (int, float)):
+                    continue
+                change = ((new_value - old_value) / old_value * 100) if old_value else 0.0
+                label = f"{section}.{key}" + (f".{sub}" if sub else "")
+                lines.append(f"{label:<55} {old_value:>14} -> {new_value:<14} ({change:+.1f}%)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the /ws voice pipeline with fake backends")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent simulated clients")
+    parser.add_argument("--turns", type=int, default=3, help="turns per client")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-message timeout in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra server environment (e.g. FAKE_LLM_TOKEN_MS=10)")
+    parser.add_argument("--protocol", choices=("json", "binary"), default="json",
+                        help="wire protocol spoken by the simulated clients")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="print deltas between two saved reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_before, open(args.compare[1]) as f_after:
+            print("\n".join(compare(json.load(f_before), json.load(f_after))))
+        return
+
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    report = asyncio.run(run_benchmark(args.clients, args.turns, args.timeout, extra_env,
+                                       binary=args.protocol == "binary"))
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
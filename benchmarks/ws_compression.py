@@ -0,0 +1,236 @@
+"""Micro-benchmark of permessage-deflate policies on the /ws message mix
+
+Encodes the outbound messages of one turn (see benchmarks/serialization.py)
+with the JSON and the binary protocol codecs and runs them through the
+websockets permessage-deflate encoder, one connection per repetition, under
+each policy of app/core/ws_compression.py:
+
+    off               no compression
+    all/levelN        every message, zlib level N
+    selective/minN    skip audio and messages under N bytes
+
+and reports bytes on the wire, the share saved and the compression CPU time
+per turn. The TTS audio is random bytes, the incompressible worst case.
+
+    python -m benchmarks.ws_compression --audio-seconds 10 --repeat 20
+
+``--check`` instead serves the turn through uvicorn with
+CompressionPolicyWebSocketProtocol (the WS_COMPRESSION=selective policy),
+connects with a client offering permessage-deflate and exits non-zero
+unless small messages and audio arrive with RSV1 unset and large text
+arrives compressed.
+
+    python -m benchmarks.ws_compression --check
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import uvicorn
+from websockets.asyncio.client import connect
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory, PerMessageDeflate
+from websockets.frames import OP_BINARY, OP_TEXT, Frame
+
+from app.core.config import settings
+from app.core.protocol import BinaryCodec, JsonCodec
+from app.core.ws_compression import CompressionPolicyWebSocketProtocol, SelectivePerMessageDeflate, skip_reason
+from benchmarks.serialization import build_turn
+
+WINDOW_BITS = 12
+MEM_LEVEL = 5
+
+# name -> (zlib level or None for off, min_bytes or None for all)
+POLICIES: Dict[str, Tuple[Optional[int], Optional[int]]] = {
+    "off": (None, None),
+    "all/level1": (1, None),
+    "all/level6": (6, None),
+    "all/level9": (9, None),
+    "selective/min0": (6, 0),
+    "selective/min128": (6, 128),
+    "selective/min256": (6, 256),
+    "selective/min512": (6, 512),
+    "selective/min256/level1": (1, 256),
+}
+
+
+def encode_turn(codec, audio_seconds: float) -> List[Frame]:
+    """Frames one turn sends to the client with ``codec``"""
+    frames = []
+    opcode = OP_BINARY if codec.binary else OP_TEXT
+    for message_type, fields in build_turn(audio_seconds)["outbound"]:
+        if message_type == "tts_response":
+            message = codec.audio(fields["turn_id"], base64.b64decode(fields["audio"]), fields["timestamp"])
+        else:
+            message = codec.prepare({"type": message_type, **fields})
+        payload = codec.encode(message)
+        frames.append(Frame(opcode, payload.encode() if isinstance(payload, str) else payload))
+    return frames
+
+
+def _extension(level: int, min_bytes: Optional[int]) -> SelectivePerMessageDeflate:
+    return SelectivePerMessageDeflate(
+        False, False, WINDOW_BITS, WINDOW_BITS, {"level": level, "memLevel": MEM_LEVEL},
+        # "all" compresses everything, audio included
+        min_bytes=min_bytes or 0, compress_audio=min_bytes is None)
+
+
+def run_policy(frames: List[Frame], level: Optional[int], min_bytes: Optional[int],
+               repeat: int) -> Dict:
+    raw = sum(len(f.data) for f in frames)
+    if level is None:
+        return {"bytes": raw, "saved_pct": 0.0, "cpu_us": 0.0, "compressed_messages": 0}
+    runs = []
+    sent = compressed = 0
+    for _ in range(repeat):
+        extension = _extension(level, min_bytes)
+        started = time.process_time()
+        encoded = [extension.encode(f) for f in frames]
+        runs.append(time.process_time() - started)
+        sent = sum(len(f.data) for f in encoded)
+        compressed = sum(1 for f in encoded if f.rsv1)
+    return {
+        "bytes": sent,
+        "saved_pct": round(100 * (raw - sent) / raw, 2),
+        "cpu_us": round(statistics.median(runs) * 1e6, 1),
+        "compressed_messages": compressed,
+    }
+
+
+def run(audio_seconds: float, repeat: int) -> Dict:
+    report = {"audio_seconds": audio_seconds, "window_bits": WINDOW_BITS, "mem_level": MEM_LEVEL,
+              "protocols": {}}
+    for name, codec in (("json", JsonCodec()), ("binary", BinaryCodec())):
+        frames = encode_turn(codec, audio_seconds)
+        results = {policy: run_policy(frames, level, min_bytes, repeat)
+                   for policy, (level, min_bytes) in POLICIES.items()}
+        report["protocols"][name] = {"messages_per_turn": len(frames),
+                                     "raw_bytes": sum(len(f.data) for f in frames),
+                                     "results": results}
+    return report
+
+
+class _RecordingDeflate(PerMessageDeflate):
+    """Client-side extension that notes whether each received message was compressed"""
+
+    def __init__(self, *args, received: list, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.received = received
+
+    def decode(self, frame: Frame, *, max_size: Optional[int] = None) -> Frame:
+        if frame.opcode in (OP_TEXT, OP_BINARY):
+            self.received.append(frame.rsv1)
+        return super().decode(frame, max_size=max_size)
+
+
+class _RecordingDeflateFactory(ClientPerMessageDeflateFactory):
+    def __init__(self, received: list):
+        super().__init__()
+        self.received = received
+
+    def process_response_params(self, params, accepted_extensions):
+        extension = super().process_response_params(params, accepted_extensions)
+        return _RecordingDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+            received=self.received,
+        )
+
+
+def _turn_app(frames: List[Frame]):
+    """ASGI app that sends ``frames`` to every WebSocket client, then closes"""
+    async def app(scope, receive, send):
+        if scope["type"] != "websocket":
+            return
+        await receive()
+        await send({"type": "websocket.accept"})
+        for frame in frames:
+            if frame.opcode is OP_BINARY:
+                await send({"type": "websocket.send", "bytes": frame.data})
+            else:
+                await send({"type": "websocket.send", "text": frame.data.decode()})
+        await send({"type": "websocket.close", "code": 1000})
+    return app
+
+
+async def _check_protocol(codec, audio_seconds: float) -> List[str]:
+    """Serve one turn through uvicorn and compare RSV1 with the selective policy"""
+    frames = encode_turn(codec, audio_seconds)
+    config = uvicorn.Config(_turn_app(frames), host="127.0.0.1", port=0, lifespan="off",
+                            ws=CompressionPolicyWebSocketProtocol, log_level="warning")
+    server = uvicorn.Server(config)
+    serving = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        received: list = []
+        async with connect(f"ws://127.0.0.1:{port}/", compression=None, max_size=None,
+                           extensions=[_RecordingDeflateFactory(received)]) as ws:
+            if not any(isinstance(e, _RecordingDeflate) for e in ws.protocol.extensions):
+                return ["permessage-deflate was not negotiated"]
+            async for _ in ws:
+                pass
+    finally:
+        server.should_exit = True
+        await serving
+
+    errors = []
+    if len(received) != len(frames):
+        errors.append(f"received {len(received)} of {len(frames)} messages")
+    for frame, rsv1 in zip(frames, received):
+        reason = skip_reason(frame.opcode, frame.data, settings.ws_compress_min_bytes)
+        if rsv1 == (reason is not None):
+            errors.append(f"{len(frame.data)}-byte {'binary' if frame.opcode is OP_BINARY else 'text'} "
+                          f"message sent {'compressed' if rsv1 else 'uncompressed'} "
+                          f"(expected {reason or 'compressed'})")
+    return errors
+
+
+def check(audio_seconds: float) -> bool:
+    """Verify the selective policy on the wire for both protocols"""
+    settings.ws_compression = "selective"
+    settings.ws_compress_audio = False
+    ok = True
+    for name, codec in (("json", JsonCodec()), ("binary", BinaryCodec())):
+        errors = asyncio.run(_check_protocol(codec, audio_seconds))
+        print(f"{name} protocol: {'ok' if not errors else 'FAILED'}")
+        for error in errors:
+            print(f"  {error}")
+        ok = ok and not errors
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio-seconds", type=float, default=10.0, help="length of the TTS audio per turn")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--check", action="store_true",
+                        help="verify RSV1 on frames served through uvicorn instead of benchmarking")
+    args = parser.parse_args()
+
+    if args.check:
+        sys.exit(0 if check(args.audio_seconds) else 1)
+
+    report = run(args.audio_seconds, args.repeat)
+    for name, protocol in report["protocols"].items():
+        print(f"{name} protocol: {protocol['messages_per_turn']} messages, "
+              f"{protocol['raw_bytes']} bytes per turn, {args.audio_seconds}s of audio")
+        for policy, result in protocol["results"].items():
+            print(f"{policy:>24}: {result['bytes']:>8} bytes ({result['saved_pct']:5.1f}% saved), "
+                  f"{result['cpu_us']:>8}us CPU, {result['compressed_messages']} compressed")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
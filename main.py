@@ -1,21 +1,24 @@
 """Main FastAPI application"""
 from fastapi import FastAPI, Request
 from fastapi.responses import HTMLResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Optional
 import os
 
 from app.core.config import settings
-# from app.core.logging import setup_logging, get_logger
+from app.core.logging import setup_logging, get_logger
 from app.api import health
 from app.api import search
+from app.api import metrics
+from app.api import admin
+from app.api import assets
+from app.api.assets import page_response
+from app.core.assets import asset_store
 from websocket_handler import websocket_endpoint
 
 # Setup logging
-# setup_logging()
-# logger = get_logger(__name__)
+setup_logging()
+logger = get_logger(__name__)
 
 # Create FastAPI app
 app = FastAPI(
@@ -35,34 +38,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Static files and templates
-app.mount("/static", StaticFiles(directory="static"), name="static")
-
-templates = Jinja2Templates(directory="templates")
-
 # Include API routes
 app.include_router(health.router)
 app.include_router(search.router)
+app.include_router(metrics.router)
+app.include_router(admin.router)
+app.include_router(assets.router)
 
-# logger.info("AI Voice Chat API initialized successfully")
+logger.info("AI Voice Chat API initialized successfully")
 
 # WebSocket endpoint using the refactored handler
 app.websocket("/ws")(websocket_endpoint)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    # logger.info("AI Voice Chat interface requested")
-    return templates.TemplateResponse("index.html", {"request": request})
+    logger.debug("AI Voice Chat interface requested")
+    return page_response("index.html", request)
 
 @app.get("/settings", response_class=HTMLResponse)
 async def read_settings(request: Request):
-    # logger.info("AI Voice Chat settings requested")
-    return templates.TemplateResponse("settings.html", {"request": request})
+    logger.debug("AI Voice Chat settings requested")
+    return page_response("settings.html", request)
 
 @app.get("/about", response_class=HTMLResponse)
 async def read_about(request: Request):
-    # logger.info("AI Voice Chat about page requested")
-    return templates.TemplateResponse("about.html", {"request": request})
+    logger.debug("AI Voice Chat about page requested")
+    return page_response("about.html", request)
 
 # @app.on_event("startup")
 # async def startup_event():
@@ -88,13 +89,104 @@ async def read_about(request: Request):
 #     """Application shutdown event"""
 #     logger.info("AI Voice Chat API shutting down")
 
+@app.on_event("startup")
+async def load_assets():
+    """Build (if stale) and load the static assets and pre-rendered pages (app/core/assets.py)"""
+    asset_store.load()
+
+@app.on_event("startup")
+async def load_user_keys():
+    """Read and decrypt user_keys.json once, so later loads are served from memory"""
+    from app.core.config import user_key_store
+    user_key_store.refresh()
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    """Start measuring event loop lag"""
+    if settings.loop_monitor_enabled:
+        from app.core.loop_monitor import loop_monitor
+        loop_monitor.start()
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    """Stop the event loop monitor"""
+    from app.core.loop_monitor import loop_monitor
+    await loop_monitor.stop()
+
+@app.on_event("startup")
+async def start_overload_controller():
+    """Start sampling the load shedding signals"""
+    if settings.overload_enabled:
+        from app.core.overload import overload
+        overload.start()
+
+@app.on_event("shutdown")
+async def stop_overload_controller():
+    """Stop the overload controller"""
+    from app.core.overload import overload
+    await overload.stop()
+
+@app.on_event("shutdown")
+async def stop_timer_wheel():
+    """Stop the session limit timer wheel"""
+    from app.core.timer_wheel import timer_wheel
+    await timer_wheel.stop()
+
+@app.on_event("startup")
+async def preload_vendor_sdks():
+    """Import the STT/LLM/TTS SDKs in the background (kept out of module scope)"""
+    if settings.preload_vendor_sdks:
+        from app.core.preload import start_preload
+        start_preload()
+
+@app.on_event("startup")
+async def start_fake_backends():
+    """Start the local Murf stand-in when the fake TTS backend is selected"""
+    if settings.tts_backend == "fake":
+        from app.services.fakes import FakeMurfServer
+        try:
+            app.state.fake_murf = await FakeMurfServer().start()
+        except OSError:
+            # With several workers the first one to start serves everyone
+            logger.info("Fake Murf port %s already in use - sharing that server", settings.fake_murf_port)
+
+@app.on_event("shutdown")
+async def stop_fake_backends():
+    """Stop the local Murf stand-in"""
+    fake_murf = getattr(app.state, "fake_murf", None)
+    if fake_murf:
+        await fake_murf.stop()
+
+@app.on_event("startup")
+async def start_health_prober():
+    """Start probing the upstream services (after the fake servers are up)"""
+    if settings.health_probe_enabled:
+        from app.services.health_service import health_prober
+        health_prober.start()
+
+@app.on_event("shutdown")
+async def stop_health_prober():
+    """Stop the upstream health prober"""
+    from app.services.health_service import health_prober
+    await health_prober.stop()
+
+@app.on_event("shutdown")
+async def close_session_store():
+    """Close the session store connection"""
+    from app.services.session_store import session_store
+    await session_store.close()
+
 if __name__ == "__main__":
     import uvicorn
+    from app.core.ws_compression import CompressionPolicyWebSocketProtocol
+    # Local runs only; deployments use `python -m app.serve` (Procfile)
     port = int(os.getenv("PORT", settings.port))
     uvicorn.run(
         "main:app",
         host=settings.host,
         port=port,
         reload=settings.debug,
+        # Selective permessage-deflate (WS_COMPRESSION), see app/core/ws_compression.py
+        ws=CompressionPolicyWebSocketProtocol,
         log_level="info" if settings.debug else "warning"
     )
@@ -13,6 +13,33 @@ let allowTtsPlayback = true;
 // Track all active TTS sources so we can stop them reliably
 let activeTtsSources = [];
 
+// Binary framed protocol (see app/core/protocol.py): 20-byte header
+// (version u8, type u8, flags u16, seq u32, timestamp_us u64, meta_len u32),
+// then JSON metadata, then a raw body. Used when the server accepts the
+// subprotocol; otherwise we fall back to JSON text messages.
+const BINARY_SUBPROTOCOL = "calm-guide.binary.v1";
+const FRAME_VERSION = 1;
+const FRAME_JSON = 1;
+const FRAME_AUDIO = 2;
+const FRAME_HEADER_BYTES = 20;
+let useBinaryProtocol = false;
+let outboundSeq = 0;
+
+// Session resumption (see app/core/resume.py): the last server sequence
+// number received is sent back on reconnect so missed messages are replayed
+let lastInboundSeq = 0;
+// Acknowledged periodically so the server can drop delivered messages
+let lastAckedSeq = 0;
+let ackTimer = null;
+const ACK_INTERVAL_MS = 2000;
+let reconnectAttempts = 0;
+const MAX_RECONNECT_DELAY_MS = 10000;
+// Close codes after which we do not reconnect (normal close, superseded,
+// idle timeout, maximum session duration)
+const NO_RECONNECT_CODES = [1000, 4000, 4001, 4002];
+const textEncoder = new TextEncoder();
+const textDecoder = new TextDecoder();
+
 let toggleChatBtn,
     toggleChatText,
     clearBtn,
@@ -39,6 +66,19 @@ async function initializePlaybackAudio() {
 
 // Play base64 audio data
 async function playAudioFromBase64(base64Audio) {
+    const binaryString = atob(base64Audio);
+    const arrayBuffer = new ArrayBuffer(binaryString.length);
+    const uint8Array = new Uint8Array(arrayBuffer);
+
+    for (let i = 0; i < binaryString.length; i++) {
+        uint8Array[i] = binaryString.charCodeAt(i);
+    }
+
+    await playAudioBuffer(arrayBuffer);
+}
+
+// Play WAV audio from an ArrayBuffer
+async function playAudioBuffer(arrayBuffer) {
     try {
         await initializePlaybackAudio();
 
@@ -48,14 +88,6 @@ async function playAudioFromBase64(base64Audio) {
             return;
         }
 
-        const binaryString = atob(base64Audio);
-        const arrayBuffer = new ArrayBuffer(binaryString.length);
-        const uint8Array = new Uint8Array(arrayBuffer);
-
-        for (let i = 0; i < binaryString.length; i++) {
-            uint8Array[i] = binaryString.charCodeAt(i);
-        }
-
         const audioBuffer = await playbackAudioContext.decodeAudioData(
             arrayBuffer
         );
@@ -99,16 +131,88 @@ async function playAudioFromBase64(base64Audio) {
     }
 }
 
+// Build a binary protocol frame
+function encodeFrame(type, meta, body) {
+    const metaBytes = meta ? textEncoder.encode(JSON.stringify(meta)) : new Uint8Array(0);
+    let bodyBytes = new Uint8Array(0);
+    if (body) {
+        bodyBytes = ArrayBuffer.isView(body)
+            ? new Uint8Array(body.buffer, body.byteOffset, body.byteLength)
+            : new Uint8Array(body);
+    }
+    const frame = new Uint8Array(FRAME_HEADER_BYTES + metaBytes.length + bodyBytes.length);
+    const view = new DataView(frame.buffer);
+    outboundSeq = (outboundSeq + 1) >>> 0;
+    view.setUint8(0, FRAME_VERSION);
+    view.setUint8(1, type);
+    view.setUint16(2, 0);
+    view.setUint32(4, outboundSeq);
+    view.setBigUint64(8, BigInt(Math.round(performance.now() * 1000)));
+    view.setUint32(16, metaBytes.length);
+    frame.set(metaBytes, FRAME_HEADER_BYTES);
+    frame.set(bodyBytes, FRAME_HEADER_BYTES + metaBytes.length);
+    return frame.buffer;
+}
+
+// Parse a binary protocol frame into { type, seq, meta, body }
+function decodeFrame(buffer) {
+    const view = new DataView(buffer);
+    const metaLength = view.getUint32(16);
+    const metaEnd = FRAME_HEADER_BYTES + metaLength;
+    const meta = metaLength
+        ? JSON.parse(textDecoder.decode(new Uint8Array(buffer, FRAME_HEADER_BYTES, metaLength)))
+        : null;
+    return {
+        type: view.getUint8(1),
+        seq: view.getUint32(4),
+        meta: meta,
+        body: buffer.slice(metaEnd),
+    };
+}
+
+// Send a JSON message in the negotiated protocol
+function sendJson(message) {
+    if (useBinaryProtocol) {
+        websocket.send(encodeFrame(FRAME_JSON, message));
+    } else {
+        websocket.send(JSON.stringify(message));
+    }
+}
+
+// Send microphone PCM in the negotiated protocol
+function sendAudio(pcm) {
+    if (useBinaryProtocol) {
+        websocket.send(encodeFrame(FRAME_AUDIO, null, pcm));
+    } else {
+        websocket.send(pcm);
+    }
+}
+
 // Connect to WebSocket
 function connectWebSocket(path = "/ws") {
     const proto = location.protocol === "https:" ? "wss" : "ws";
-    const wsUrl = `${proto}://${location.host}${path}`;
+    // Resume this tab's conversation, whichever server worker we reach
+    const resumeToken = sessionStorage.getItem("resume_token");
+    const query = resumeToken
+        ? `?resume_token=${encodeURIComponent(resumeToken)}&last_seq=${lastInboundSeq}`
+        : "";
+    const wsUrl = `${proto}://${location.host}${path}${query}`;
     console.log("Attempting to connect to WebSocket:", wsUrl);
 
-    websocket = new WebSocket(wsUrl);
+    websocket = new WebSocket(wsUrl, [BINARY_SUBPROTOCOL]);
+    websocket.binaryType = "arraybuffer";
 
     websocket.onopen = () => {
-        console.log("WebSocket connected");
+        useBinaryProtocol = websocket.protocol === BINARY_SUBPROTOCOL;
+        outboundSeq = 0;
+        reconnectAttempts = 0;
+        lastAckedSeq = 0;
+        clearInterval(ackTimer);
+        ackTimer = setInterval(sendAck, ACK_INTERVAL_MS);
+        console.log(
+            "WebSocket connected",
+            useBinaryProtocol ? "(binary protocol)" : "(JSON protocol)"
+        );
         connectionStatus.innerHTML =
             '<span class="text-green-300">● Connected</span>';
         addSystemMessage("Connected to AI Calm Guide server", "success");
@@ -121,12 +225,10 @@ function connectWebSocket(path = "/ws") {
             murf_api_key: localStorage.getItem("murf_api_key") || "",
         };
 
-        websocket.send(
-            JSON.stringify({
-                type: "api_keys",
-                data: apiKeys,
-            })
-        );
+        sendJson({
+            type: "api_keys",
+            data: apiKeys,
+        });
 
         // Test interim text element
         interimText.textContent = "Connection test - interim text working";
@@ -136,15 +238,38 @@ function connectWebSocket(path = "/ws") {
     };
 
     websocket.onmessage = (event) => {
+        if (event.data instanceof ArrayBuffer) {
+            const frame = decodeFrame(event.data);
+            if (!acceptInbound(frame.seq, frame.meta)) return;
+            if (frame.type === FRAME_AUDIO) {
+                // Raw WAV body: no base64 decoding needed
+                console.log(`Received TTS audio (${frame.body.byteLength} bytes)`);
+                playAudioBuffer(frame.body);
+            } else if (frame.meta) {
+                handleWebSocketMessage(frame.meta);
+            }
+            return;
+        }
         const data = JSON.parse(event.data);
+        if (!acceptInbound(data.seq, data)) return;
         handleWebSocketMessage(data);
     };
 
-    websocket.onclose = () => {
-        console.log("WebSocket disconnected");
+    websocket.onclose = (event) => {
+        console.log("WebSocket disconnected", event.code);
+        clearInterval(ackTimer);
+        ackTimer = null;
         connectionStatus.innerHTML =
             '<span class="text-red-300">● Disconnected</span>';
-        addSystemMessage("Disconnected from server", "error");
+        if (NO_RECONNECT_CODES.includes(event.code)) {
+            addSystemMessage("Disconnected from server", "error");
+            return;
+        }
+        // Network blip: reconnect and resume where we left off
+        const delay = Math.min(1000 * 2 ** reconnectAttempts, MAX_RECONNECT_DELAY_MS);
+        reconnectAttempts++;
+        addSystemMessage(`Connection lost - reconnecting in ${delay / 1000}s`, "error");
+        setTimeout(() => connectWebSocket(path), delay);
     };
 
     websocket.onerror = (error) => {
@@ -155,13 +280,50 @@ function connectWebSocket(path = "/ws") {
     };
 }
 
+// Tell the server what arrived since the last ack (nothing when idle)
+function sendAck() {
+    if (lastInboundSeq === lastAckedSeq) return;
+    if (!websocket || websocket.readyState !== WebSocket.OPEN) return;
+    lastAckedSeq = lastInboundSeq;
+    sendJson({ type: "ack", last_seq: lastInboundSeq });
+}
+
+// Track server sequence numbers; false for a message already received
+function acceptInbound(seq, meta) {
+    if (seq === undefined) return true;
+    if (meta && meta.type === "connection" && meta.replayed === undefined) {
+        // A new server-side session starts a new sequence
+        lastInboundSeq = 0;
+    }
+    if (seq <= lastInboundSeq) return false;
+    lastInboundSeq = seq;
+    return true;
+}
+
 function handleWebSocketMessage(data) {
     switch (data.type) {
         case "search_prompt":
             showSearchPrompt(data.query, data.message);
             break;
         case "connection":
-            addSystemMessage(data.message, "info");
+            if (data.resume_token) {
+                sessionStorage.setItem("resume_token", data.resume_token);
+            }
+            if (data.replayed !== undefined) {
+                addSystemMessage(
+                    data.replay_gap
+                        ? "Reconnected - some messages could not be recovered"
+                        : "Reconnected",
+                    "info"
+                );
+                // The server stopped transcription while we were away
+                if (isRecording) sendJson({ command: "start_recording" });
+            } else {
+                addSystemMessage(
+                    data.resumed ? "Resumed your previous conversation" : data.message,
+                    "info"
+                );
+            }
             break;
         case "status":
             addSystemMessage(data.message, "info");
@@ -200,6 +362,12 @@ function handleWebSocketMessage(data) {
             // console.log("WebSocket message received:", data.final_response);
             completeAIResponse(data.final_response);
             realTimeStatus.textContent = "🎤 Ready for your next message...";
+            if (data.text_only) {
+                addSystemMessage(
+                    "Server is busy - this reply is text only",
+                    "info"
+                );
+            }
             break;
         case "tts_response":
             // Handle TTS audio response
@@ -213,10 +381,44 @@ function handleWebSocketMessage(data) {
                 console.log("TTS audio is empty");
             }
             break;
+        case "turn_metrics":
+            // Per-turn latency breakdown (ms) for debugging slow turns
+            console.debug("Turn metrics:", data.turn_id, data.spans_ms);
+            break;
+        case "tts_error":
+            // The reply text is already shown; only the audio is missing
+            addSystemMessage(data.message, "error");
+            break;
         case "llm_error":
             addSystemMessage(data.message, "error");
             realTimeStatus.textContent = "🎤 Ready for your next message...";
             break;
+        case "busy":
+            // The server did not admit this turn (overloaded or too many turns)
+            addSystemMessage(
+                `${data.message} (retry in ~${data.retry_after}s)`,
+                "error"
+            );
+            realTimeStatus.textContent = "🎤 Ready for your next message...";
+            // A refused recording: reset the button as if the user stopped
+            if (data.command === "start_recording" && isRecording && toggleChatBtn) {
+                toggleChatBtn.click();
+            }
+            break;
+        case "idle_timeout":
+            // The server stopped a recording nobody spoke into
+            addSystemMessage(data.message, "error");
+            if (isRecording && toggleChatBtn) {
+                toggleChatBtn.click();
+            }
+            break;
+        case "session_closed":
+            // Idle or maximum duration limit: the socket closes right after
+            addSystemMessage(data.message, "error");
+            if (isRecording && toggleChatBtn) {
+                toggleChatBtn.click();
+            }
+            break;
         case "error":
             addSystemMessage(data.message, "error");
             break;
@@ -696,12 +898,12 @@ async function startRecording() {
                 websocket.readyState === WebSocket.OPEN &&
                 isRecording
             ) {
-                websocket.send(event.data);
+                sendAudio(event.data);
             }
         };
 
         // Send start command
-        websocket.send(JSON.stringify({ command: "start_recording" }));
+        sendJson({ command: "start_recording" });
 
         isRecording = true;
         realTimeStatus.textContent = "🎤 Starting AI voice chat...";
@@ -717,7 +919,7 @@ async function startRecording() {
 function stopRecording() {
     if (isRecording) {
         // Send stop command
-        websocket.send(JSON.stringify({ command: "stop_recording" }));
+        sendJson({ command: "stop_recording" });
 
         // Disable further TTS playback from incoming messages
         allowTtsPlayback = false;
@@ -156,6 +156,14 @@ async function fetchHealthStatus() {
     //     });
     //     html += `</ul>`;
     // }
+    // Per-service results of the server's background upstream probes
+    const labels = { stt_service: "Speech-to-text", llm_service: "Language model", tts_service: "Text-to-speech" };
+    Object.entries(data.services || {}).forEach(([name, service]) => {
+        const latency = service.latency_ms
+            ? ` - ${service.latency_ms.p50}ms p50, ${service.latency_ms.p99}ms p99`
+            : "";
+        html += `<p class="text-sm text-gray-300">${labels[name] || name}: ${service.status}${latency}</p>`;
+    });
     document.getElementById("health-status").innerHTML = html;
 }
 
@@ -1,37 +1,123 @@
 """WebSocket handlers for real-time voice transcription"""
-import json
 import asyncio
+import time
+import uuid
+import weakref
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Optional
 from fastapi import WebSocket, WebSocketDisconnect
 
-# from app.core.logging import get_logger
-from app.services.stt_service import AssemblyAIStreamingTranscriber
-from app.services.llm_service import LLMService
-from app.services.tts_service import TTSService
+from app.core.config import settings
+from app.core.tracing import TurnTrace
+from app.core.metrics import (
+    registry, Gauge, ACTIVE_SESSIONS, AUDIO_FRAMES, AUDIO_FRAMES_DROPPED, LLM_CHUNKS, TTS_BYTES, TTS_CHARS,
+    SESSION_RESUMES, REPLAYED_MESSAGES, SHED, SESSION_LIMITS, RETRIES
+)
+from app.core.logging import get_logger, register_secret, sampled
+from app.core.serialization import JSONDecodeError
+from app.core.protocol import Codec, FrameError, INBOUND_AUDIO, JsonCodec, negotiate
+from app.core.resume import ReplayBuffer, issue_token, verify_token
+from app.core.overload import overload, SHED_INTERIM, TEXT_ONLY, REFUSE_RECORDING
+from app.core.timer_wheel import Timer, timer_wheel
+from app.core.speech_text import SpeechNormalizer
+from app.core.resilience import (
+    CircuitOpen, backoff_delay, circuit_breaker, is_caller_error, retry_budget
+)
+from app.services.providers import (
+    KEEP_WARM_MAX_IDLE_SECONDS, StreamingTranscriber, LanguageModel,
+    create_transcriber, create_llm, create_tts
+)
+from app.services.turn_detection import AdaptiveTurnDetector
+from app.services.response_cache import response_cache
+from app.services.session_store import session_store
+from app.services.scheduler import SchedulerBusy, turn_scheduler
 
-# logger = get_logger(__name__)
+logger = get_logger(__name__)
+
+# Internal queue marker: every message of a turn has been sent
+TURN_DONE = "_turn_done"
+
+# Close code sent to a connection replaced by a resumed one
+CLOSE_SUPERSEDED = 4000
+# Close codes of sessions ended by a resource limit (the client does not reconnect)
+CLOSE_IDLE = 4001
+CLOSE_MAX_DURATION = 4002
+# Close code of a connection refused because the worker is full (try again later)
+CLOSE_TRY_AGAIN_LATER = 1013
+
+# Handlers of this worker by session ID, including ones parked after a drop
+_sessions: Dict[str, "TurnDetectionWebSocketHandler"] = {}
+
+# Live handlers, for scrape-time queue depth gauges
+_live_handlers: "weakref.WeakSet[TurnDetectionWebSocketHandler]" = weakref.WeakSet()
+
+
+def _queue_depths():
+    return [h.message_queue.qsize() for h in list(_live_handlers) if h.message_queue is not None]
+
+
+registry.register(Gauge("ws_outbound_queue_depth", "Messages waiting in all outbound queues",
+                        callback=lambda: sum(_queue_depths())))
+registry.register(Gauge("ws_outbound_queue_depth_max", "Deepest outbound queue of any session",
+                        callback=lambda: max(_queue_depths(), default=0)))
+# Outbound backlog is one of the load shedding signals
+overload.queue_depth_source = lambda: sum(_queue_depths())
 
 
 class TurnDetectionWebSocketHandler:
     """WebSocket handler for turn detection voice transcription"""
     
-    def __init__(self, websocket: WebSocket, api_keys: dict):
-        self.websocket = websocket
+    def __init__(self, websocket: WebSocket, api_keys: dict, codec: Optional[Codec] = None,
+                 session_id: Optional[str] = None):
+        # None while detached (between a dropped connection and its resume)
+        self.websocket: Optional[WebSocket] = websocket
         self.api_keys = api_keys
-        print(f"[DEBUG] WebSocket handler initialized with API keys: {list(api_keys.keys())}")
-        self.transcriber: Optional[AssemblyAIStreamingTranscriber] = None
+        # Wire protocol negotiated at connect (JSON text or binary frames)
+        self.codec = codec or JsonCodec()
+        logger.debug("WebSocket handler initialized with API keys: %s", list(api_keys.keys()))
+        self.transcriber: Optional[StreamingTranscriber] = None
         self.main_loop = None
         self.message_queue = None
         self.sender_task = None
         self.last_transcript = ""
         self.last_transcript_time = None
-        self.session_id = f"ws_{datetime.now().strftime('%Y%m%d_%H%M%S')}"  # Unique session ID
+        # Unique session ID; a reconnecting client passes its resume token
+        self.session_id = session_id or uuid.uuid4().hex
+        # Recent outbound payloads, replayed to a client that reconnects
+        self.replay = ReplayBuffer()
+        # Serializes sequence assignment and sends, so replays stay in order
+        self._send_lock = asyncio.Lock()
+        self.expiry_task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.resumed = False
+        # Set once saved state has been loaded; nothing is saved before that
+        self._state_loaded = False
+        # Saved history of a resumed session, restored when the LLM is created
+        self._saved_history: Optional[dict] = None
+        # Turn-detection parameters learned for this user across recordings
+        self.turn_detector = AdaptiveTurnDetector()
+        # Keep the STT connection open between recordings (push-to-talk)
+        self.keep_warm = settings.stt_keep_warm
+        self.keepalive_task: Optional[asyncio.Task] = None
+        # LLM service reused across turns so conversation history is kept
+        self.llm: Optional[LanguageModel] = None
+        # Latency traces of turns still in flight, by turn ID
+        self.active_traces: dict = {}
+        # Activity timestamps (monotonic) checked by the session limit timer
+        self.connected_at = time.monotonic()
+        self.last_activity = self.connected_at
+        self.last_speech = 0.0
+        self.recording_started = 0.0
+        self._limit_timer: Optional[Timer] = None
+        # Microphone audio received in the current one-minute window
+        self._audio_window_start = self.connected_at
+        self._audio_window_bytes = 0
+        self._audio_limited = False
     
     async def connect(self):
         """Accept WebSocket connection and initialize"""
-        await self.websocket.accept()
-        # logger.info("WebSocket connected for turn detection")
+        await self.websocket.accept(subprotocol=self.codec.subprotocol)
+        logger.info("WebSocket connected for turn detection")
 
         # Get the current event loop for thread-safe access
         self.main_loop = asyncio.get_running_loop()
@@ -41,11 +127,28 @@ class TurnDetectionWebSocketHandler:
         
         # Start the message sender task
         self.sender_task = asyncio.create_task(self._send_queued_messages())
+        _live_handlers.add(self)
+        ACTIVE_SESSIONS.inc()
+        _sessions[self.session_id] = self
+
+        # Pick up a session saved by this or another worker
+        state = await session_store.load(self.session_id)
+        if state:
+            self.resumed = True
+            self._saved_history = state.get("history")
+            if state.get("turn_detection"):
+                self.turn_detector.restore(state["turn_detection"])
+            logger.info("Resumed session %s", self.session_id)
+        self._state_loaded = True
+        self._arm_limits()
         
         # Send connection confirmation to client
         await self._send_message({
             "type": "connection",
-            "message": "Connected to turn detection voice streaming server"
+            "message": "Connected to turn detection voice streaming server",
+            "session_id": self.session_id,
+            "resume_token": issue_token(self.session_id),
+            "resumed": self.resumed
         })
     
     async def _send_queued_messages(self):
@@ -55,17 +158,69 @@ class TurnDetectionWebSocketHandler:
                 message = await self.message_queue.get()
                 if message is None:  # Shutdown signal
                     break
-                await self.websocket.send_text(json.dumps(message))
+                if isinstance(message, dict):
+                    message_type, turn_id = message.get("type"), message.get("turn_id")
+                else:
+                    message_type, turn_id = message.type, message.turn_id
+                if message_type == TURN_DONE:
+                    await self._finish_turn(turn_id)
+                else:
+                    await self._send_payload(message)
+                    if message_type == "tts_response":
+                        trace = self.active_traces.get(turn_id)
+                        if trace:
+                            trace.mark("audio_sent")
                 self.message_queue.task_done()
             except Exception as e:
-                # logger.error(f"Error sending queued message: {e}")
+                logger.error("Error sending queued message: %s", e)
                 break
     
+    async def _finish_turn(self, turn_id: str):
+        """Export a completed turn trace and report it to the client"""
+        trace = self.active_traces.pop(turn_id, None)
+        if trace is None:
+            return
+        summary = trace.finish()
+        await self._send_payload({
+            "type": "turn_metrics",
+            "turn_id": turn_id,
+            "stages_ms": summary["stages_ms"],
+            "spans_ms": summary["spans_ms"]
+        })
+
+    async def _send_payload(self, message):
+        """Encode a message (dict or prepared) with the session codec and send it"""
+        async with self._send_lock:
+            payload = self.codec.encode(message)
+            # Buffered even when sent: the connection may already be dead
+            self.replay.append(self.codec.seq, payload)
+            websocket = self.websocket
+            if websocket is None:
+                return  # Detached - delivered on resume
+            try:
+                await self._send_raw(websocket, payload)
+            except Exception as e:
+                logger.warning("Send failed for session %s, holding messages for resume: %s",
+                               self.session_id, e)
+                if self.websocket is websocket:
+                    self.websocket = None
+
+    @staticmethod
+    async def _send_raw(websocket: WebSocket, payload):
+        if isinstance(payload, bytes):
+            await websocket.send_bytes(payload)
+        else:
+            await websocket.send_text(payload)
+
     async def _send_message(self, message: dict):
         """Send message directly to WebSocket"""
-        await self.websocket.send_text(json.dumps(message))
+        await self._send_payload(message)
+
+    def _timestamp(self) -> Optional[str]:
+        """ISO timestamp for JSON messages (binary frames carry their own)"""
+        return None if self.codec.binary else datetime.now().isoformat()
     
-    def _queue_message(self, message: dict):
+    def _queue_message(self, message):
         """Queue message to be sent from background thread"""
         try:
             asyncio.run_coroutine_threadsafe(
@@ -73,8 +228,7 @@ class TurnDetectionWebSocketHandler:
                 self.main_loop
             )
         except Exception as e:
-            # logger.error(f"Error queuing message: {e}")
-            pass
+            logger.error("Error queuing message: %s", e)
 
     @staticmethod
     def _normalize_transcript(text: str) -> str:
@@ -99,22 +253,29 @@ class TurnDetectionWebSocketHandler:
     def _on_transcript_received(self, transcript: str, is_final: bool):
         """Callback for when transcript is received"""
         try:
+            self.last_speech = self.last_activity = time.monotonic()
             # Only send interim results for UI feedback
             if not is_final:
-                message = {
+                if overload.level >= SHED_INTERIM:
+                    SHED.inc(1, "interim")
+                    return
+                # Rendered here, on the STT thread, rather than on the loop
+                message = self.codec.prepare({
                     "type": "interim_transcript",
                     "text": transcript,
-                    "timestamp": datetime.now().isoformat()
-                }
+                    "timestamp": self._timestamp()
+                })
                 self._queue_message(message)
         except Exception as e:
-            # logger.error(f"Error handling interim transcript: {e}")
-            pass
+            logger.error("Error handling interim transcript: %s", e)
 
     def _on_turn_end(self, final_transcript: str):
         """Callback when turn ends - user stopped talking"""
         try:
-            # logger.info(f"Turn ended with final transcript: {final_transcript}")
+            logger.debug("Turn ended with final transcript: %s", final_transcript)
+            self.last_speech = self.last_activity = time.monotonic()
+            trace = TurnTrace(self.session_id)
+            trace.mark("turn_end_received")
 
             # Normalize for comparison
             normalized_new = self._normalize_transcript(final_transcript)
@@ -129,7 +290,7 @@ class TurnDetectionWebSocketHandler:
                 
                 # Check if new version is better formatted
                 if self._is_better_formatted(final_transcript, self.last_transcript):
-                    # logger.info(f"Updating with better formatted version: {final_transcript}")
+                    logger.debug("Updating with better formatted version: %s", final_transcript)
                     
                     # Send update message to replace the previous one
                     message = {
@@ -140,11 +301,11 @@ class TurnDetectionWebSocketHandler:
                     }
                     self._queue_message(message)
                 else:
-                    # logger.info(f"Skipped duplicate: {final_transcript}")
+                    logger.debug("Skipped duplicate: %s", final_transcript)
                     return
             else:
                 # This is a new unique transcript
-                # logger.info(f"Sent to UI: {final_transcript}")
+                logger.debug("Sent to UI: %s", final_transcript)
 
                 # Send final transcript and turn end notification
                 message = {
@@ -171,130 +332,271 @@ class TurnDetectionWebSocketHandler:
                     }
                     self._queue_message(message)
                 else:
-                    self._process_transcript_with_llm(final_transcript)
+                    self._process_transcript_with_llm(final_transcript, trace)
             
             # Update last transcript tracking
             self.last_transcript = final_transcript
             self.last_transcript_time = current_time
             
         except Exception as e:
-            # logger.error(f"Error handling turn end: {e}")
-            pass
+            logger.error("Error handling turn end: %s", e)
 
-    def _process_transcript_with_llm(self, transcript: str):
+    def _process_transcript_with_llm(self, transcript: str, trace: Optional[TurnTrace] = None):
         """Process transcript with LLM and stream response"""
         try:
             # Queue the LLM processing as an async task
             if self.main_loop:
                 asyncio.run_coroutine_threadsafe(
-                    self._stream_llm_response(transcript),
+                    self._stream_llm_response(transcript, trace),
                     self.main_loop
                 )
         except Exception as e:
-            # logger.error(f"Error starting LLM processing: {e}")
-            pass
+            logger.error("Error starting LLM processing: %s", e)
+
+    def _get_llm(self) -> LanguageModel:
+        """Return the session's LLM service, recreated when the Google key changes"""
+        google_key = self.api_keys.get('google_api_key')
+        if self.llm is None or self.llm.api_key != google_key:
+            previous = self.llm
+            self.llm = create_llm(google_key)
+            if previous is None and self._saved_history:
+                self.llm.history.restore(self.session_id, self._saved_history)
+                self._saved_history = None
+            elif previous is not None:
+                # Carry the conversation over to the new key
+                for msg in previous.get_conversation_history(self.session_id):
+                    self.llm.add_to_conversation(self.session_id, msg["role"], msg["content"])
+        return self.llm
+
+    async def _save_session(self):
+        """Save the conversation and turn-detection state for reconnects"""
+        if not self._state_loaded:
+            return
+        if self.llm is not None:
+            history = self.llm.history.export(self.session_id)
+        else:
+            history = self._saved_history
+        await session_store.save(self.session_id, {
+            "history": history,
+            "turn_detection": self.turn_detector.export(),
+        })
 
-    async def _stream_llm_response(self, transcript: str):
+    async def _stream_llm_response(self, transcript: str, trace: Optional[TurnTrace] = None):
         """Stream LLM response to the WebSocket"""
+        if trace is None:
+            trace = TurnTrace(self.session_id)
+            trace.mark("turn_end_received")
+        self.active_traces[trace.turn_id] = trace
         try:
-            from app.services.llm_service import LLMService
-            from app.services.tts_service import TTSService
-            # Send thinking status
+            # Send thinking status (also covers the wait for a slot)
             await self.message_queue.put({
                 "type": "llm_thinking",
+                "turn_id": trace.turn_id,
                 "message": "AI is thinking...",
-                "timestamp": datetime.now().isoformat()
+                "timestamp": self._timestamp()
             })
-            llm = LLMService(api_key=self.api_keys['google_api_key'])
-            murf_key = self.api_keys.get('murf_api_key')
-            tts = TTSService(api_key=murf_key)
-            print(f"[DEBUG] LLM available: {llm.is_available()}")
-            print(f"[DEBUG] TTS available: {tts.is_available()}")
-            print(f"[DEBUG] Murf API key: {murf_key if murf_key else 'NOT_SET'}")
-            print(f"[DEBUG] TTS API key present: {bool(murf_key)}")
-            if not llm.is_available():
-                await self.message_queue.put({
-                    "type": "llm_error",
-                    "message": "AI service is not available",
-                    "timestamp": datetime.now().isoformat()
-                })
-                return
-            print(f"[LLM] Processing: {transcript}")
+            # Wait for an LLM/TTS slot (global, per API key and per session)
+            async with turn_scheduler.slot(self.session_id, self.api_keys.get('google_api_key')):
+                trace.mark("turn_admitted")
+                await self._respond(transcript, trace)
+        except SchedulerBusy as busy:
+            logger.info("Turn %s not admitted: %s", trace.turn_id, busy.reason)
             await self.message_queue.put({
-                "type": "llm_response_start",
-                "message": "AI response starting...",
-                "timestamp": datetime.now().isoformat()
+                "type": "busy",
+                "turn_id": trace.turn_id,
+                "reason": busy.reason,
+                "retry_after": busy.retry_after,
+                "message": "The assistant is busy right now, please try again in a moment",
+                "timestamp": self._timestamp()
             })
-            accumulated_response = ""
-            chunk_count = 0
-            async for chunk in llm.generate_streaming_response(transcript, self.session_id):
-                chunk_count += 1
-                accumulated_response += chunk
-                await self.message_queue.put({
-                    "type": "llm_response_chunk",
-                    "chunk": chunk,
-                    "accumulated": accumulated_response,
-                    "chunk_number": chunk_count,
-                    "timestamp": datetime.now().isoformat()
-                })
+        except CircuitOpen as e:
+            # Gemini is failing: answer at once instead of after a timeout
             await self.message_queue.put({
-                "type": "llm_response_complete",
-                "final_response": accumulated_response,
-                "total_chunks": chunk_count,
-                "timestamp": datetime.now().isoformat()
+                "type": "llm_error",
+                "turn_id": trace.turn_id,
+                "reason": "circuit_open",
+                "service": e.upstream,
+                "retry_after": e.retry_after,
+                "message": f"{e} - please try again in a moment",
+                "timestamp": self._timestamp()
             })
-            print(f"\n[LLM] Complete response ({chunk_count} chunks): {accumulated_response}")
-            # TTS pipeline fix: check Murf API key before TTS
-            if not murf_key or not tts.is_available():
-                await self.message_queue.put({
-                    "type": "tts_error",
-                    "message": "TTS service is not available. Please check your Murf API key in settings.",
-                    "timestamp": datetime.now().isoformat()
-                })
-                print("[DEBUG] TTS not available: Murf API key missing or invalid.")
-                return
-            try:
-                print(f"[DEBUG] Starting TTS generation for text: {accumulated_response[:50]}...")
-                print(f"[DEBUG] Using Murf API key: {tts.api_key[:10] if tts.api_key else 'None'}...")
-                audio_b64 = await tts.generate_speech(accumulated_response)
-                print(f"[DEBUG] TTS generation completed, audio length: {len(audio_b64) if audio_b64 else 0}")
-                if audio_b64:
-                    await self.message_queue.put({
-                        "type": "tts_response",
-                        "audio": audio_b64,
-                        "timestamp": datetime.now().isoformat()
-                    })
-                    print("[DEBUG] TTS audio sent to client")
-                else:
-                    print("[DEBUG] TTS returned empty audio")
-            except Exception as tts_exc:
-                print(f"[DEBUG] TTS error: {tts_exc}")
-                await self.message_queue.put({
-                    "type": "tts_error",
-                    "message": f"TTS service error: {tts_exc}",
-                    "timestamp": datetime.now().isoformat()
-                })
-
         except Exception as e:
-            # logger.error(f"Error streaming LLM response: {e}")
+            logger.error("Error streaming LLM response: %s", e)
             await self.message_queue.put({
                 "type": "llm_error",
+                "turn_id": trace.turn_id,
                 "message": f"Error generating AI response: {str(e)}",
-                "timestamp": datetime.now().isoformat()
+                "timestamp": self._timestamp()
             })
+        finally:
+            # Sent after every message of this turn, so the trace covers delivery
+            await self.message_queue.put({"type": TURN_DONE, "turn_id": trace.turn_id})
     
+    async def _respond(self, transcript: str, trace: TurnTrace):
+        """Generate the LLM response and its speech for one admitted turn"""
+        llm = self._get_llm()
+        murf_key = self.api_keys.get('murf_api_key')
+        tts = create_tts(murf_key)
+        logger.debug("LLM available: %s, TTS available: %s, Murf API key present: %s",
+                     llm.is_available(), tts.is_available(), bool(murf_key))
+        if not llm.is_available():
+            await self.message_queue.put({
+                "type": "llm_error",
+                "turn_id": trace.turn_id,
+                "message": "AI service is not available",
+                "timestamp": self._timestamp()
+            })
+            return
+        if settings.llm_backend != "fake":
+            circuit_breaker("gemini").check()
+        logger.debug("Processing transcript with LLM: %s", transcript)
+        await self.message_queue.put({
+            "type": "llm_response_start",
+            "turn_id": trace.turn_id,
+            "message": "AI response starting...",
+            "timestamp": self._timestamp()
+        })
+        accumulated_response = ""
+        chunk_count = 0
+        # Speakable text is prepared while the response streams
+        speech = SpeechNormalizer()
+        speech_segments = []
+        async for chunk in llm.generate_streaming_response(transcript, self.session_id, trace=trace):
+            chunk_count += 1
+            LLM_CHUNKS.inc()
+            accumulated_response += chunk
+            speech_segments.extend(speech.feed(chunk))
+            await self.message_queue.put(self.codec.prepare({
+                "type": "llm_response_chunk",
+                "turn_id": trace.turn_id,
+                "chunk": chunk,
+                "accumulated": accumulated_response,
+                "chunk_number": chunk_count,
+                "timestamp": self._timestamp()
+            }))
+        # Under overload the reply is sent as text only
+        text_only = overload.level >= TEXT_ONLY
+        await self.message_queue.put({
+            "type": "llm_response_complete",
+            "turn_id": trace.turn_id,
+            "final_response": accumulated_response,
+            "total_chunks": chunk_count,
+            "text_only": text_only,
+            "timestamp": self._timestamp()
+        })
+        logger.debug("Complete LLM response (%s chunks): %s", chunk_count, accumulated_response)
+        speech_segments.extend(speech.flush())
+        speech_text = " ".join(speech_segments)
+        # Saved per turn so a reconnect to another worker keeps the context
+        await self._save_session()
+        if text_only:
+            SHED.inc(1, "tts")
+            return
+        # TTS pipeline fix: check Murf API key before TTS
+        if not tts.is_available():
+            await self.message_queue.put({
+                "type": "tts_error",
+                "turn_id": trace.turn_id,
+                "message": "TTS service is not available. Please check your Murf API key in settings.",
+                "timestamp": self._timestamp()
+            })
+            logger.warning("TTS not available: Murf API key missing or invalid")
+            return
+        if not speech_text:
+            logger.debug("Nothing speakable in the response, skipping TTS")
+            return
+        TTS_CHARS.inc(speech.chars_in, "response")
+        TTS_CHARS.inc(len(speech_text), "spoken")
+        try:
+            logger.debug("Starting TTS generation for text: %s...", speech_text[:50])
+            # Replayed responses reuse the audio synthesized the first time
+            audio = await response_cache.audio_for(accumulated_response)
+            trace.mark("tts_request")
+            if not audio:
+                with overload.tts():
+                    audio = await tts.generate_speech_bytes(speech_text, trace=trace, normalized=True)
+                await response_cache.attach_audio(accumulated_response, audio)
+            logger.debug("TTS generation completed, audio length: %s", len(audio) if audio else 0)
+            if audio:
+                TTS_BYTES.inc(len(audio))
+                await self.message_queue.put(self.codec.audio(trace.turn_id, audio, self._timestamp()))
+            else:
+                logger.warning("TTS returned empty audio")
+        except CircuitOpen as e:
+            # Murf is failing: the text reply stands on its own
+            await self.message_queue.put({
+                "type": "tts_error",
+                "turn_id": trace.turn_id,
+                "reason": "circuit_open",
+                "service": e.upstream,
+                "retry_after": e.retry_after,
+                "message": f"{e} - the reply is shown as text only",
+                "timestamp": self._timestamp()
+            })
+        except Exception as tts_exc:
+            logger.error("TTS error: %s", tts_exc)
+            await self.message_queue.put({
+                "type": "tts_error",
+                "turn_id": trace.turn_id,
+                "message": f"TTS service error: {tts_exc}",
+                "timestamp": self._timestamp()
+            })
+
     async def handle_command(self, command: str):
         """Handle WebSocket commands"""
         if command == "start_recording":
-            # logger.info("Starting turn detection recording session")
-            self.transcriber = AssemblyAIStreamingTranscriber(
-                sample_rate=16000, 
-                api_key=self.api_keys.get('assemblyai_api_key')
+            if overload.level >= REFUSE_RECORDING:
+                SHED.inc(1, "recording")
+                await self._send_message({
+                    "type": "busy",
+                    "command": "start_recording",
+                    "reason": "overloaded",
+                    "retry_after": settings.overload_cooldown_seconds,
+                    "message": "The server is overloaded and cannot start a new recording"
+                })
+                return
+            logger.info("Starting turn detection recording session")
+            self.recording_started = time.monotonic()
+            api_key = self.api_keys.get('assemblyai_api_key')
+            self._cancel_keepalive()
+
+            # Reuse a warm connection from the previous recording when possible
+            if self.transcriber and self.transcriber.paused:
+                if self.transcriber.api_key == api_key and \
+                        self.transcriber.resume(self._on_transcript_received, self._on_turn_end):
+                    await self._send_message({
+                        "type": "status",
+                        "message": "Turn detection started - speak and pause to see results!",
+                        "warm": True,
+                        "turn_detection": self.turn_detector.snapshot()
+                    })
+                    return
+                # Closed by AssemblyAI while paused (or another key): connect afresh
+                await self._stop_transcriber()
+
+            self.transcriber = create_transcriber(
+                api_key,
+                turn_detector=self.turn_detector,
+                sample_rate=16000
             )
-            if self.transcriber.start_streaming(self._on_transcript_received, self._on_turn_end):
+            try:
+                started = await self._start_transcriber()
+            except CircuitOpen as e:
+                self.transcriber = None
+                await self._send_message({
+                    "type": "busy",
+                    "command": "start_recording",
+                    "reason": "circuit_open",
+                    "service": e.upstream,
+                    "retry_after": e.retry_after,
+                    "message": str(e)
+                })
+                return
+            if started:
                 await self._send_message({
                     "type": "status",
-                    "message": "Turn detection started - speak and pause to see results!"
+                    "message": "Turn detection started - speak and pause to see results!",
+                    "turn_detection": self.turn_detector.snapshot()
                 })
             else:
                 await self._send_message({
@@ -303,29 +605,330 @@ class TurnDetectionWebSocketHandler:
                 })
         
         elif command == "stop_recording":
-            # logger.info("Stopping turn detection recording session")
+            logger.info("Stopping turn detection recording session")
             if self.transcriber:
-                self.transcriber.stop_streaming()
-                self.transcriber = None
+                if self.keep_warm and self.transcriber.is_connected():
+                    # Hold the connection open for the idle window
+                    self.transcriber.pause()
+                    # A repeated stop must not leave a second keepalive loop behind
+                    self._cancel_keepalive()
+                    self.keepalive_task = asyncio.create_task(self._keep_warm(self.transcriber))
+                else:
+                    self.transcriber.stop_streaming()
+                    self.transcriber = None
             await self._send_message({
                 "type": "status",
                 "message": "Turn detection stopped"
             })
-    
+
+    async def _start_transcriber(self) -> bool:
+        """Start streaming, retrying failed connects with jittered backoff within the retry budget"""
+        retry_budget.deposit()
+        attempt = 0
+        while True:
+            # The SDK connects synchronously; keep the handshake off the event loop
+            if await asyncio.to_thread(self.transcriber.start_streaming,
+                                       self._on_transcript_received, self._on_turn_end):
+                return True
+            last_error = getattr(self.transcriber, "last_error", None)
+            if not self.transcriber.api_key or is_caller_error(last_error) or \
+                    attempt >= settings.retry_max_attempts:
+                return False
+            if not retry_budget.withdraw():
+                RETRIES.inc(1, "assemblyai", "budget_exhausted")
+                return False
+            delay = backoff_delay(attempt)
+            attempt += 1
+            RETRIES.inc(1, "assemblyai", "retried")
+            logger.info("Retrying STT connect (%s) in %.0fms", attempt, delay * 1000)
+            await asyncio.sleep(delay)
+
+    def _stop_transcriber(self) -> asyncio.Task:
+        """Drop the current transcriber and close its connection off the event loop"""
+        transcriber, self.transcriber = self.transcriber, None
+        # disconnect(terminate=True) waits for the server and joins the SDK threads
+        return asyncio.create_task(asyncio.to_thread(transcriber.stop_streaming))
+
+    def _cancel_keepalive(self):
+        """Stop the keep-warm timer of a paused transcriber"""
+        if self.keepalive_task:
+            self.keepalive_task.cancel()
+            self.keepalive_task = None
+
+    async def _keep_warm(self, transcriber: StreamingTranscriber):
+        """Send keepalives to a paused transcriber, then close it after the idle window"""
+        idle_seconds = min(settings.stt_keep_warm_idle_seconds, KEEP_WARM_MAX_IDLE_SECONDS)
+        interval = max(0.1, settings.stt_keepalive_interval_seconds)
+        deadline = self.main_loop.time() + idle_seconds
+        try:
+            while self.main_loop.time() < deadline:
+                await asyncio.sleep(min(interval, max(0.0, deadline - self.main_loop.time())))
+                if self.transcriber is not transcriber or not transcriber.paused:
+                    return
+                transcriber.send_keepalive()
+
+            # Idle window used up - stop paying for the open session
+            if self.transcriber is transcriber and transcriber.paused:
+                await self._stop_transcriber()
+        except asyncio.CancelledError:
+            pass
+
+    async def set_keep_warm(self, enabled: bool):
+        """Enable or disable keep-warm mode for this session"""
+        self.keep_warm = bool(enabled)
+        if not self.keep_warm and self.transcriber and self.transcriber.paused:
+            self._cancel_keepalive()
+            await self._stop_transcriber()
+        await self._send_message({
+            "type": "stt_keep_warm",
+            "enabled": self.keep_warm,
+            "idle_seconds": min(settings.stt_keep_warm_idle_seconds, KEEP_WARM_MAX_IDLE_SECONDS)
+        })
+
+    async def configure_turn_detection(self, data: dict):
+        """Apply client turn-detection preferences (used from the next recording)"""
+        if not isinstance(data, dict):
+            await self._send_message({
+                "type": "error",
+                "message": "Invalid turn detection settings: expected an object"
+            })
+            return
+        try:
+            self.turn_detector.configure(
+                end_of_turn_silence_ms=data.get("end_of_turn_silence_ms"),
+                voice_activity_threshold=data.get("voice_activity_threshold"),
+                adaptive=data.get("adaptive")
+            )
+        except (TypeError, ValueError) as e:
+            await self._send_message({
+                "type": "error",
+                "message": f"Invalid turn detection settings: {e}"
+            })
+            return
+        await self._send_message({
+            "type": "turn_detection",
+            "data": self.turn_detector.snapshot()
+        })
+
     def handle_audio_data(self, audio_data: bytes):
         """Handle incoming audio data"""
-        if self.transcriber and len(audio_data) > 0:
-            # logger.debug(f"Streaming {len(audio_data)} bytes of audio for turn detection")
+        AUDIO_FRAMES.inc()
+        if self._over_audio_rate(len(audio_data)):
+            AUDIO_FRAMES_DROPPED.inc()
+            SESSION_LIMITS.inc(1, "audio_rate")
+            return
+        # A paused (keep-warm) transcriber only receives keepalive silence
+        if self.transcriber and not self.transcriber.paused and len(audio_data) > 0:
+            if sampled("ws.audio_frame"):
+                logger.debug("Streaming %s bytes of audio for turn detection", len(audio_data))
             self.transcriber.stream_audio(audio_data)
+        else:
+            AUDIO_FRAMES_DROPPED.inc()
+
+    def _over_audio_rate(self, size: int) -> bool:
+        """Count ``size`` bytes against the per-minute audio allowance"""
+        limit = settings.session_max_audio_bytes_per_minute
+        if limit <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._audio_window_start >= 60.0:
+            self._audio_window_start = now
+            self._audio_window_bytes = 0
+            self._audio_limited = False
+        self._audio_window_bytes += size
+        if self._audio_window_bytes <= limit:
+            return False
+        if not self._audio_limited:
+            # Tell the client once per window rather than once per frame
+            self._audio_limited = True
+            logger.warning("Session %s exceeded the audio rate limit", self.session_id)
+            self.message_queue.put_nowait({
+                "type": "error",
+                "message": "Audio rate limit exceeded - audio is dropped until the next minute"
+            })
+        return True
+
+    def touch(self):
+        """Record client activity (any control message)"""
+        self.last_activity = time.monotonic()
+
+    def _arm_limits(self, delay: Optional[float] = None):
+        """(Re)schedule the session limit check"""
+        if self._limit_timer:
+            self._limit_timer.cancel()
+            self._limit_timer = None
+        limits = [v for v in (settings.session_recording_idle_seconds,
+                              settings.session_idle_seconds,
+                              settings.session_max_duration_seconds) if v > 0]
+        if not limits:
+            return
+        self._limit_timer = timer_wheel.schedule(min(limits) if delay is None else delay,
+                                                 self._on_limit_timer)
+
+    def _on_limit_timer(self):
+        """Timer wheel callback: enforce the idle and duration limits lazily"""
+        self._limit_timer = None
+        if self.closed or self.websocket is None:
+            return  # Detached sessions are cleaned up by their own expiry
+        now = time.monotonic()
+        remaining = []
+
+        max_duration = settings.session_max_duration_seconds
+        if max_duration > 0:
+            left = self.connected_at + max_duration - now
+            if left <= 0:
+                asyncio.create_task(self._close(CLOSE_MAX_DURATION, "max_duration"))
+                return
+            remaining.append(left)
+
+        recording = self.transcriber is not None and not self.transcriber.paused
+        recording_idle = settings.session_recording_idle_seconds
+        session_idle = settings.session_idle_seconds
+        if recording and recording_idle > 0:
+            left = max(self.last_speech, self.recording_started) + recording_idle - now
+            if left <= 0:
+                # Stop paying for a microphone nobody speaks into
+                SESSION_LIMITS.inc(1, "recording_idle")
+                logger.info("Session %s: no speech for %ss - stopping recording",
+                            self.session_id, recording_idle)
+                self._stop_transcriber()
+                self.last_activity = now
+                self._queue_message({
+                    "type": "idle_timeout",
+                    "state": "recording",
+                    "message": "Recording stopped after a period without speech"
+                })
+                left = recording_idle
+            remaining.append(left)
+        elif not recording and session_idle > 0:
+            left = self.last_activity + session_idle - now
+            if left <= 0:
+                asyncio.create_task(self._close(CLOSE_IDLE, "idle"))
+                return
+            remaining.append(left)
+
+        if recording and session_idle > 0:
+            # Checked again once the recording ends
+            remaining.append(session_idle)
+        if remaining:
+            self._arm_limits(min(remaining))
+
+    async def _close(self, code: int, reason: str):
+        """End the session because of a resource limit"""
+        if self.closed:
+            return
+        SESSION_LIMITS.inc(1, reason)
+        logger.info("Closing session %s: %s limit reached", self.session_id, reason)
+        websocket = self.websocket
+        try:
+            await self._send_message({
+                "type": "session_closed",
+                "reason": reason,
+                "message": "Session closed by the server" if reason != "idle"
+                           else "Session closed after a period of inactivity"
+            })
+            if websocket is not None:
+                await websocket.close(code=code)
+        except Exception:
+            pass
+        await self.disconnect()
     
+    async def release(self, websocket: WebSocket, close_code: Optional[int] = None):
+        """The receive loop of ``websocket`` ended: park the session or clean up"""
+        if self.closed or self.websocket not in (websocket, None):
+            return  # Already taken over by a resumed connection
+        grace = settings.session_resume_grace_seconds
+        # 1000 is a deliberate close by the client; anything else may be a blip
+        if close_code == 1000 or grace <= 0 or not self._state_loaded:
+            await self.disconnect()
+        else:
+            await self.detach(grace)
+
+    async def detach(self, grace: float):
+        """Keep the session (and any turn in flight) alive for ``grace`` seconds"""
+        self.websocket = None
+        self._cancel_keepalive()
+        # Billing stops with the audio; the client restarts recording on resume
+        if self.transcriber:
+            await self._stop_transcriber()
+        await self._save_session()
+        self.expiry_task = asyncio.create_task(self._expire(grace))
+        logger.info("Session %s detached, resumable for %ss", self.session_id, grace)
+
+    def acknowledge(self, last_seq):
+        """The client received everything up to ``last_seq``"""
+        if isinstance(last_seq, int) and not isinstance(last_seq, bool):
+            self.replay.ack(last_seq)
+
+    async def _expire(self, grace: float):
+        try:
+            await asyncio.sleep(grace)
+        except asyncio.CancelledError:
+            return
+        logger.info("Session %s was not resumed - cleaning up", self.session_id)
+        SESSION_RESUMES.inc(1, "expired")
+        await self.disconnect()
+
+    async def resume(self, websocket: WebSocket, last_seq: Optional[int]):
+        """Attach a reconnected client and replay what it missed after ``last_seq``"""
+        if self.expiry_task:
+            self.expiry_task.cancel()
+            self.expiry_task = None
+        async with self._send_lock:
+            previous, self.websocket = self.websocket, None
+            if previous is not None:
+                # Half-open connection the client has given up on
+                try:
+                    await previous.close(code=CLOSE_SUPERSEDED)
+                except Exception:
+                    pass
+            await websocket.accept(subprotocol=self.codec.subprotocol)
+            payloads, gap = self.replay.since(self.codec.seq if last_seq is None else last_seq)
+            for payload in payloads:
+                await self._send_raw(websocket, payload)
+            self.websocket = websocket
+        self.last_activity = time.monotonic()
+        self._arm_limits()
+        REPLAYED_MESSAGES.inc(len(payloads))
+        SESSION_RESUMES.inc(1, "replayed")
+        logger.info("Session %s resumed, replayed %s messages%s", self.session_id, len(payloads),
+                    " (with a gap)" if gap else "")
+        await self._send_message({
+            "type": "connection",
+            "message": "Reconnected to turn detection voice streaming server",
+            "session_id": self.session_id,
+            "resume_token": issue_token(self.session_id),
+            "resumed": True,
+            "replayed": len(payloads),
+            "replay_gap": gap,
+            "recording": False
+        })
+
     async def disconnect(self):
         """Clean up resources on disconnect"""
-        # logger.info("WebSocket disconnecting - cleaning up")
+        if self.closed:
+            return
+        self.closed = True
+        logger.info("WebSocket disconnecting - cleaning up")
+        self._cancel_keepalive()
+        if self._limit_timer:
+            self._limit_timer.cancel()
+            self._limit_timer = None
+        if self.expiry_task and self.expiry_task is not asyncio.current_task():
+            self.expiry_task.cancel()
+        self.expiry_task = None
+        if _sessions.get(self.session_id) is self:
+            del _sessions[self.session_id]
+        if self in _live_handlers:
+            _live_handlers.discard(self)
+            ACTIVE_SESSIONS.dec()
         
         # Stop transcriber
         if self.transcriber:
             self.transcriber.stop_streaming()
             self.transcriber = None
+
+        await self._save_session()
         
         # Stop the sender task
         if self.message_queue:
@@ -337,6 +940,14 @@ class TurnDetectionWebSocketHandler:
                 await self.sender_task
             except asyncio.CancelledError:
                 pass
+        self.replay.clear()
+
+
+def _parse_seq(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
 
 
 async def websocket_endpoint(websocket: WebSocket):
@@ -349,47 +960,96 @@ async def websocket_endpoint(websocket: WebSocket):
         'murf_api_key': None
     }
     
-    handler = TurnDetectionWebSocketHandler(websocket, api_keys)
+    # Binary framing when the client offers the subprotocol, JSON otherwise
+    codec = negotiate(websocket.scope.get("subprotocols"))
+    # Reconnecting clients pass ?resume_token=...&last_seq=N
+    session_id = verify_token(websocket.query_params.get("resume_token"))
+    handler = _sessions.get(session_id) if session_id else None
+    if handler is not None and (handler.closed or handler.codec.binary != codec.binary):
+        # Cannot replay across protocols: start over from the saved state
+        await handler.disconnect()
+        handler = None
+    if session_id and handler is None:
+        SESSION_RESUMES.inc(1, "restored")
+    close_code = None
     
     try:
-        await handler.connect()
+        if handler is not None:
+            await handler.resume(websocket, _parse_seq(websocket.query_params.get("last_seq")))
+        elif 0 < settings.max_sessions_per_worker <= len(_sessions):
+            # Full: tell the client why instead of failing mid-session later
+            SESSION_LIMITS.inc(1, "worker_full")
+            logger.warning("Refusing connection: %s sessions on this worker", len(_sessions))
+            await websocket.accept(subprotocol=codec.subprotocol)
+            await TurnDetectionWebSocketHandler._send_raw(websocket, codec.encode({
+                "type": "busy",
+                "reason": "worker_full",
+                "retry_after": 5,
+                "message": "The server is at capacity - try again shortly"
+            }))
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return
+        else:
+            handler = TurnDetectionWebSocketHandler(websocket, api_keys, codec, session_id)
+            await handler.connect()
         
         while True:
             # Receive message from client
             message = await websocket.receive()
+
+            if message["type"] == "websocket.disconnect":
+                close_code = message.get("code")
+                break
             
             if message["type"] == "websocket.receive":
-                if "text" in message:
-                    # Handle text commands
-                    try:
-                        data = json.loads(message["text"])
-                        
-                        # Handle API keys message
-                        if data.get("type") == "api_keys":
-                            old_keys = handler.api_keys.copy()
-                            handler.api_keys.update(data.get("data", {}))
-                            print(f"[DEBUG] Updated API keys from client:")
-                            print(f"[DEBUG]  Old: {old_keys}")
-                            print(f"[DEBUG]  New: {handler.api_keys}")
-                            continue
-                        
-                        command = data.get("command")
-                        if command:
-                            await handler.handle_command(command)
-                    except json.JSONDecodeError:
-                        # logger.error("Invalid JSON received")
-                        pass
-
-                elif "bytes" in message:
+                try:
+                    kind, data = handler.codec.decode(message)
+                except (JSONDecodeError, FrameError) as e:
+                    logger.error("Invalid message received: %s", e)
+                    continue
+
+                if kind == INBOUND_AUDIO:
                     # Handle audio data
-                    audio_data = message["bytes"]
-                    handler.handle_audio_data(audio_data)
+                    handler.handle_audio_data(data)
+                    continue
+
+                # Acknowledged messages need not be kept for replay; not activity
+                if data.get("type") == "ack":
+                    handler.acknowledge(data.get("last_seq"))
+                    continue
+
+                # Any control message counts as activity for the idle limit
+                handler.touch()
+
+                # Handle API keys message
+                if data.get("type") == "api_keys":
+                    handler.api_keys.update(data.get("data", {}))
+                    # Mask the values in any log line that might echo them
+                    for value in handler.api_keys.values():
+                        register_secret(value)
+                    logger.info("Updated API keys from client: %s",
+                                sorted(k for k, v in handler.api_keys.items() if v))
+                    continue
 
-    except WebSocketDisconnect:
-        # logger.info("WebSocket disconnected")
-        pass
+                # Handle turn detection preferences
+                if data.get("type") == "turn_detection":
+                    await handler.configure_turn_detection(data.get("data") or {})
+                    continue
+
+                # Handle keep-warm preference for push-to-talk
+                if data.get("type") == "stt_keep_warm":
+                    await handler.set_keep_warm(data.get("enabled", False))
+                    continue
+
+                command = data.get("command")
+                if command:
+                    await handler.handle_command(command)
+
+    except WebSocketDisconnect as e:
+        close_code = e.code
     except Exception as e:
-        # logger.error(f"WebSocket error: {e}")
-        pass
+        logger.error("WebSocket error: %s", e)
     finally:
-        await handler.disconnect()
+        if handler is not None:
+            await handler.release(websocket, close_code)
+        logger.info("WebSocket disconnected (code %s)", close_code)